@@ -13,8 +13,10 @@ Facebook賬戶管理模塊
 """
 
 import os
+import copy
 import json
 import time
+import atexit
 import random
 import logging
 import requests
@@ -22,6 +24,7 @@ from typing import Dict, List, Optional, Union, Any
 from configparser import ConfigParser
 
 from utils import save_json, load_json
+from account_store import create_account_persistence
 
 # 設置日誌
 logger = logging.getLogger(__name__)
@@ -44,19 +47,66 @@ class FacebookAccountManager:
         self.app_secret = config.get('Facebook', 'app_secret', fallback='')
         self.base_url = config.get('Facebook', 'base_url', fallback='https://graph.facebook.com/v18.0')
         
-        # 加載賬戶和代理
-        self.accounts = self._load_accounts()
+        # 賬戶持久化層（JSON或SQLite，支持延遲合併寫入）
+        self._store = create_account_persistence(config, lambda: self._accounts_by_id)
+        atexit.register(self.close)
+        
+        # 賬戶按ID索引（保持插入順序），並按狀態建立二級索引
+        self._accounts_by_id: Dict[str, Dict[str, Any]] = {}
+        self._accounts_by_status: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for account in self._load_accounts():
+            if account["id"] in self._accounts_by_id:
+                logger.warning(f"賬戶ID重複，保留最後一個: {account['id']}")
+                self._unindex_account(self._accounts_by_id[account["id"]])
+            self._index_account(account)
+        
+        # 代理列表及其ID索引
         self.proxies = self._load_proxies()
+        self._proxies_by_id = {proxy["id"]: proxy for proxy in self.proxies}
         
-        logger.info(f"已加載 {len(self.accounts)} 個賬戶和 {len(self.proxies)} 個代理")
+        logger.info(f"已加載 {len(self._accounts_by_id)} 個賬戶和 {len(self.proxies)} 個代理")
+    
+    @property
+    def accounts(self) -> List[Dict[str, Any]]:
+        """所有賬戶（按創建順序）的副本，修改賬戶請使用 update_account"""
+        with self._store.lock:
+            return copy.deepcopy(list(self._accounts_by_id.values()))
+    
+    def _index_account(self, account: Dict[str, Any]) -> None:
+        """將賬戶加入索引"""
+        self._accounts_by_id[account["id"]] = account
+        self._accounts_by_status.setdefault(account.get("status"), {})[account["id"]] = account
+    
+    def _unindex_account(self, account: Dict[str, Any]) -> None:
+        """將賬戶從索引中移除"""
+        self._accounts_by_id.pop(account["id"], None)
+        status_bucket = self._accounts_by_status.get(account.get("status"))
+        if status_bucket is not None:
+            status_bucket.pop(account["id"], None)
+            if not status_bucket:
+                del self._accounts_by_status[account.get("status")]
     
     def _load_accounts(self) -> List[Dict[str, Any]]:
         """加載賬戶數據"""
-        return load_json(self.accounts_file, default=[])
+        return self._store.load()
     
     def _save_accounts(self) -> bool:
-        """保存賬戶數據"""
-        return save_json(self.accounts_file, self.accounts)
+        """立即寫入所有未保存的賬戶修改"""
+        return self._store.flush()
+    
+    def batch_updates(self):
+        """批量修改賬戶的上下文，期間的所有修改在退出時只寫入一次
+        
+        用法:
+            with manager.batch_updates():
+                for account_id in account_ids:
+                    manager.update_account(account_id, status="active")
+        """
+        return self._store.batch()
+    
+    def close(self) -> None:
+        """寫入未保存的修改並關閉賬戶存儲（關閉後修改賬戶會拋出RuntimeError）"""
+        self._store.close()
     
     def _load_proxies(self) -> List[Dict[str, str]]:
         """加載代理數據"""
@@ -74,7 +124,7 @@ class FacebookAccountManager:
             **kwargs: 其他賬戶屬性
             
         Returns:
-            新創建的賬戶信息
+            新創建的賬戶信息（副本）
         """
         # 生成賬戶ID
         account_id = f"acc_{int(time.time())}_{random.randint(1000, 9999)}"
@@ -101,12 +151,14 @@ class FacebookAccountManager:
             account["proxy_id"] = proxy["id"]
             logger.info(f"為賬戶 {account_id} 分配代理: {proxy['ip']}:{proxy['port']}")
         
-        # 添加到賬戶列表
-        self.accounts.append(account)
-        self._save_accounts()
+        # 添加到賬戶索引
+        with self._store.lock:
+            self._store.check_open()
+            self._index_account(account)
+        self._store.mark_changed(account_id)
         
         logger.info(f"創建新賬戶: {username} ({email})")
-        return account
+        return copy.deepcopy(account)
     
     def get_account(self, account_id: str) -> Optional[Dict[str, Any]]:
         """獲取賬戶信息
@@ -115,12 +167,34 @@ class FacebookAccountManager:
             account_id: 賬戶ID
             
         Returns:
-            賬戶信息，如果不存在則返回None
+            賬戶信息的副本（修改賬戶請使用 update_account，否則修改不會被索引和寫入），如果不存在則返回None
         """
-        for account in self.accounts:
-            if account["id"] == account_id:
-                return account
-        return None
+        with self._store.lock:
+            account = self._accounts_by_id.get(account_id)
+            return copy.deepcopy(account) if account is not None else None
+    
+    def get_accounts_by_status(self, status: str) -> List[Dict[str, Any]]:
+        """獲取指定狀態的所有賬戶
+        
+        Args:
+            status: 賬戶狀態 (pending, active, error, deleted等)
+            
+        Returns:
+            賬戶列表（副本）
+        """
+        with self._store.lock:
+            return copy.deepcopy(list(self._accounts_by_status.get(status, {}).values()))
+    
+    def get_proxy(self, proxy_id: str) -> Optional[Dict[str, Any]]:
+        """獲取代理信息
+        
+        Args:
+            proxy_id: 代理ID
+            
+        Returns:
+            代理信息，如果不存在則返回None
+        """
+        return self._proxies_by_id.get(proxy_id)
     
     def update_account(self, account_id: str, **updates) -> bool:
         """更新賬戶信息
@@ -132,15 +206,40 @@ class FacebookAccountManager:
         Returns:
             更新是否成功
         """
-        for i, account in enumerate(self.accounts):
-            if account["id"] == account_id:
-                self.accounts[i].update(updates)
-                self._save_accounts()
-                logger.info(f"更新賬戶 {account_id}: {updates}")
-                return True
-        
-        logger.warning(f"賬戶不存在: {account_id}")
-        return False
+        account = self._accounts_by_id.get(account_id)
+        if account is None:
+            logger.warning(f"賬戶不存在: {account_id}")
+            return False
+        
+        # 狀態或ID變化時需要更新索引
+        id_changed = "id" in updates and updates["id"] != account_id
+        reindex = "status" in updates or id_changed
+        with self._store.lock:
+            self._store.check_open()
+            if reindex:
+                self._unindex_account(account)
+            account.update(updates)
+            if reindex:
+                self._index_account(account)
+        
+        if id_changed:
+            self._store.mark_deleted(account_id)
+        self._store.mark_changed(account["id"])
+        logger.info(f"更新賬戶 {account_id}: {updates}")
+        return True
+    
+    def update_accounts(self, account_ids: List[str], **updates) -> int:
+        """批量更新多個賬戶，所有修改只寫入一次
+        
+        Args:
+            account_ids: 賬戶ID列表
+            **updates: 要更新的字段
+            
+        Returns:
+            成功更新的賬戶數量
+        """
+        with self.batch_updates():
+            return sum(1 for account_id in account_ids if self.update_account(account_id, **updates))
     
     def delete_account(self, account_id: str) -> bool:
         """刪除賬戶
@@ -151,15 +250,17 @@ class FacebookAccountManager:
         Returns:
             刪除是否成功
         """
-        for i, account in enumerate(self.accounts):
-            if account["id"] == account_id:
-                del self.accounts[i]
-                self._save_accounts()
-                logger.info(f"刪除賬戶: {account_id}")
-                return True
-        
-        logger.warning(f"賬戶不存在: {account_id}")
-        return False
+        account = self._accounts_by_id.get(account_id)
+        if account is None:
+            logger.warning(f"賬戶不存在: {account_id}")
+            return False
+        
+        with self._store.lock:
+            self._store.check_open()
+            self._unindex_account(account)
+        self._store.mark_deleted(account_id)
+        logger.info(f"刪除賬戶: {account_id}")
+        return True
     
     def verify_account(self, account_id: str) -> Dict[str, Any]:
         """驗證賬戶狀態
@@ -181,7 +282,7 @@ class FacebookAccountManager:
             # 如果賬戶使用代理，設置代理
             proxies = None
             if account["use_proxy"] and account["proxy_id"]:
-                proxy = next((p for p in self.proxies if p["id"] == account["proxy_id"]), None)
+                proxy = self.get_proxy(account["proxy_id"])
                 if proxy:
                     proxies = {
                         "http": f"http://{proxy['ip']}:{proxy['port']}",
@@ -228,6 +329,8 @@ class FacebookAccountManager:
         """
         created_accounts = []
         
+        # 不在整個循環期間使用批量上下文：每個新賬戶在延遲之前寫入（或按 flush_interval 合併寫入），
+        # 中途退出時已創建的賬戶不會丟失
         for i in range(count):
             # 生成唯一用戶名和郵箱
             username = template.get("username", "user") + str(i+1)
@@ -281,6 +384,7 @@ class FacebookAccountManager:
         }
         
         self.proxies.append(proxy)
+        self._proxies_by_id[proxy_id] = proxy
         save_json(self.proxies_file, self.proxies)
         
         logger.info(f"添加新代理: {ip}:{port}")
@@ -293,7 +397,8 @@ class FacebookAccountManager:
         # 這裡可以添加賬戶管理的主要邏輯
         # 例如定期檢查賬戶狀態、輪換代理等
         
-        # 示例：驗證所有賬戶
+        # 示例：驗證所有賬戶。每個賬戶的狀態更新在延遲之前寫入（或按 flush_interval 合併寫入），
+        # 不在包含延遲的整個循環期間使用批量上下文
         for account in self.accounts:
             if account["status"] != "deleted":
                 logger.info(f"驗證賬戶: {account['username']}")
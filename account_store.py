@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+賬戶持久化模塊
+
+這個模塊為賬戶管理器提供持久化功能，包括：
+- JSON文件存儲（原子寫入）
+- SQLite存儲（按記錄增量寫入）
+- 髒數據跟蹤
+- 延遲合併寫入與批量寫入
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Iterable
+
+from utils import save_json, load_json
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+
+class JsonAccountBackend:
+    """JSON文件賬戶存儲，每次保存時原子地重寫整個文件"""
+    
+    def __init__(self, file_path: str, indent: int = 4):
+        """初始化JSON存儲
+        
+        Args:
+            file_path: 賬戶文件路徑
+            indent: JSON縮進空格數
+        """
+        self.file_path = file_path
+        self.indent = indent
+    
+    def load(self) -> List[Dict[str, Any]]:
+        """加載所有賬戶"""
+        return load_json(self.file_path, default=[])
+    
+    def save(self, accounts: Dict[str, Dict[str, Any]], changed_ids: Iterable[str], deleted_ids: Iterable[str]) -> bool:
+        """保存賬戶
+        
+        Args:
+            accounts: 當前所有賬戶（按ID索引）
+            changed_ids: 新增或修改的賬戶ID
+            deleted_ids: 已刪除的賬戶ID
+        
+        Returns:
+            是否成功保存
+        """
+        return save_json(self.file_path, list(accounts.values()), indent=self.indent)
+    
+    def close(self) -> None:
+        """關閉存儲"""
+
+
+class SqliteAccountBackend:
+    """SQLite賬戶存儲，只寫入發生變化的賬戶"""
+    
+    def __init__(self, db_path: str, import_file: str = None):
+        """初始化SQLite存儲
+        
+        Args:
+            db_path: 數據庫文件路徑
+            import_file: 數據庫為空時導入的JSON賬戶文件（可選）
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        
+        # 寫入可能發生在延遲寫入線程中
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "id TEXT UNIQUE NOT NULL, "
+            "data TEXT NOT NULL)"
+        )
+        self.conn.commit()
+        
+        if import_file and os.path.exists(import_file) and not self._count():
+            accounts = load_json(import_file, default=[])
+            self.save({account["id"]: account for account in accounts}, [account["id"] for account in accounts], [])
+            logger.info(f"已從 {import_file} 導入 {len(accounts)} 個賬戶到 {db_path}")
+    
+    def _count(self) -> int:
+        """返回賬戶數量"""
+        return self.conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+    
+    def load(self) -> List[Dict[str, Any]]:
+        """加載所有賬戶（按創建順序）"""
+        rows = self.conn.execute("SELECT data FROM accounts ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def save(self, accounts: Dict[str, Dict[str, Any]], changed_ids: Iterable[str], deleted_ids: Iterable[str]) -> bool:
+        """在一個事務中寫入變化的賬戶
+        
+        Args:
+            accounts: 當前所有賬戶（按ID索引）
+            changed_ids: 新增或修改的賬戶ID
+            deleted_ids: 已刪除的賬戶ID
+        
+        Returns:
+            是否成功保存
+        """
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "DELETE FROM accounts WHERE id = ?",
+                    [(account_id,) for account_id in deleted_ids]
+                )
+                self.conn.executemany(
+                    "INSERT INTO accounts (id, data) VALUES (?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                    [
+                        (account_id, json.dumps(accounts[account_id], ensure_ascii=False))
+                        for account_id in changed_ids if account_id in accounts
+                    ]
+                )
+            return True
+        except Exception as e:
+            logger.exception(f"保存賬戶到SQLite時出錯: {e}")
+            return False
+    
+    def close(self) -> None:
+        """關閉數據庫連接"""
+        self.conn.close()
+
+
+class AccountPersistence:
+    """延遲寫入的賬戶持久化層
+    
+    記錄自上次寫入以來變化的賬戶，並按以下方式合併寫入：
+    - flush_interval 為0時，每次修改後立即寫入
+    - flush_interval 大於0時，第一次修改後等待該秒數，再一次寫入期間的所有修改
+    - 在 batch() 上下文中的修改只在退出上下文時寫入一次
+    
+    關閉後再修改賬戶會拋出RuntimeError（修改無法再寫入存儲）。
+    """
+    
+    def __init__(self, backend, get_accounts: Callable[[], Dict[str, Dict[str, Any]]], flush_interval: float = 0):
+        """初始化持久化層
+        
+        Args:
+            backend: 存儲後端 (JsonAccountBackend, SqliteAccountBackend)
+            get_accounts: 返回當前所有賬戶（按ID索引）的函數
+            flush_interval: 延遲寫入的秒數
+        """
+        self.backend = backend
+        self.get_accounts = get_accounts
+        self.flush_interval = flush_interval
+        
+        # 修改賬戶數據和寫入時都需要持有此鎖
+        self.lock = threading.RLock()
+        
+        self._changed_ids = set()
+        self._deleted_ids = set()
+        self._batch_depth = 0
+        self._timer = None
+        self.write_count = 0
+        self.closed = False
+    
+    @property
+    def dirty(self) -> bool:
+        """是否有尚未寫入的修改"""
+        return bool(self._changed_ids or self._deleted_ids)
+    
+    def load(self) -> List[Dict[str, Any]]:
+        """從存儲後端加載所有賬戶"""
+        return self.backend.load()
+    
+    def check_open(self) -> None:
+        """確認存儲尚未關閉（修改賬戶之前調用，避免內存中的修改無法寫入）
+        
+        Raises:
+            RuntimeError: 存儲已關閉
+        """
+        if self.closed:
+            raise RuntimeError("賬戶存儲已關閉，不能再修改賬戶")
+    
+    def mark_changed(self, account_id: str) -> None:
+        """標記賬戶已新增或修改，並安排寫入"""
+        with self.lock:
+            self.check_open()
+            self._deleted_ids.discard(account_id)
+            self._changed_ids.add(account_id)
+        self._schedule_flush()
+    
+    def mark_deleted(self, account_id: str) -> None:
+        """標記賬戶已刪除，並安排寫入"""
+        with self.lock:
+            self.check_open()
+            self._changed_ids.discard(account_id)
+            self._deleted_ids.add(account_id)
+        self._schedule_flush()
+    
+    def _schedule_flush(self) -> None:
+        """根據當前模式立即寫入或安排延遲寫入"""
+        with self.lock:
+            if self._batch_depth:
+                return
+            if self.flush_interval <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self) -> bool:
+        """寫入所有未保存的修改
+        
+        Returns:
+            是否成功寫入（沒有待寫入的修改時返回True）
+        """
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            
+            if not self.dirty:
+                return True
+            
+            start_time = time.time()
+            if not self.backend.save(self.get_accounts(), self._changed_ids, self._deleted_ids):
+                # 保留髒數據，下次修改或關閉時重試
+                return False
+            
+            self.write_count += 1
+            logger.debug(f"已寫入 {len(self._changed_ids)} 個修改和 {len(self._deleted_ids)} 個刪除的賬戶，"
+                         f"耗時 {time.time() - start_time:.3f} 秒")
+            self._changed_ids.clear()
+            self._deleted_ids.clear()
+            return True
+    
+    @contextmanager
+    def batch(self):
+        """批量修改上下文，退出時只寫入一次"""
+        with self.lock:
+            self.check_open()
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self.dirty:
+                    self.flush()
+    
+    def close(self) -> None:
+        """寫入未保存的修改並關閉存儲後端（重複調用時不做任何事）"""
+        with self.lock:
+            if self.closed:
+                return
+            self.flush()
+            self.backend.close()
+            self.closed = True
+
+
+def create_account_persistence(config, get_accounts: Callable[[], Dict[str, Dict[str, Any]]]) -> AccountPersistence:
+    """根據配置創建賬戶持久化層
+    
+    Args:
+        config: 配置對象
+        get_accounts: 返回當前所有賬戶（按ID索引）的函數
+    
+    Returns:
+        賬戶持久化層
+    """
+    accounts_file = config.get('Files', 'accounts_file', fallback='accounts.json')
+    backend_type = config.get('Account', 'storage_backend', fallback='json').lower()
+    flush_interval = config.getfloat('Account', 'flush_interval', fallback=0)
+    
+    if backend_type == "sqlite":
+        db_path = config.get('Files', 'accounts_db', fallback=os.path.splitext(accounts_file)[0] + ".db")
+        backend = SqliteAccountBackend(db_path, import_file=accounts_file)
+    else:
+        if backend_type != "json":
+            logger.warning(f"不支持的賬戶存儲類型: {backend_type}，使用JSON存儲")
+        backend = JsonAccountBackend(accounts_file)
+    
+    return AccountPersistence(backend, get_accounts, flush_interval)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分析結果緩存模塊
+
+這個模塊緩存 run_analysis 的結果，包括：
+- 按內容尋址的緩存鍵：輸入文件內容的哈希、分析類型、分析參數和分析代碼版本
+- 輸入文件的內容哈希按（路徑, 大小, 修改時間）在進程內記憶，未變化的文件只需要一次stat
+- 緩存條目保存在磁盤上（跨進程共享），按條目數和總大小淘汰最久未使用的條目
+- 命中、未命中和淘汰計數
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from utils import save_json, load_json
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 緩存條目格式版本，條目結構變化時遞增
+CACHE_FORMAT_VERSION = 1
+
+# 結果中引用的輸出文件（命中時檢查它們仍然存在）
+OUTPUT_PATH_KEYS = ("report_path", "ad_chart_path", "engagement_chart_path")
+
+
+def _to_builtin(value: Any) -> Any:
+    """把 numpy 標量等轉換為JSON可以序列化的值"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class AnalysisCache:
+    """磁盤上的分析結果緩存"""
+    
+    def __init__(self, cache_dir: str, max_entries: int = 64, max_bytes: int = 50 * 1024 * 1024):
+        """
+        初始化緩存
+        
+        Args:
+            cache_dir: 緩存目錄
+            max_entries: 最多保留的條目數
+            max_bytes: 所有條目的最大總大小（字節）
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        
+        self._lock = threading.Lock()
+        self._file_hashes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def file_hash(self, file_path: str) -> Optional[str]:
+        """
+        返回文件內容的哈希（文件大小和修改時間未變時使用記憶的結果）
+        
+        Args:
+            file_path: 文件路徑
+        
+        Returns:
+            SHA-256哈希，文件不存在時返回None
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._file_hashes.get(file_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        
+        with self._lock:
+            self._file_hashes[file_path] = (signature, content_hash)
+        return content_hash
+    
+    def key(self, inputs: List[Tuple[str, str]], **params) -> str:
+        """
+        計算緩存鍵
+        
+        Args:
+            inputs: 輸入文件列表 [(數據類型, 文件路徑)]
+            **params: 影響結果的參數（分析類型、報告格式、代碼版本等）
+        
+        Returns:
+            緩存鍵
+        """
+        # 只按內容尋址：文件改名或重新保存相同內容不影響緩存鍵
+        hashes = sorted(f"{data_type}:{self.file_hash(path)}" for data_type, path in inputs)
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"format": CACHE_FORMAT_VERSION, "params": params},
+                                 sort_keys=True, default=str).encode("utf-8"))
+        for line in hashes:
+            digest.update(line.encode("utf-8") + b"\n")
+        return digest.hexdigest()
+    
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        查找緩存的分析結果
+        
+        Args:
+            key: 緩存鍵
+        
+        Returns:
+            帶有 cache 信息的分析結果，未命中時返回None
+        """
+        entry_path = self._entry_path(key)
+        entry = load_json(entry_path) if os.path.exists(entry_path) else None
+        
+        results = entry.get("results") if isinstance(entry, dict) else None
+        if results is not None and any(results.get(name) and not os.path.exists(results[name])
+                                       for name in OUTPUT_PATH_KEYS):
+            # 報告或圖表已被刪除，重新分析
+            self._remove(entry_path)
+            results = None
+        
+        with self._lock:
+            if results is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        
+        # 更新訪問時間，用於淘汰最久未使用的條目
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        
+        results["cache"] = {"hit": True, "key": key, "created_at": entry.get("created_at")}
+        logger.info(f"分析結果命中緩存: {key[:12]}")
+        return results
+    
+    def put(self, key: str, results: Dict[str, Any]) -> None:
+        """
+        保存分析結果並按大小限制淘汰舊條目
+        
+        Args:
+            key: 緩存鍵
+            results: 分析結果
+        """
+        entry = {
+            "key": key,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": {name: value for name, value in results.items() if name != "cache"}
+        }
+        try:
+            entry = json.loads(json.dumps(entry, ensure_ascii=False, default=_to_builtin))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"無法緩存分析結果: {e}")
+            return
+        
+        if save_json(self._entry_path(key), entry, indent=None):
+            self._evict()
+    
+    def _remove(self, entry_path: str) -> None:
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+    
+    def _evict(self) -> None:
+        """淘汰最久未使用的條目，直到條目數和總大小都在限制之內"""
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for item in scan:
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, item.path))
+        
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        evicted = 0
+        # 至少保留最新的條目
+        while len(entries) > 1 and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, entry_path = entries.pop(0)
+            self._remove(entry_path)
+            total_bytes -= size
+            evicted += 1
+        
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            logger.debug(f"分析結果緩存淘汰了 {evicted} 個條目")
+    
+    def clear(self) -> None:
+        """刪除所有緩存條目"""
+        with os.scandir(self.cache_dir) as scan:
+            for item in scan:
+                if item.name.endswith(".json"):
+                    self._remove(item.path)
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回命中、未命中、淘汰計數和當前條目"""
+        entries = 0
+        total_bytes = 0
+        with os.scandir(self.cache_dir) as scan:
+            for item in scan:
+                if item.name.endswith(".json"):
+                    entries += 1
+                    try:
+                        total_bytes += item.stat().st_size
+                    except OSError:
+                        pass
+        
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": total_bytes
+            }
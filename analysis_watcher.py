@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+增量分析模塊
+
+這個模塊在數據目錄出現新的收集結果時增量更新分析報告，包括：
+- 定時檢查廣告和頁面數據目錄中新增、修改和刪除的數據文件（按文件大小和修改時間判斷）
+- 每個數據文件只解析一次，保留其部分聚合結果；新文件直接累加到維護的總聚合中，
+  文件被修改或刪除時用其餘文件的部分聚合重新合併，不重新讀取任何文件
+- 只重新計算有變化的數據類型的分析結果和圖表，其他部分沿用上次的結果，再重新生成報告
+"""
+
+import os
+import time
+import logging
+import threading
+from configparser import ConfigParser
+from typing import Dict, List, Any, Optional, Tuple
+
+from utils import is_data_file
+from tracing import span
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 分析類型對應的數據目錄
+DATA_TYPES = {
+    "ad_performance": "ad_data",
+    "page_engagement": "page"
+}
+
+# 互動最高的帖子數量（與 FacebookDataAnalyzer.page_partial 一致）
+TOP_POSTS = 5
+
+
+def merge_ad_partials(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    合併兩個廣告部分聚合結果
+    
+    Args:
+        left: FacebookDataAnalyzer.ad_partial 的結果
+        right: FacebookDataAnalyzer.ad_partial 的結果
+    
+    Returns:
+        合併後的部分聚合結果
+    """
+    return {
+        "campaigns": left["campaigns"] + right["campaigns"],
+        "by_campaign": left["by_campaign"].add(right["by_campaign"], fill_value=0),
+        "conversions": left["conversions"].add(right["conversions"], fill_value=0)
+    }
+
+
+def merge_page_partials(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    合併兩個頁面部分聚合結果
+    
+    Args:
+        left: FacebookDataAnalyzer.page_partial 的結果
+        right: FacebookDataAnalyzer.page_partial 的結果
+    
+    Returns:
+        合併後的部分聚合結果
+    """
+    top_posts = sorted(left["top_posts"] + right["top_posts"],
+                       key=lambda post: post["total_engagement"], reverse=True)[:TOP_POSTS]
+    return {
+        "pages": left["pages"] + right["pages"],
+        "fans": left["fans"] + right["fans"],
+        "verified": left["verified"] + right["verified"],
+        "posts": left["posts"] + right["posts"],
+        "engagement": left["engagement"].add(right["engagement"], fill_value=0),
+        "top_posts": top_posts
+    }
+
+
+class AnalysisWatcher:
+    """監視數據目錄並增量更新分析報告"""
+    
+    def __init__(self, analyzer, config: ConfigParser, analysis_type: str = "all",
+                 interval: float = None):
+        """
+        初始化監視器
+        
+        Args:
+            analyzer: 數據分析器實例
+            config: 配置對象
+            analysis_type: 分析類型 (ad_performance, page_engagement, all)
+            interval: 檢查數據目錄的間隔秒數（默認使用 [Analysis] watch_interval）
+        """
+        self.analyzer = analyzer
+        self.analysis_type = analysis_type
+        self.interval = interval if interval is not None else \
+            config.getfloat('Analysis', 'watch_interval', fallback=5.0)
+        self.generate_charts = config.getboolean('Analysis', 'generate_charts', fallback=True)
+        self.report_format = config.get('Analysis', 'default_report_format', fallback='html')
+        
+        self.sections = [section for section in DATA_TYPES if analysis_type in (section, "all")]
+        
+        # 每個分析類型: {文件路徑: (文件簽名, 部分聚合結果)} 和維護的總聚合結果
+        self._files = {section: {} for section in self.sections}
+        self._totals = {section: None for section in self.sections}
+        
+        # 上次的分析結果（按分析類型分節緩存）
+        self.results = {}
+        self.refreshes = 0
+    
+    def _partial(self, section: str, data: Any) -> Dict[str, Any]:
+        """計算一個數據文件（或空數據）的部分聚合結果"""
+        if section == "ad_performance":
+            return self.analyzer.ad_partial(data if isinstance(data, list) else [data])
+        return self.analyzer.page_partial([data] if data else [])
+    
+    def _merge(self, section: str, left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+        """合併兩個部分聚合結果"""
+        if section == "ad_performance":
+            return merge_ad_partials(left, right)
+        return merge_page_partials(left, right)
+    
+    def _scan(self, section: str) -> Dict[str, Tuple[int, int]]:
+        """返回數據目錄中的數據文件及其簽名（大小, 修改時間）"""
+        type_dir = os.path.join(self.analyzer.data_dir, DATA_TYPES[section])
+        files = {}
+        try:
+            with os.scandir(type_dir) as entries:
+                for entry in entries:
+                    if not is_data_file(entry.name):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return files
+    
+    def poll(self) -> List[str]:
+        """
+        檢查數據目錄並更新聚合結果
+        
+        Returns:
+            聚合結果有變化的分析類型
+        """
+        changed = []
+        for section in self.sections:
+            known = self._files[section]
+            current = self._scan(section)
+            
+            removed = [path for path in known if path not in current]
+            modified = [path for path, signature in current.items()
+                        if path in known and known[path][0] != signature]
+            added = [path for path in current if path not in known]
+            if not (removed or modified or added):
+                continue
+            
+            with span("watch.fold", "analyze", section=section, added=len(added),
+                      modified=len(modified), removed=len(removed)):
+                for path in removed:
+                    del known[path]
+                
+                new_partials = []
+                for path in modified + added:
+                    data = self.analyzer.load_data(path)
+                    if not data:
+                        # 文件可能仍在寫入，下次檢查時重試
+                        known.pop(path, None)
+                        continue
+                    known[path] = (current[path], self._partial(section, data))
+                    new_partials.append(known[path][1])
+                
+                total = self._totals[section]
+                if removed or modified or total is None:
+                    # 已計入的文件有變化：用所有文件的部分聚合重新合併（不重新讀取文件）
+                    total = self._partial(section, [])
+                    for _, partial in known.values():
+                        total = self._merge(section, total, partial)
+                else:
+                    # 只有新文件：累加到維護的總聚合
+                    for partial in new_partials:
+                        total = self._merge(section, total, partial)
+                self._totals[section] = total
+            
+            logger.info(f"{DATA_TYPES[section]} 數據變化: 新增 {len(added)} 個文件，"
+                        f"修改 {len(modified)} 個，刪除 {len(removed)} 個")
+            changed.append(section)
+        
+        return changed
+    
+    def refresh(self, sections: List[str]) -> Dict[str, Any]:
+        """
+        重新計算有變化的分析結果和圖表，並重新生成報告
+        
+        Args:
+            sections: 有變化的分析類型
+        
+        Returns:
+            分析結果和報告路徑
+        """
+        for section in sections:
+            chart_key = "ad_chart_path" if section == "ad_performance" else "engagement_chart_path"
+            self.results.pop(section, None)
+            self.results.pop(chart_key, None)
+            if not self._files[section]:
+                continue
+            
+            if section == "ad_performance":
+                analysis = self.analyzer.ad_performance_from_partial(self._totals[section])
+            else:
+                analysis = self.analyzer.page_engagement_from_partial(self._totals[section])
+            self.results[section] = analysis
+            
+            # 生成圖表
+            if self.generate_charts and analysis.get("success", False):
+                if section == "ad_performance":
+                    chart_path = self.analyzer.generate_ad_performance_chart(analysis)
+                else:
+                    chart_path = self.analyzer.generate_engagement_chart(analysis)
+                if chart_path:
+                    self.results[chart_key] = chart_path
+        
+        results = dict(self.results)
+        if any(section in results for section in self.sections):
+            results["report_path"] = self.analyzer.generate_report(results, self.report_format)
+            results["success"] = True
+        else:
+            results["success"] = False
+            results["error"] = "沒有可分析的數據"
+        
+        self.refreshes += 1
+        results["updated_sections"] = sections
+        return results
+    
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """
+        檢查一次數據目錄，有變化時更新報告
+        
+        Returns:
+            更新後的分析結果，沒有變化時返回None
+        """
+        sections = self.poll()
+        if not sections:
+            return None
+        
+        results = self.refresh(sections)
+        if results.get("success"):
+            logger.info(f"已更新 {', '.join(sections)}，報告已保存到: {results.get('report_path')}")
+        else:
+            logger.warning(f"分析未完成: {results.get('error', '未知錯誤')}")
+        return results
+    
+    def watch(self, stop_event: threading.Event = None, max_iterations: int = None) -> Dict[str, Any]:
+        """
+        持續監視數據目錄，直到中斷或 stop_event 被設置
+        
+        Args:
+            stop_event: 停止事件（可選）
+            max_iterations: 最多檢查的次數（可選）
+        
+        Returns:
+            最後一次的分析結果
+        """
+        stop_event = stop_event or threading.Event()
+        logger.info(f"開始監視數據目錄 {self.analyzer.data_dir}，檢查間隔 {self.interval} 秒")
+        
+        results = {}
+        iterations = 0
+        try:
+            while not stop_event.is_set():
+                started = time.monotonic()
+                try:
+                    results = self.run_once() or results
+                except Exception as e:
+                    logger.exception(f"增量分析時出錯: {e}")
+                
+                iterations += 1
+                if max_iterations is not None and iterations >= max_iterations:
+                    break
+                stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            logger.info("停止監視數據目錄")
+        
+        return results
@@ -0,0 +1,1159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+API服務器模塊
+
+這個模塊為儀表板提供異步HTTP API（只依賴標準庫 asyncio），包括：
+- 從預先計算的聚合結果提供分頁、可過濾、可排序的廣告系列和洞察數據查詢
+- 廣告表現分析結果（每個數據版本只運行一次 analyze_ad_performance）
+- ETag / If-None-Match（304）支持
+- 進程內響應緩存，數據目錄出現新的收集結果時失效
+- 收集任務的提交和狀態查詢（在線程池中運行，不阻塞事件循環）
+- 收集進度事件流（Server-Sent Events），慢速客戶端只會丟失自己隊列中最舊的事件，不會阻塞收集線程
+- 收集、分析和導出任務的提交和結果查詢，守護進程模式下同時監聽本地Unix套接字
+- 提交任務只接受Unix套接字上的請求，或TCP上帶有 [Server] api_token 令牌的請求；任務讀寫的文件限制在數據和報告目錄中
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import hmac
+import hashlib
+import logging
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qsl
+from typing import Dict, List, Any, Optional, Tuple
+
+from utils import load_json, iter_json_records, is_data_file
+from tracing import span
+from progress import TASK_FINISHED
+from task_scheduler import PENDING, RUNNING, COMPLETED, FAILED
+from export_utils import export_data, DEFAULT_CHUNK_SIZE
+from compaction import SnapshotCompactor
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 可以提交的任務類型
+JOB_KINDS = ("collect", "analyze", "export", "compact")
+
+# 分頁參數
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 進度事件流沒有新事件時發送心跳的間隔（秒）
+SSE_HEARTBEAT_SECONDS = 15.0
+
+# 請求頭和請求體的大小上限
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+# 可以通過API返回的賬戶字段（不包含密碼和訪問令牌）
+ACCOUNT_PUBLIC_FIELDS = ("id", "username", "email", "status", "created_at", "last_login", "use_proxy", "proxy_id")
+
+# 廣告系列和洞察數據中轉換為數值的指標
+NUMERIC_FIELDS = ("impressions", "clicks", "spend", "reach", "ctr", "cpc", "cpm", "frequency")
+
+HTTP_REASONS = {
+    200: "OK", 202: "Accepted", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+    401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"
+}
+
+
+def _to_number(value: Any) -> float:
+    """把Graph API返回的字符串指標轉換為數值"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _json_default(value: Any) -> Any:
+    """序列化numpy等類型"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _derive_rates(row: Dict[str, Any]) -> Dict[str, Any]:
+    """計算CTR、CPC和CPM"""
+    impressions, clicks, spend = row["impressions"], row["clicks"], row["spend"]
+    row["ctr"] = clicks / impressions * 100 if impressions else 0.0
+    row["cpc"] = spend / clicks if clicks else 0.0
+    row["cpm"] = spend / impressions * 1000 if impressions else 0.0
+    return row
+
+
+def data_fingerprint(data_dir: str) -> str:
+    """
+    返回數據目錄中所有收集結果文件的指紋（文件名、大小和修改時間）
+    
+    Args:
+        data_dir: 數據目錄
+    
+    Returns:
+        指紋，任何收集結果文件增加、刪除或修改時都會變化
+    """
+    digest = hashlib.sha1()
+    if not os.path.isdir(data_dir):
+        return digest.hexdigest()
+    
+    for type_entry in sorted(os.scandir(data_dir), key=lambda entry: entry.name):
+        if not type_entry.is_dir():
+            continue
+        for entry in sorted(os.scandir(type_entry.path), key=lambda entry: entry.name):
+            if not is_data_file(entry.name):
+                continue
+            stat = entry.stat()
+            digest.update(f"{type_entry.name}/{entry.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AdAggregates:
+    """從收集的廣告數據預先計算的聚合結果"""
+    
+    def __init__(self, version: str, campaigns: List[Dict], insights: List[Dict], performance: Dict,
+                 files: List[Dict]):
+        self.version = version
+        self.campaigns = campaigns
+        self.insights = insights
+        self.performance = performance
+        self.files = files
+        self.built_at = datetime.now().isoformat()
+
+
+def build_aggregates(data_dir: str, data_analyzer, version: str) -> AdAggregates:
+    """
+    讀取數據目錄並計算聚合結果
+    
+    同一廣告系列或洞察記錄出現在多個文件中時，使用最新文件中的數據。
+    
+    Args:
+        data_dir: 數據目錄
+        data_analyzer: 數據分析器實例（用於計算廣告表現）
+        version: 數據版本（data_fingerprint 的結果）
+    
+    Returns:
+        聚合結果
+    """
+    files = []
+    if os.path.isdir(data_dir):
+        for type_entry in os.scandir(data_dir):
+            if not type_entry.is_dir():
+                continue
+            for entry in os.scandir(type_entry.path):
+                if is_data_file(entry.name):
+                    stat = entry.stat()
+                    files.append({
+                        "type": type_entry.name,
+                        "file": entry.name,
+                        "path": entry.path,
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime,
+                        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
+                    })
+    # 按修改時間排序，後讀取的文件覆蓋先讀取的
+    files.sort(key=lambda item: (item["mtime"], item["file"]))
+    
+    campaigns = {}
+    raw_campaigns = {}
+    insights = {}
+    with span("server.aggregate", "server", files=len(files)) as aggregate_span:
+        for item in files:
+            if item["type"] != "ad_data":
+                continue
+            accounts = load_json(item["path"], default=[])
+            if not isinstance(accounts, list):
+                continue
+            
+            for account_data in accounts:
+                ad_account_id = (account_data.get("account") or {}).get("id")
+                for campaign in account_data.get("campaigns") or []:
+                    row = {
+                        "campaign_id": campaign.get("id"),
+                        "name": campaign.get("name"),
+                        "ad_account_id": ad_account_id,
+                        "objective": campaign.get("objective"),
+                        "status": campaign.get("status"),
+                        "daily_budget": _to_number(campaign.get("daily_budget")),
+                        "impressions": 0.0,
+                        "clicks": 0.0,
+                        "spend": 0.0,
+                        "reach": 0.0,
+                        "collected_at": item["modified"]
+                    }
+                    for insight in (campaign.get("insights") or {}).get("data", []):
+                        for field in ("impressions", "clicks", "spend", "reach"):
+                            row[field] += _to_number(insight.get(field))
+                    campaigns[row["campaign_id"]] = _derive_rates(row)
+                    raw_campaigns[row["campaign_id"]] = campaign
+                
+                for insight in account_data.get("insights") or []:
+                    row = dict(insight)
+                    row["ad_account_id"] = ad_account_id
+                    for field in NUMERIC_FIELDS:
+                        if field in row:
+                            row[field] = _to_number(row[field])
+                    key = tuple(row.get(field) for field in (
+                        "ad_account_id", "campaign_id", "adset_id", "ad_id", "date_start", "date_stop"
+                    ))
+                    insights[key] = row
+        
+        aggregate_span.set(campaigns=len(campaigns), insights=len(insights))
+    
+    # 廣告表現分析只在數據版本變化時運行一次
+    if raw_campaigns:
+        performance = data_analyzer.analyze_ad_performance([{"campaigns": list(raw_campaigns.values())}])
+    else:
+        performance = {"success": False, "error": "沒有廣告數據"}
+    
+    for index, item in enumerate(sorted(files, key=lambda item: item["mtime"], reverse=True), 1):
+        item["id"] = index
+        del item["path"]
+    
+    logger.info(f"聚合結果已更新: {len(files)} 個數據文件，{len(campaigns)} 個廣告系列，{len(insights)} 條洞察數據")
+    return AdAggregates(version, list(campaigns.values()), list(insights.values()), performance,
+                        sorted(files, key=lambda item: item["id"]))
+
+
+def query_rows(rows: List[Dict], params: Dict[str, str], filter_fields: Tuple[str, ...],
+               search_fields: Tuple[str, ...], default_sort: str) -> Dict[str, Any]:
+    """
+    過濾、排序並分頁
+    
+    支持的查詢參數：
+    - <字段>=a,b: filter_fields 中的字段等於其中一個值
+    - q: search_fields 中任何一個字段包含該文本（不區分大小寫）
+    - min_<指標> / max_<指標>: 數值指標的範圍
+    - sort: 排序字段（默認 default_sort），order: asc 或 desc（默認desc）
+    - limit / offset: 分頁
+    
+    Args:
+        rows: 數據行
+        params: 查詢參數
+        filter_fields: 可以精確過濾的字段
+        search_fields: q 參數搜索的字段
+        default_sort: 默認排序字段
+    
+    Returns:
+        包含 total, limit, offset 和 data 的分頁結果
+    
+    Raises:
+        ValueError: 查詢參數無效
+    """
+    try:
+        limit = min(int(params.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        offset = int(params.get("offset", 0))
+    except ValueError:
+        raise ValueError("limit 和 offset 必須是整數")
+    if limit < 0 or offset < 0:
+        raise ValueError("limit 和 offset 不能為負數")
+    
+    filters = {field: set(params[field].split(",")) for field in filter_fields if params.get(field)}
+    search = params.get("q", "").lower()
+    ranges = []
+    for key, value in params.items():
+        bound, _, field = key.partition("_")
+        if bound in ("min", "max") and field in NUMERIC_FIELDS:
+            try:
+                ranges.append((bound, field, float(value)))
+            except ValueError:
+                raise ValueError(f"{key} 必須是數值")
+    
+    def matches(row):
+        if any(str(row.get(field)) not in values for field, values in filters.items()):
+            return False
+        if search and not any(search in str(row.get(field) or "").lower() for field in search_fields):
+            return False
+        for bound, field, value in ranges:
+            number = row.get(field) or 0
+            if (bound == "min" and number < value) or (bound == "max" and number > value):
+                return False
+        return True
+    
+    selected = [row for row in rows if matches(row)]
+    
+    sort_field = params.get("sort", default_sort)
+    if selected and sort_field not in selected[0]:
+        raise ValueError(f"不支持的排序字段: {sort_field}")
+    descending = params.get("order", "desc").lower() != "asc"
+    
+    def sort_key(row):
+        value = row.get(sort_field)
+        return (value is not None, value if isinstance(value, (int, float)) else str(value or ""))
+    
+    selected.sort(key=sort_key, reverse=descending)
+    
+    return {"total": len(selected), "limit": limit, "offset": offset, "data": selected[offset:offset + limit]}
+
+
+class ResultCache:
+    """按數據版本失效的響應緩存（最近最少使用淘汰）"""
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.version = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str, version: str) -> Optional[Tuple[str, bytes]]:
+        """
+        返回緩存的 (ETag, 響應體)
+        
+        Args:
+            key: 請求鍵
+            version: 當前數據版本，與緩存版本不同時清空緩存
+        """
+        if version != self.version:
+            self.clear()
+            self.version = version
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+    
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        """緩存一個響應"""
+        self._entries[key] = (etag, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """清空緩存"""
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回緩存統計"""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class EventStream:
+    """進度事件流響應"""
+    
+    def __init__(self, subscription, until_finished: bool = False):
+        """
+        Args:
+            subscription: 事件總線的訂閱
+            until_finished: 收到任務完成事件後結束事件流
+        """
+        self.subscription = subscription
+        self.until_finished = until_finished
+
+
+class Request:
+    """一個HTTP請求"""
+    
+    __slots__ = ("method", "path", "params", "headers", "body", "route_args", "local")
+    
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes, local: bool = False):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip("/") or "/"
+        self.params = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+        self.route_args = {}
+        # 是否來自本地Unix套接字
+        self.local = local
+    
+    def json(self) -> Any:
+        """解析JSON請求體"""
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body.decode("utf-8"))
+        except ValueError:
+            raise ValueError("請求體不是有效的JSON")
+
+
+class ApiServer:
+    """儀表板API服務器"""
+    
+    def __init__(self, account_manager, data_collector, data_analyzer, config: ConfigParser):
+        """
+        初始化服務器
+        
+        Args:
+            account_manager: 賬戶管理器實例
+            data_collector: 數據收集器實例
+            data_analyzer: 數據分析器實例
+            config: 配置對象
+        """
+        self.account_manager = account_manager
+        self.data_collector = data_collector
+        self.data_analyzer = data_analyzer
+        self.config = config
+        
+        self.host = config.get('Server', 'host', fallback='127.0.0.1')
+        self.port = config.getint('Server', 'port', fallback=8000)
+        self.data_dir = config.get('Files', 'data_dir', fallback='data')
+        # 檢查數據目錄變化的最短間隔（秒）
+        self.refresh_interval = config.getfloat('Server', 'refresh_interval', fallback=2.0)
+        # 允許跨域讀取的來源（只用於GET請求，默認不允許跨域）
+        self.cors_origin = config.get('Server', 'cors_origin', fallback='')
+        # 本地Unix套接字（可選，守護進程模式默認啟用）
+        self.unix_socket = config.get('Server', 'unix_socket', fallback='')
+        # TCP上提交任務需要的令牌（Authorization: Bearer <令牌>）；未設置時只能通過Unix套接字提交任務
+        self.api_token = config.get('Server', 'api_token', fallback='')
+        # 任務可以讀寫的目錄（導出的輸入和輸出、分析的數據源）
+        self.reports_dir = config.get('Files', 'reports_dir', fallback='reports')
+        self.file_roots = (self.data_dir, self.reports_dir)
+        
+        self.cache = ResultCache(config.getint('Server', 'cache_entries', fallback=256))
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.getint('Collection', 'max_workers', fallback=4), thread_name_prefix="api-task"
+        )
+        
+        self._aggregates = None
+        self._checked_at = 0.0
+        self._refresh_lock = None
+        self._server = None
+        self._unix_server = None
+        
+        # 收集、分析和導出任務（保留最近 max_jobs 個已完成的任務）
+        self.jobs = OrderedDict()
+        self.max_jobs = config.getint('Server', 'max_jobs', fallback=500)
+        self._job_events = {}
+        self._task_sequence = 0
+        self._tasks_lock = threading.Lock()
+        self._analysis_lock = threading.Lock()
+        self._loop = None
+        
+        # (方法, 路徑正則, 處理函數, 是否可緩存)
+        # 響應緩存只按數據版本失效，包含任務狀態、進度等實時數據的路由不能緩存
+        self.routes = [
+            ("GET", r"/", self.handle_health, False),
+            ("GET", r"/api/health", self.handle_health, False),
+            ("GET", r"/api/stats", self.handle_stats, False),
+            ("GET", r"/api/campaigns", self.handle_campaigns, True),
+            ("GET", r"/api/insights", self.handle_insights, True),
+            ("GET", r"/api/campaign-changes", self.handle_campaign_changes, False),
+            ("GET", r"/api/ad-performance", self.handle_ad_performance, True),
+            ("GET", r"/api/data", self.handle_data_files, True),
+            ("GET", r"/api/accounts", self.handle_accounts, False),
+            ("GET", r"/api/tasks", self.handle_list_tasks, False),
+            ("POST", r"/api/tasks", self.handle_create_task, False),
+            ("GET", r"/api/tasks/(?P<task_id>[^/]+)", self.handle_get_task, False),
+            ("GET", r"/api/events", self.handle_events, False),
+            ("GET", r"/api/jobs", self.handle_list_jobs, False),
+            ("POST", r"/api/jobs", self.handle_create_job, False),
+            ("GET", r"/api/jobs/(?P<job_id>[^/]+)", self.handle_get_job, False)
+        ]
+        self._compiled_routes = [
+            (method, re.compile(f"^{pattern}$"), handler, cacheable)
+            for method, pattern, handler, cacheable in self.routes
+        ]
+    
+    async def aggregates(self) -> AdAggregates:
+        """
+        返回當前的聚合結果
+        
+        每隔 refresh_interval 秒檢查一次數據目錄指紋，指紋變化時在線程池中重新計算聚合結果。
+        """
+        if self._aggregates is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return self._aggregates
+        
+        async with self._refresh_lock:
+            if self._aggregates is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+                version = await asyncio.to_thread(data_fingerprint, self.data_dir)
+                if self._aggregates is None or version != self._aggregates.version:
+                    self._aggregates = await asyncio.to_thread(
+                        build_aggregates, self.data_dir, self.data_analyzer, version
+                    )
+                self._checked_at = time.monotonic()
+        return self._aggregates
+    
+    def invalidate(self) -> None:
+        """讓下一個請求重新檢查數據目錄（收集任務完成後調用）"""
+        self._checked_at = 0.0
+    
+    # 路由處理函數：返回 (狀態碼, 響應內容)
+    
+    async def handle_health(self, request: Request) -> Tuple[int, Any]:
+        return 200, {"status": "ok", "message": "Server is running"}
+    
+    async def handle_stats(self, request: Request) -> Tuple[int, Any]:
+        aggregates = await self.aggregates()
+        files_by_type = {}
+        for item in aggregates.files:
+            files_by_type[item["type"]] = files_by_type.get(item["type"], 0) + 1
+        with self._tasks_lock:
+            task_statuses = [job["status"] for job in self.jobs.values()]
+        return 200, {
+            "accounts": len(self.account_manager.accounts) if self.account_manager else 0,
+            "data_files": files_by_type,
+            "campaigns": len(aggregates.campaigns),
+            "insights": len(aggregates.insights),
+            "tasks": {status: task_statuses.count(status) for status in set(task_statuses)},
+            "ad_summary": aggregates.performance.get("summary"),
+            "data_version": aggregates.version,
+            "updated_at": aggregates.built_at,
+            "progress_bus": self.data_collector.progress.stats() if self.data_collector else None,
+            "analysis_cache": self.data_analyzer.cache.stats()
+            if self.data_analyzer and self.data_analyzer.cache else None
+        }
+    
+    async def handle_campaigns(self, request: Request) -> Tuple[int, Any]:
+        aggregates = await self.aggregates()
+        return 200, query_rows(
+            aggregates.campaigns, request.params,
+            filter_fields=("campaign_id", "ad_account_id", "status", "objective"),
+            search_fields=("name", "campaign_id"),
+            default_sort="spend"
+        )
+    
+    async def handle_insights(self, request: Request) -> Tuple[int, Any]:
+        aggregates = await self.aggregates()
+        return 200, query_rows(
+            aggregates.insights, request.params,
+            filter_fields=("ad_account_id", "campaign_id", "adset_id", "ad_id", "date_start", "date_stop"),
+            search_fields=("campaign_name", "adset_name", "ad_name"),
+            default_sort="spend"
+        )
+    
+    async def handle_campaign_changes(self, request: Request) -> Tuple[int, Any]:
+        """
+        廣告系列變更日誌
+        
+        查詢參數 after=<序號> 只返回之後的變更（下游消費者傳入上次響應的 last_seq），
+        limit（默認50，最大500）、campaign_id、ad_account_id、change 篩選。
+        """
+        change_log = self.data_collector.campaign_changes if self.data_collector else None
+        if change_log is None:
+            return 404, {"success": False, "error": "未啟用廣告系列變更記錄"}
+        try:
+            after = int(request.params.get("after", 0))
+            limit = min(int(request.params.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            raise ValueError("after 和 limit 必須是整數")
+        
+        changes = change_log.changes(after, limit, request.params.get("campaign_id"),
+                                     request.params.get("ad_account_id"), request.params.get("change"))
+        return 200, {
+            "changes": changes,
+            "last_seq": changes[-1]["seq"] if changes else after,
+            "latest_seq": change_log.last_seq()
+        }
+    
+    async def handle_ad_performance(self, request: Request) -> Tuple[int, Any]:
+        aggregates = await self.aggregates()
+        return 200, aggregates.performance
+    
+    async def handle_data_files(self, request: Request) -> Tuple[int, Any]:
+        aggregates = await self.aggregates()
+        return 200, query_rows(
+            aggregates.files, request.params,
+            filter_fields=("type",),
+            search_fields=("file",),
+            default_sort="mtime"
+        )
+    
+    async def handle_accounts(self, request: Request) -> Tuple[int, Any]:
+        accounts = self.account_manager.accounts if self.account_manager else []
+        rows = [{field: account.get(field) for field in ACCOUNT_PUBLIC_FIELDS} for account in accounts]
+        return 200, query_rows(rows, request.params, filter_fields=("status",),
+                               search_fields=("username", "email"), default_sort="created_at")
+    
+    def _task_record(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """返回收集任務的狀態和最新進度（調用方需持有任務鎖）"""
+        record = {key: value for key, value in job.items() if key not in ("payload", "result")}
+        record["task_id"] = job["job_id"]
+        record["progress"] = self.data_collector.progress.snapshot(job["job_id"])
+        return record
+    
+    def _job_record(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """返回任務的狀態和結果（調用方需持有任務鎖）"""
+        record = {key: value for key, value in job.items() if key != "payload"}
+        if job["kind"] == "collect":
+            record["progress"] = self.data_collector.progress.snapshot(job["job_id"])
+        return record
+    
+    async def handle_list_tasks(self, request: Request) -> Tuple[int, Any]:
+        with self._tasks_lock:
+            jobs = sorted(self.jobs.values(), key=lambda job: job["sequence"], reverse=True)
+            return 200, [self._task_record(job) for job in jobs if job["kind"] == "collect"]
+    
+    async def handle_get_task(self, request: Request) -> Tuple[int, Any]:
+        with self._tasks_lock:
+            job = self.jobs.get(request.route_args["task_id"])
+            if job is None or job["kind"] != "collect":
+                return 404, {"success": False, "error": "任務不存在"}
+            return 200, self._task_record(job)
+    
+    async def handle_events(self, request: Request) -> Tuple[int, Any]:
+        """
+        進度事件流
+        
+        查詢參數 task_id 只接收該任務的事件，先補發該任務已發生的事件，收到任務完成事件後結束
+        （任務已經完成時立即結束）；
+        請求頭 Last-Event-ID 或查詢參數 after 補發該序號之後仍在歷史中的事件。
+        """
+        after = request.headers.get("last-event-id") or request.params.get("after")
+        try:
+            after = int(after) if after else None
+        except ValueError:
+            raise ValueError("Last-Event-ID 必須是整數")
+        task_id = request.params.get("task_id")
+        subscription = self.data_collector.progress.subscribe(task_id=task_id, after=after)
+        return 200, EventStream(subscription, until_finished=bool(task_id))
+    
+    async def handle_create_task(self, request: Request) -> Tuple[int, Any]:
+        task_config = request.json()
+        if not isinstance(task_config, dict):
+            raise ValueError("任務配置必須是JSON對象")
+        job = self.submit_job("collect", {"task": task_config}, task_config.get("task_id"))
+        with self._tasks_lock:
+            return 202, self._task_record(job)
+    
+    async def handle_list_jobs(self, request: Request) -> Tuple[int, Any]:
+        with self._tasks_lock:
+            jobs = sorted(self.jobs.values(), key=lambda job: job["sequence"], reverse=True)
+            rows = [{key: value for key, value in job.items() if key not in ("payload", "result")} for job in jobs]
+        return 200, query_rows(rows, request.params, filter_fields=("kind", "status", "type"),
+                               search_fields=("job_id",), default_sort="sequence")
+    
+    async def handle_get_job(self, request: Request) -> Tuple[int, Any]:
+        job_id = request.route_args["job_id"]
+        if job_id not in self.jobs:
+            return 404, {"success": False, "error": "任務不存在"}
+        await self._wait_for_job(job_id, request.params.get("wait"))
+        with self._tasks_lock:
+            return 200, self._job_record(self.jobs[job_id])
+    
+    async def handle_create_job(self, request: Request) -> Tuple[int, Any]:
+        """
+        提交任務
+        
+        請求體: {"kind": "collect" | "analyze" | "export" | "compact", "job_id": 可選, ...任務參數}
+        - collect: task（單個收集任務配置）或 tasks（多個任務，並發執行）
+        - analyze: analysis_type, data_source, generate_charts, report_format
+        - export: input（JSON文件）, format, output_dir, chunk_size
+        - compact: data_types, dry_run
+        
+        查詢參數 wait=<秒> 等待任務完成後返回結果（超時則返回當前狀態）。
+        """
+        payload = request.json()
+        if not isinstance(payload, dict):
+            raise ValueError("任務必須是JSON對象")
+        job = self.submit_job(payload.get("kind"), payload, payload.get("job_id"))
+        await self._wait_for_job(job["job_id"], request.params.get("wait"))
+        with self._tasks_lock:
+            job = self.jobs[job["job_id"]]
+            return (200 if job["status"] in (COMPLETED, FAILED) else 202), self._job_record(job)
+    
+    def submit_job(self, kind: str, payload: Dict[str, Any], job_id: str = None) -> Dict[str, Any]:
+        """
+        提交一個任務到線程池（必須在事件循環中調用）
+        
+        Args:
+            kind: 任務類型 (collect, analyze, export)
+            payload: 任務參數
+            job_id: 任務ID（可選）
+        
+        Returns:
+            任務記錄
+        
+        Raises:
+            ValueError: 任務參數無效或同ID的任務正在運行
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"不支持的任務類型: {kind}，可選: {', '.join(JOB_KINDS)}")
+        task_type = None
+        if kind == "collect":
+            tasks = payload.get("tasks") if "tasks" in payload else [payload.get("task")]
+            if not tasks or not all(isinstance(task, dict) and task.get("type") in ("page", "group", "ad_data")
+                                    for task in tasks):
+                raise ValueError("收集任務配置必須包含 type (page, group, ad_data)")
+            task_type = tasks[0]["type"] if "task" in payload else "batch"
+        elif kind == "export":
+            if not payload.get("input"):
+                raise ValueError("導出任務必須提供 input")
+            self.confined_path(payload["input"], "input")
+            if payload.get("output_dir"):
+                self.confined_path(payload["output_dir"], "output_dir")
+        elif kind == "analyze" and payload.get("data_source"):
+            self.confined_path(payload["data_source"], "data_source")
+        
+        with self._tasks_lock:
+            self._task_sequence += 1
+            job_id = str(job_id or f"{kind}_{self._task_sequence}")
+            if job_id in self.jobs and self.jobs[job_id]["status"] in (PENDING, RUNNING):
+                raise ValueError(f"任務 {job_id} 正在運行")
+            job = {
+                "job_id": job_id,
+                "kind": kind,
+                "type": task_type,
+                "sequence": self._task_sequence,
+                "status": PENDING,
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "seconds": None,
+                "file_path": None,
+                "error": None,
+                "result": None,
+                "payload": payload
+            }
+            self.jobs[job_id] = job
+            self._job_events[job_id] = asyncio.Event()
+            self._prune_jobs()
+        
+        asyncio.get_running_loop().run_in_executor(self.executor, self._run_job, job_id)
+        return job
+    
+    def confined_path(self, path: str, name: str) -> str:
+        """
+        檢查任務參數中的路徑位於數據目錄或報告目錄中
+        
+        Args:
+            path: 路徑
+            name: 參數名（用於錯誤信息）
+        
+        Returns:
+            解析符號鏈接後的絕對路徑
+        
+        Raises:
+            ValueError: 路徑不在允許的目錄中
+        """
+        resolved = os.path.realpath(str(path))
+        for root in self.file_roots:
+            root = os.path.realpath(root)
+            if os.path.commonpath([resolved, root]) == root:
+                return resolved
+        raise ValueError(f"{name} 必須位於數據目錄或報告目錄中: {path}")
+    
+    def _prune_jobs(self) -> None:
+        """只保留最近 max_jobs 個已完成的任務（調用方需持有任務鎖）"""
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in (COMPLETED, FAILED)]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            del self.jobs[job_id]
+            self._job_events.pop(job_id, None)
+    
+    async def _wait_for_job(self, job_id: str, wait: Optional[str]) -> None:
+        """等待任務完成，最多 wait 秒"""
+        if not wait:
+            return
+        try:
+            timeout = float(wait)
+        except ValueError:
+            raise ValueError("wait 必須是數值")
+        event = self._job_events.get(job_id)
+        if event is None:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    
+    def _run_job(self, job_id: str) -> None:
+        """在線程池中運行任務並記錄結果"""
+        with self._tasks_lock:
+            job = self.jobs[job_id]
+            job.update(status=RUNNING, started_at=datetime.now().isoformat())
+        started = time.perf_counter()
+        
+        try:
+            with span(f"server.job.{job['kind']}", "server", job_id=job_id):
+                result = getattr(self, f"_{job['kind']}_job")(job_id, job["payload"])
+        except Exception as e:
+            logger.exception(f"任務 {job_id} 執行時出錯: {e}")
+            result = {"success": False, "error": str(e)}
+        
+        with self._tasks_lock:
+            job.update(
+                status=COMPLETED if result.get("success") else FAILED,
+                finished_at=datetime.now().isoformat(),
+                seconds=round(time.perf_counter() - started, 3),
+                file_path=result.get("file_path") or result.get("report_path"),
+                error=result.get("error"),
+                result=result
+            )
+            event = self._job_events.get(job_id)
+        logger.info(f"任務 {job_id} ({job['kind']}) {job['status']}，耗時 {job['seconds']:.2f} 秒")
+        
+        if job["kind"] in ("collect", "compact"):
+            self.invalidate()
+        if event is not None and self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循環已關閉
+                pass
+    
+    def _collect_job(self, job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """運行收集任務（不在任務記錄中保留收集到的數據）"""
+        if "tasks" in payload:
+            return self.data_collector.run(payload["tasks"], payload.get("max_workers"))
+        # 進度事件使用與API相同的任務ID
+        result = self.data_collector.run_collection_task(dict(payload["task"], task_id=job_id))
+        return {
+            "success": bool(result.get("success")),
+            "file_path": result.get("file_path"),
+            "items": len(result.get("data") or []),
+            "error": result.get("error")
+        }
+    
+    def _analyze_job(self, job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """運行分析任務（圖表生成不是線程安全的，分析任務依次執行）"""
+        with self._analysis_lock:
+            return self.data_analyzer.run_analysis(
+                payload.get("analysis_type", "all"),
+                data_source=payload.get("data_source") and self.confined_path(payload["data_source"], "data_source"),
+                generate_charts=payload.get(
+                    "generate_charts", self.config.getboolean('Analysis', 'generate_charts', fallback=True)
+                ),
+                report_format=payload.get(
+                    "report_format", self.config.get('Analysis', 'default_report_format', fallback='html')
+                )
+            )
+    
+    def _export_job(self, job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """把JSON數據文件導出為 excel, csv, parquet 或 ndjson"""
+        input_path = self.confined_path(payload["input"], "input")
+        if not os.path.exists(input_path):
+            return {"success": False, "error": f"輸入文件不存在: {payload['input']}"}
+        output_dir = self.confined_path(payload.get("output_dir") or os.path.join(self.reports_dir, "exports"),
+                                        "output_dir")
+        return export_data(
+            iter_json_records(input_path), payload.get("format", "csv"), output_dir,
+            chunk_size=int(payload.get("chunk_size", DEFAULT_CHUNK_SIZE))
+        )
+    
+    def _compact_job(self, job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """合併數據快照並應用保留期限"""
+        return SnapshotCompactor(self.config).run(payload.get("data_types"), bool(payload.get("dry_run", False)))
+    
+    # HTTP處理
+    
+    async def dispatch(self, request: Request) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        處理一個請求
+        
+        Returns:
+            (狀態碼, 響應頭, 響應體)
+        """
+        headers = {}
+        if self.cors_origin and request.method in ("GET", "OPTIONS"):
+            # 跨域只允許讀取：預檢請求不允許POST，瀏覽器中的其他網站不能提交任務
+            headers = {
+                "Access-Control-Allow-Origin": self.cors_origin,
+                "Access-Control-Allow-Methods": "GET, OPTIONS",
+                "Access-Control-Allow-Headers": "If-None-Match, Last-Event-ID",
+                "Access-Control-Expose-Headers": "ETag"
+            }
+        if request.method == "OPTIONS":
+            return 204, headers, b""
+        
+        handler = None
+        cacheable = False
+        path_matched = False
+        for method, pattern, route_handler, route_cacheable in self._compiled_routes:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            path_matched = True
+            if method == request.method:
+                handler, cacheable = route_handler, route_cacheable
+                request.route_args = match.groupdict()
+                break
+        
+        if handler is None:
+            status = 405 if path_matched else 404
+            return status, headers, self._encode({"success": False, "error": HTTP_REASONS[status]})
+        
+        if request.method != "GET":
+            denied = self._authorize(request)
+            if denied is not None:
+                return denied, headers, self._encode({"success": False, "error": self._auth_error(denied)})
+        
+        cache_key = None
+        if cacheable:
+            # 聚合結果是最新的之後才檢查緩存，緩存按數據版本失效
+            version = (await self.aggregates()).version
+            cache_key = request.path + "?" + "&".join(f"{key}={value}" for key, value in sorted(request.params.items()))
+            cached = self.cache.get(cache_key, version)
+            if cached is not None:
+                return self._respond(request, headers, 200, *cached)
+        
+        try:
+            status, payload = await handler(request)
+        except ValueError as e:
+            status, payload = 400, {"success": False, "error": str(e)}
+        except Exception as e:
+            logger.exception(f"處理請求 {request.method} {request.path} 時出錯: {e}")
+            status, payload = 500, {"success": False, "error": str(e)}
+        
+        if isinstance(payload, EventStream):
+            headers.update({"Content-Type": "text/event-stream; charset=utf-8", "Cache-Control": "no-cache"})
+            return status, headers, payload
+        
+        body = self._encode(payload)
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        if cache_key is not None and status == 200:
+            self.cache.put(cache_key, etag, body)
+        return self._respond(request, headers, status, etag, body)
+    
+    def _authorize(self, request: Request) -> Optional[int]:
+        """
+        檢查提交任務的請求：Unix套接字上的請求總是允許（套接字只有當前用戶可以訪問），
+        TCP上的請求需要配置的令牌
+        
+        Returns:
+            拒絕時的狀態碼，允許時返回None
+        """
+        if request.local:
+            return None
+        if not self.api_token:
+            return 403
+        supplied = request.headers.get("authorization", "")
+        if not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {self.api_token}".encode("utf-8")):
+            return 401
+        return None
+    
+    def _auth_error(self, status: int) -> str:
+        if status == 403:
+            return "任務只能通過Unix套接字提交（或配置 [Server] api_token 後在請求頭中提供令牌）"
+        return "缺少或錯誤的令牌（Authorization: Bearer <令牌>）"
+    
+    def _encode(self, payload: Any) -> bytes:
+        """把響應內容序列化為JSON"""
+        return json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+    
+    def _respond(self, request: Request, headers: Dict[str, str], status: int, etag: str,
+                 body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        """添加ETag，客戶端的If-None-Match匹配時返回304"""
+        headers = dict(headers)
+        headers["Content-Type"] = "application/json; charset=utf-8"
+        if status == 200:
+            headers["ETag"] = etag
+            headers["Cache-Control"] = "no-cache"
+            if etag in [value.strip() for value in request.headers.get("if-none-match", "").split(",")]:
+                return 304, headers, b""
+        return status, headers, body
+    
+    async def _read_request(self, reader: asyncio.StreamReader, local: bool = False) -> Optional[Request]:
+        """讀取一個請求，連接關閉時返回None"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("請求頭過大")
+        
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("請求體過大")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body, local)
+    
+    async def _write_response(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str],
+                              body: bytes, keep_alive: bool) -> None:
+        """寫入一個響應"""
+        lines = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}"]
+        headers = dict(headers)
+        headers["Content-Length"] = str(len(body))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+    
+    async def _stream_events(self, writer: asyncio.StreamWriter, headers: Dict[str, str], stream: EventStream) -> None:
+        """
+        把訂閱的事件寫入連接直到客戶端斷開
+        
+        收集線程只把事件放入訂閱的有界隊列並喚醒事件循環；寫入和等待客戶端讀取（drain）都在這個協程中進行。
+        客戶端讀取太慢時隊列中最舊的事件被丟棄，並以 dropped 事件告知丟棄的數量。
+        """
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        subscription = stream.subscription
+        
+        def waker():
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # 事件循環已關閉
+                pass
+        
+        subscription.set_waker(waker)
+        lines = [f"HTTP/1.1 200 {HTTP_REASONS[200]}"]
+        lines.extend(f"{key}: {value}" for key, value in dict(headers, Connection="close").items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + b"retry: 3000\n\n")
+        wake.set()
+        
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": heartbeat\n\n")
+                    await writer.drain()
+                    continue
+                wake.clear()
+                
+                chunks = []
+                dropped = subscription.take_dropped()
+                if dropped:
+                    chunks.append(f"event: dropped\ndata: {json.dumps({'dropped': dropped})}\n\n")
+                finished = False
+                for event in subscription.drain():
+                    data = json.dumps(event, ensure_ascii=False, default=_json_default)
+                    chunks.append(f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n")
+                    finished = finished or event["type"] == TASK_FINISHED
+                if chunks:
+                    writer.write("".join(chunks).encode("utf-8"))
+                    await writer.drain()
+                if finished and stream.until_finished:
+                    break
+        finally:
+            subscription.close()
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                 local: bool = False) -> None:
+        """處理一個連接（支持keep-alive），local 表示連接來自本地Unix套接字"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, local)
+                except (ValueError, asyncio.LimitOverrunError) as e:
+                    await self._write_response(writer, 400, {"Content-Type": "application/json; charset=utf-8"},
+                                               self._encode({"success": False, "error": str(e)}), False)
+                    break
+                if request is None:
+                    break
+                
+                started = time.perf_counter()
+                status, headers, body = await self.dispatch(request)
+                if isinstance(body, EventStream):
+                    await self._stream_events(writer, headers, body)
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, status, headers, body, keep_alive)
+                logger.debug(f"{request.method} {request.path} {status} {(time.perf_counter() - started) * 1000:.1f}ms")
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self) -> None:
+        """開始監聽（配置了 unix_socket 時同時監聽本地Unix套接字）"""
+        self._refresh_lock = asyncio.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"API服務器已啟動: http://{self.host}:{self.port}")
+        
+        if self.unix_socket:
+            if os.path.exists(self.unix_socket):
+                # 上次運行遺留的套接字文件
+                os.remove(self.unix_socket)
+            os.makedirs(os.path.dirname(os.path.abspath(self.unix_socket)), exist_ok=True)
+            self._unix_server = await asyncio.start_unix_server(
+                functools.partial(self._handle_connection, local=True), self.unix_socket, limit=MAX_HEADER_BYTES
+            )
+            # 只允許當前用戶提交任務
+            os.chmod(self.unix_socket, 0o600)
+            logger.info(f"API服務器已監聽Unix套接字: {self.unix_socket}")
+    
+    async def warm_up(self) -> None:
+        """預先計算聚合結果，第一個請求不需要等待"""
+        started = time.perf_counter()
+        await self.aggregates()
+        logger.info(f"預熱完成，耗時 {time.perf_counter() - started:.2f} 秒")
+    
+    async def serve_forever(self, warm_up: bool = False) -> None:
+        """
+        監聽並處理請求直到被取消
+        
+        Args:
+            warm_up: 開始監聽後是否預先計算聚合結果
+        """
+        await self.start()
+        if warm_up:
+            await self.warm_up()
+        try:
+            async with self._server:
+                if self._unix_server is not None:
+                    async with self._unix_server:
+                        await asyncio.gather(self._server.serve_forever(), self._unix_server.serve_forever())
+                else:
+                    await self._server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+            if self._unix_server is not None and os.path.exists(self.unix_socket):
+                os.remove(self.unix_socket)
+
+
+def start_server(account_manager, data_collector, data_analyzer, config: ConfigParser) -> None:
+    """
+    啟動API服務器（阻塞直到按下Ctrl+C）
+    
+    Args:
+        account_manager: 賬戶管理器實例
+        data_collector: 數據收集器實例
+        data_analyzer: 數據分析器實例
+        config: 配置對象
+    """
+    server = ApiServer(account_manager, data_collector, data_analyzer, config)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("API服務器已停止")
+
+
+def start_daemon(account_manager, data_collector, data_analyzer, config: ConfigParser) -> None:
+    """
+    以守護進程模式啟動API服務器（阻塞直到按下Ctrl+C）
+    
+    與 start_server 相同，另外：
+    - 總是監聽Unix套接字（默認 [Server] unix_socket，未設置時為數據目錄下的 collector.sock），
+      cron等本地調用方可以用 daemon_client.py 或 curl --unix-socket 提交任務
+    - 啟動時預先計算聚合結果
+    
+    組件、配置、賬戶、HTTP連接池和緩存在各個任務之間保持常駐。
+    
+    Args:
+        account_manager: 賬戶管理器實例
+        data_collector: 數據收集器實例
+        data_analyzer: 數據分析器實例
+        config: 配置對象
+    """
+    server = ApiServer(account_manager, data_collector, data_analyzer, config)
+    if not server.unix_socket:
+        server.unix_socket = default_socket_path(config)
+    try:
+        asyncio.run(server.serve_forever(warm_up=True))
+    except KeyboardInterrupt:
+        logger.info("守護進程已停止")
+
+
+def default_socket_path(config: ConfigParser) -> str:
+    """返回守護進程的Unix套接字路徑"""
+    return config.get('Server', 'unix_socket', fallback='') or os.path.join(
+        config.get('Files', 'data_dir', fallback='data'), "collector.sock"
+    )
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+嵌套字段展開性能測試
+
+比較舊版逐列 apply 的展開方式與 export_utils 中按 NESTED_FIELD_SPEC 規則逐列生成的展開方式。
+新實現的耗時包含把數值列轉換為浮點數（舊版不轉換）。
+
+用法:
+    python benchmarks/bench_export_flatten.py --rows 1000000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_utils import _flatten_nested_fields, NESTED_COLUMN_TYPES
+
+
+def legacy_flatten(df: pd.DataFrame) -> pd.DataFrame:
+    """舊版實現：每個子字段一次 apply 遍歷"""
+    if "audienceAnalysis" in df.columns:
+        df["audience_age_range"] = df["audienceAnalysis"].apply(lambda x: x.get("ageRange") if isinstance(x, dict) else "")
+        df["audience_genders"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("genders", [])) if isinstance(x, dict) else "")
+        df["audience_locations"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("locations", [])) if isinstance(x, dict) else "")
+        df["audience_interests"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("interests", [])) if isinstance(x, dict) else "")
+        df["audience_behaviors"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("behaviors", [])) if isinstance(x, dict) else "")
+        df = df.drop(columns=["audienceAnalysis"])
+    
+    if "potentialCustomers" in df.columns:
+        df["estimated_reach"] = df["potentialCustomers"].apply(lambda x: x.get("estimatedReach") if isinstance(x, dict) else 0)
+        df["engagement_rate"] = df["potentialCustomers"].apply(lambda x: x.get("engagementRate") if isinstance(x, dict) else "0")
+        df["cost_per_lead"] = df["potentialCustomers"].apply(lambda x: x.get("costPerLead") if isinstance(x, dict) else "0")
+        df["quality_score"] = df["potentialCustomers"].apply(lambda x: x.get("qualityScore") if isinstance(x, dict) else "0")
+        df = df.drop(columns=["potentialCustomers"])
+    
+    return df
+
+
+def generate_records(rows: int) -> list:
+    """生成測試記錄，每10條中有1條缺少嵌套字段"""
+    records = []
+    for i in range(rows):
+        record = {"id": str(i), "name": f"廣告{i}", "impressions": i * 10, "clicks": i}
+        if i % 10:
+            record["audienceAnalysis"] = {
+                "ageRange": "18-35",
+                "genders": ["male", "female"],
+                "locations": ["Hong Kong", "Taiwan"],
+                "interests": ["科技", "電子產品"],
+                "behaviors": ["網上購物"]
+            }
+            record["potentialCustomers"] = {
+                "estimatedReach": i,
+                "engagementRate": "5.0",
+                "costPerLead": "0.5",
+                "qualityScore": "75"
+            }
+        records.append(record)
+    return records
+
+
+def best_of(func, df: pd.DataFrame, repeat: int) -> float:
+    """返回多次運行中的最短耗時（秒）"""
+    timings = []
+    for _ in range(repeat):
+        data = df.copy()
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌套字段展開性能測試")
+    parser.add_argument("--rows", type=int, default=1000000, help="測試記錄數")
+    parser.add_argument("--repeat", type=int, default=3, help="重複次數")
+    args = parser.parse_args()
+    
+    df = pd.DataFrame(generate_records(args.rows))
+    
+    # 確認兩種實現輸出一致
+    expected = legacy_flatten(df.copy())
+    # 新實現按 NESTED_FIELD_SPEC 的列類型把數值列轉換為浮點數
+    for column, column_type in NESTED_COLUMN_TYPES.items():
+        if column_type == "float" and column in expected.columns:
+            expected[column] = pd.to_numeric(expected[column], errors="coerce")
+    actual = _flatten_nested_fields(df.copy(), "csv")
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    
+    legacy_seconds = best_of(legacy_flatten, df, args.repeat)
+    spec_seconds = best_of(lambda data: _flatten_nested_fields(data, "csv"), df, args.repeat)
+    
+    print(json.dumps({
+        "benchmark": "export_flatten",
+        "rows": args.rows,
+        "legacy_seconds": round(legacy_seconds, 4),
+        "spec_seconds": round(spec_seconds, 4),
+        "speedup": round(legacy_seconds / spec_seconds, 2) if spec_seconds else None
+    }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
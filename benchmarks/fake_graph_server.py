@@ -0,0 +1,468 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地Graph API模擬服務器
+
+這個模塊提供一個離線的Graph API替身，用於在沒有真實憑證的情況下測試和評估數據收集器，包括：
+- 根據錄製的響應模板（fixtures/graph_api.json）按規模生成頁面、帖子、廣告賬戶、廣告系列和洞察數據
+- 可配置的響應延遲和分頁大小
+- 多ID查詢（?ids=a,b,c）
+- 嵌套字段展開（例如 posts.limit(10){id,message}），嵌套結果同樣分頁
+- X-App-Usage / X-Business-Use-Case-Usage 速率限制響應頭
+- 錯誤注入（瞬時錯誤和速率限制錯誤）
+- 按路由統計請求數和傳輸字節數
+
+用法:
+    python benchmarks/fake_graph_server.py --port 8765 --pages 10 --latency-ms 20
+"""
+
+import os
+import json
+import random
+import logging
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from typing import Dict, List, Any, Tuple
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "graph_api.json")
+
+# 默認數據規模
+DEFAULT_SCALE = {
+    "pages": 5,
+    "posts_per_page": 50,
+    "ad_accounts": 2,
+    "campaigns_per_account": 20,
+    "insights_per_account": 50
+}
+
+
+def split_field_specs(fields: str) -> List[str]:
+    """
+    按頂層逗號拆分fields參數，忽略括號內的逗號
+    
+    Args:
+        fields: Graph API的fields參數，例如 "id,name,insights.date_preset(x){a,b}"
+    
+    Returns:
+        頂層字段表達式列表（保留修飾符和嵌套部分）
+    """
+    specs = []
+    depth = 0
+    current = ""
+    for char in fields or "":
+        if char in "({":
+            depth += 1
+        elif char in ")}":
+            depth -= 1
+        if char == "," and depth == 0:
+            specs.append(current.strip())
+            current = ""
+        else:
+            current += char
+    specs.append(current.strip())
+    return [spec for spec in specs if spec]
+
+
+def parse_field_spec(spec: str) -> Tuple[str, Dict[str, str], str]:
+    """
+    解析一個字段表達式
+    
+    Args:
+        spec: 字段表達式，例如 "posts.limit(10).since(2024-01-01){id,message}"
+    
+    Returns:
+        (字段名, 修飾符, 嵌套字段)，例如 ("posts", {"limit": "10", "since": "2024-01-01"}, "id,message")
+    """
+    subfields = ""
+    if spec.endswith("}") and "{" in spec:
+        spec, subfields = spec.split("{", 1)
+        subfields = subfields[:-1]
+    
+    name, _, modifier_text = spec.partition(".")
+    modifiers = {}
+    for modifier in modifier_text.split(")."):
+        key, _, value = modifier.partition("(")
+        if key:
+            modifiers[key] = value.rstrip(")")
+    return name.strip(), modifiers, subfields
+
+
+class FakeGraphData:
+    """根據響應模板按規模生成的Graph數據"""
+    
+    def __init__(self, fixtures_path: str = DEFAULT_FIXTURES, scale: Dict[str, int] = None):
+        """
+        初始化數據
+        
+        Args:
+            fixtures_path: 響應模板文件路徑
+            scale: 數據規模，參見 DEFAULT_SCALE
+        """
+        with open(fixtures_path, "r", encoding="utf-8") as f:
+            self.fixtures = json.load(f)
+        
+        self.scale = dict(DEFAULT_SCALE)
+        self.scale.update(scale or {})
+        
+        self.pages = {}
+        self.posts = {}
+        for i in range(self.scale["pages"]):
+            page = self._render("page", i)
+            self.pages[page["id"]] = page
+            self.posts[page["id"]] = [
+                self._render("post", j, parent=page["id"]) for j in range(self.scale["posts_per_page"])
+            ]
+        
+        self.ad_accounts = {}
+        self.campaigns = {}
+        self.insights = {}
+        for i in range(self.scale["ad_accounts"]):
+            account = self._render("ad_account", i)
+            self.ad_accounts[account["id"]] = account
+            offset = i * self.scale["campaigns_per_account"]
+            self.campaigns[account["id"]] = [
+                self._render("campaign", offset + j, parent=account["account_id"])
+                for j in range(self.scale["campaigns_per_account"])
+            ]
+            self.insights[account["id"]] = [
+                self._render("insight", offset + j, parent=account["account_id"])
+                for j in range(self.scale["insights_per_account"])
+            ]
+        
+        # 所有可以通過ID直接訪問的對象
+        self.objects = dict(self.pages)
+        self.objects.update(self.ad_accounts)
+        for campaigns in self.campaigns.values():
+            self.objects.update({campaign["id"]: campaign for campaign in campaigns})
+        
+        # 可以嵌套展開的連接: 連接名 -> {父對象ID: 子對象列表}
+        self.edges = {"posts": self.posts, "campaigns": self.campaigns, "insights": self.insights}
+    
+    def _render(self, kind: str, index: int, parent: str = "") -> Any:
+        """用序號和父對象ID填充模板"""
+        def render(value):
+            if isinstance(value, str):
+                return value.replace("{i}", str(index)).replace("{parent}", parent)
+            if isinstance(value, bool) or value is None:
+                return value
+            if isinstance(value, int):
+                # 讓數值在對象之間有所變化
+                return value * (1 + index % 7)
+            if isinstance(value, list):
+                return [render(item) for item in value]
+            if isinstance(value, dict):
+                return {key: render(item) for key, item in value.items()}
+            return value
+        
+        return render(self.fixtures[kind])
+
+
+class FakeGraphServer:
+    """本地Graph API模擬服務器"""
+    
+    def __init__(self, data: FakeGraphData = None, host: str = "127.0.0.1", port: int = 0,
+                 api_version: str = "v18.0", latency_ms: float = 0, jitter_ms: float = 0,
+                 page_size: int = 25, error_rate: float = 0, rate_limit_every: int = 0,
+                 app_usage_window: int = 200, seed: int = 42):
+        """
+        初始化服務器
+        
+        Args:
+            data: 模擬數據，默認使用 DEFAULT_SCALE 規模
+            host: 監聽地址
+            port: 監聽端口，0表示自動選擇
+            api_version: API版本前綴
+            latency_ms: 每個請求的固定延遲（毫秒）
+            jitter_ms: 延遲的隨機抖動上限（毫秒）
+            page_size: 列表接口未指定limit時的分頁大小
+            error_rate: 返回瞬時錯誤（code 2）的概率
+            rate_limit_every: 每隔多少個請求返回一次速率限制錯誤（code 4），0表示不注入
+            app_usage_window: X-App-Usage 中 call_count 達到100%所需的請求數
+            seed: 隨機數種子
+        """
+        self.data = data or FakeGraphData()
+        self.api_version = api_version
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.rate_limit_every = rate_limit_every
+        self.app_usage_window = app_usage_window
+        self.random = random.Random(seed)
+        
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.route_counts = Counter()
+        self.error_counts = Counter()
+        self.bytes_sent = 0
+        
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+    
+    @property
+    def base_url(self) -> str:
+        """收集器使用的API基礎URL"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/{self.api_version}"
+    
+    def start(self) -> str:
+        """
+        在後台線程中啟動服務器
+        
+        Returns:
+            API基礎URL
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Graph API模擬服務器已啟動: {self.base_url}")
+        return self.base_url
+    
+    def stop(self) -> None:
+        """停止服務器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+    
+    def reset_stats(self) -> None:
+        """清空請求統計"""
+        with self.lock:
+            self.request_count = 0
+            self.route_counts.clear()
+            self.error_counts.clear()
+            self.bytes_sent = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回請求統計"""
+        with self.lock:
+            return {
+                "requests": self.request_count,
+                "routes": dict(self.route_counts),
+                "errors": dict(self.error_counts),
+                "bytes_sent": self.bytes_sent
+            }
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+    
+    def _make_handler(self):
+        """創建綁定到此服務器的請求處理類"""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                server._handle(self)
+            
+            def do_POST(self):
+                server._handle(self)
+            
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+        
+        return Handler
+    
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        """處理一個請求"""
+        url = urlsplit(handler.path)
+        params = dict(parse_qsl(url.query))
+        if handler.command == "POST":
+            length = int(handler.headers.get("Content-Length") or 0)
+            params.update(parse_qsl(handler.rfile.read(length).decode("utf-8")))
+        
+        segments = [segment for segment in url.path.split("/") if segment]
+        if segments and segments[0] == self.api_version:
+            segments = segments[1:]
+        
+        with self.lock:
+            self.request_count += 1
+            request_number = self.request_count
+            inject_error = self.error_rate and self.random.random() < self.error_rate
+            delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        
+        if delay:
+            threading.Event().wait(delay / 1000)
+        
+        if self.rate_limit_every and request_number % self.rate_limit_every == 0:
+            route, status, body = "rate_limit", 400, {"error": {
+                "message": "(#4) Application request limit reached",
+                "type": "OAuthException",
+                "code": 4,
+                "is_transient": True
+            }}
+        elif inject_error:
+            route, status, body = "error", 500, {"error": {
+                "message": "An unexpected error has occurred. Please retry your request later.",
+                "type": "OAuthException",
+                "code": 2,
+                "is_transient": True
+            }}
+        else:
+            route, status, body = self._route(segments, params)
+        
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        usage = min(100, request_number * 100 // max(self.app_usage_window, 1))
+        
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=UTF-8")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.send_header("X-App-Usage", json.dumps({"call_count": usage, "total_cputime": usage // 2, "total_time": usage // 2}))
+        handler.send_header("X-Business-Use-Case-Usage", json.dumps({
+            "benchmark": [{"type": "ads_insights", "call_count": usage, "total_cputime": usage // 2,
+                           "total_time": usage // 2, "estimated_time_to_regain_access": 0}]
+        }))
+        handler.end_headers()
+        
+        # 在發送響應前記錄統計，客戶端收到響應後讀取的統計已包含本次請求
+        with self.lock:
+            self.route_counts[route] += 1
+            if status != 200:
+                self.error_counts[route] += 1
+            self.bytes_sent += len(payload)
+        
+        handler.wfile.write(payload)
+    
+    def _route(self, segments: List[str], params: Dict[str, str]) -> Tuple[str, int, Dict[str, Any]]:
+        """
+        根據路徑返回響應
+        
+        Returns:
+            (路由名稱, HTTP狀態碼, 響應內容)
+        """
+        data = self.data
+        fields = params.get("fields", "")
+        
+        if not segments and "ids" in params:
+            ids = [object_id for object_id in params["ids"].split(",") if object_id]
+            missing = [object_id for object_id in ids if object_id not in data.objects]
+            if missing:
+                # 與Graph API一致：任何一個ID不存在時整個請求失敗
+                return "ids", 404, {"error": {
+                    "message": f"(#100) Some of the aliases you requested do not exist: {','.join(missing)}",
+                    "type": "OAuthException",
+                    "code": 100
+                }}
+            return "ids", 200, {object_id: self._project(data.objects[object_id], fields) for object_id in ids}
+        
+        if segments == ["search"]:
+            search_type = params.get("type", "page")
+            if search_type != "page":
+                return "search", 200, {"data": []}
+            pages = [self._project(page, fields) for page in data.pages.values()]
+            return "search", 200, self._paginate("search", pages, params)
+        
+        if segments == ["me", "adaccounts"]:
+            accounts = [self._project(account, fields) for account in data.ad_accounts.values()]
+            return "adaccounts", 200, self._paginate("me/adaccounts", accounts, params)
+        
+        if len(segments) == 2:
+            object_id, edge = segments
+            if edge == "posts" and object_id in data.posts:
+                posts = [self._project(post, fields) for post in data.posts[object_id]]
+                return "posts", 200, self._paginate(f"{object_id}/posts", posts, params)
+            if edge == "campaigns" and object_id in data.campaigns:
+                campaigns = [self._project(campaign, fields) for campaign in data.campaigns[object_id]]
+                return "campaigns", 200, self._paginate(f"{object_id}/campaigns", campaigns, params)
+            if edge == "insights" and object_id in data.insights:
+                insights = [self._project(insight, fields) for insight in data.insights[object_id]]
+                return "insights", 200, self._paginate(f"{object_id}/insights", insights, params)
+        
+        if len(segments) == 1 and segments[0] in data.objects:
+            return "object", 200, self._project(data.objects[segments[0]], fields)
+        
+        return "not_found", 404, {"error": {
+            "message": f"Unsupported get request. Object with ID '{'/'.join(segments)}' does not exist",
+            "type": "GraphMethodException",
+            "code": 100,
+            "error_subcode": 33
+        }}
+    
+    def _project(self, obj: Dict[str, Any], fields: str) -> Dict[str, Any]:
+        """
+        只返回請求的字段（總是包含id）
+        
+        對象本身沒有、但可以作為連接訪問的字段（posts, campaigns, insights）按嵌套字段展開，
+        結果按 limit 修飾符分頁，下一頁URL指向對應的連接接口。沒有數據的連接不返回（與Graph API一致）。
+        """
+        if not fields:
+            return obj
+        
+        result = {"id": obj["id"]} if "id" in obj else {}
+        for spec in split_field_specs(fields):
+            name, modifiers, subfields = parse_field_spec(spec)
+            if name in obj:
+                result[name] = obj[name]
+                continue
+            
+            children = self.data.edges.get(name, {}).get(obj.get("id"))
+            if not children:
+                continue
+            edge_params = {"fields": subfields}
+            if "limit" in modifiers:
+                edge_params["limit"] = modifiers["limit"]
+            items = [self._project(child, subfields) for child in children]
+            result[name] = self._paginate(f"{obj['id']}/{name}", items, edge_params)
+        return result
+    
+    def _paginate(self, endpoint: str, items: List[Any], params: Dict[str, str]) -> Dict[str, Any]:
+        """按 limit/after 參數返回一頁數據及分頁信息"""
+        limit = int(params.get("limit") or self.page_size)
+        offset = int(params.get("after") or 0)
+        page = items[offset:offset + limit]
+        
+        result = {"data": page}
+        if page:
+            result["paging"] = {"cursors": {"before": str(offset), "after": str(offset + len(page))}}
+            if offset + len(page) < len(items):
+                next_params = dict(params)
+                next_params["after"] = str(offset + len(page))
+                next_params["limit"] = str(limit)
+                result["paging"]["next"] = f"{self.base_url}/{endpoint}?{urlencode(next_params)}"
+        return result
+
+
+def parse_arguments():
+    """解析命令行參數"""
+    parser = argparse.ArgumentParser(description="本地Graph API模擬服務器")
+    parser.add_argument("--host", default="127.0.0.1", help="監聽地址")
+    parser.add_argument("--port", type=int, default=8765, help="監聽端口")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="響應模板文件路徑")
+    for key, value in DEFAULT_SCALE.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=value, help=f"數據規模: {key}")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每個請求的延遲（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="延遲的隨機抖動上限（毫秒）")
+    parser.add_argument("--page-size", type=int, default=25, help="默認分頁大小")
+    parser.add_argument("--error-rate", type=float, default=0, help="瞬時錯誤概率")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="每隔多少個請求返回一次速率限制錯誤")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_arguments()
+    
+    data = FakeGraphData(args.fixtures, {key: getattr(args, key) for key in DEFAULT_SCALE})
+    server = FakeGraphServer(
+        data, host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        page_size=args.page_size, error_rate=args.error_rate, rate_limit_every=args.rate_limit_every
+    )
+    print(f"Graph API模擬服務器: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+離線性能測試套件
+
+針對本地Graph API模擬服務器（fake_graph_server.py）運行完整的收集、分析、報告和導出流程，
+不需要真實的Facebook憑證或網絡連接。每個場景記錄最佳耗時、請求數和傳輸字節數，
+並可與之前保存的結果比較以發現性能回退。
+
+用法:
+    python benchmarks/run_benchmarks.py --scale small
+    python benchmarks/run_benchmarks.py --scale medium --output bench.json
+    python benchmarks/run_benchmarks.py --scale medium --baseline bench.json --threshold 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from configparser import ConfigParser
+from typing import Dict, List, Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_graph_server import FakeGraphData, FakeGraphServer, DEFAULT_FIXTURES
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 預設數據規模
+SCALES = {
+    "small": {"pages": 3, "posts_per_page": 30, "ad_accounts": 1, "campaigns_per_account": 10, "insights_per_account": 20},
+    "medium": {"pages": 10, "posts_per_page": 100, "ad_accounts": 3, "campaigns_per_account": 50, "insights_per_account": 200},
+    "large": {"pages": 25, "posts_per_page": 400, "ad_accounts": 10, "campaigns_per_account": 200, "insights_per_account": 1000}
+}
+
+def build_config(base_url: str, work_dir: str) -> ConfigParser:
+    """
+    創建指向模擬服務器和臨時目錄的配置
+    
+    Args:
+        base_url: 模擬服務器的API基礎URL
+        work_dir: 臨時工作目錄
+    
+    Returns:
+        配置對象
+    """
+    config = ConfigParser()
+    config["Facebook"] = {"base_url": base_url, "app_id": "benchmark", "app_secret": "benchmark"}
+    config["Limits"] = {"request_limit": "1000000000", "request_interval": "0"}
+    config["Files"] = {
+        "data_dir": os.path.join(work_dir, "data"),
+        "reports_dir": os.path.join(work_dir, "reports"),
+        "accounts_file": os.path.join(work_dir, "data", "accounts.json"),
+        "proxies_file": os.path.join(work_dir, "data", "proxies.json")
+    }
+    config["Account"] = {"storage_backend": "json", "flush_interval": "0"}
+    config["Analysis"] = {"generate_charts": "False"}
+    return config
+
+
+def measure(func: Callable[[], Any], repeat: int, server: FakeGraphServer) -> Dict[str, Any]:
+    """
+    多次運行一個場景並記錄最佳耗時
+    
+    Args:
+        func: 場景函數
+        repeat: 運行次數
+        server: 模擬服務器（用於統計請求）
+    
+    Returns:
+        場景結果
+    """
+    timings = []
+    stats = {}
+    peak_memory = 0
+    for index in range(repeat):
+        server.reset_stats()
+        # 只在最後一次運行時跟蹤內存，避免影響計時
+        trace = index == repeat - 1
+        if trace:
+            tracemalloc.start()
+        start_time = time.perf_counter()
+        outcome = func()
+        timings.append(time.perf_counter() - start_time)
+        if trace:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        stats = server.stats()
+    
+    ok = not (isinstance(outcome, dict) and outcome.get("success") is False)
+    return {
+        "success": ok,
+        "seconds": min(timings),
+        "mean_seconds": sum(timings) / len(timings),
+        "requests": stats["requests"],
+        "errors": sum(stats["errors"].values()),
+        "bytes_received": stats["bytes_sent"],
+        "peak_memory_bytes": peak_memory
+    }
+
+
+def run_suite(scale: str, repeat: int = 3, latency_ms: float = 0, page_size: int = 25,
+              error_rate: float = 0, scenarios: List[str] = None, keep_dir: bool = False) -> Dict[str, Any]:
+    """
+    運行性能測試套件
+    
+    Args:
+        scale: 數據規模名稱 (small, medium, large)
+        repeat: 每個場景的運行次數
+        latency_ms: 模擬的網絡延遲（毫秒）
+        page_size: 模擬服務器的分頁大小
+        error_rate: 模擬服務器的瞬時錯誤概率
+        scenarios: 只運行指定的場景（默認全部）
+        keep_dir: 是否保留臨時工作目錄
+    
+    Returns:
+        測試結果
+    """
+    from account_manager import FacebookAccountManager
+    from data_collector import FacebookDataCollector
+    from data_analyzer import FacebookDataAnalyzer
+    from export_utils import export_data
+    
+    work_dir = tempfile.mkdtemp(prefix="fb_bench_")
+    data = FakeGraphData(DEFAULT_FIXTURES, SCALES[scale])
+    server = FakeGraphServer(data, latency_ms=latency_ms, page_size=page_size, error_rate=error_rate)
+    base_url = server.start()
+    
+    try:
+        config = build_config(base_url, work_dir)
+        account_manager = FacebookAccountManager(config)
+        account = account_manager.create_account("benchmark", "benchmark@example.com", "benchmark",
+                                                 access_token="benchmark_token")
+        collector = FacebookDataCollector(config, account_manager)
+        analyzer = FacebookDataAnalyzer(config)
+        
+        first_page_id = next(iter(data.pages))
+        posts_limit = SCALES[scale]["posts_per_page"]
+        state = {}
+        
+        def collect_page_by_id():
+            page = collector.get_page_details(first_page_id)
+            page["posts"] = collector.get_page_posts(first_page_id, limit=posts_limit)
+            return {"success": bool(page.get("id"))}
+        
+        def collect_pages():
+            state["pages"] = collector.collect_page_data(query="benchmark")
+            return state["pages"]
+        
+        def collect_ads():
+            state["ads"] = collector.collect_ad_data(account["id"])
+            return state["ads"]
+        
+        def analyze_ads():
+            state["ad_analysis"] = analyzer.analyze_ad_performance(state["ads"]["data"])
+            return state["ad_analysis"]
+        
+        def analyze_pages():
+            state["page_analysis"] = analyzer.analyze_page_engagement([state["pages"]["data"]])
+            return state["page_analysis"]
+        
+        def generate_report():
+            path = analyzer.generate_report({
+                "ad_performance": state["ad_analysis"],
+                "page_engagement": state["page_analysis"]
+            }, "html")
+            return {"success": bool(path)}
+        
+        def export(format):
+            def run():
+                records = [
+                    insight for account in state["ads"]["data"] for insight in account.get("insights", [])
+                ]
+                return export_data(records, format, os.path.join(work_dir, "exports"))
+            return run
+        
+        all_scenarios = [
+            ("collect_page_by_id", collect_page_by_id),
+            ("collect_page_data", collect_pages),
+            ("collect_ad_data", collect_ads),
+            ("analyze_ad_performance", analyze_ads),
+            ("analyze_page_engagement", analyze_pages),
+            ("generate_report", generate_report),
+            ("export_csv", export("csv")),
+            ("export_parquet", export("parquet"))
+        ]
+        
+        results = {}
+        for name, func in all_scenarios:
+            # 分析和導出依賴收集場景的輸出，因此收集場景總是運行
+            if scenarios and name not in scenarios and not name.startswith("collect_"):
+                continue
+            results[name] = measure(func, repeat, server)
+            logger.info(f"{name}: {results[name]['seconds']:.4f} 秒, {results[name]['requests']} 個請求")
+        
+        account_manager.close()
+    finally:
+        server.stop()
+        if keep_dir:
+            logger.info(f"工作目錄已保留: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    return {
+        "scale": scale,
+        "scale_params": SCALES[scale],
+        "repeat": repeat,
+        "latency_ms": latency_ms,
+        "page_size": page_size,
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scenarios": results
+    }
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    與基準結果比較，找出耗時或請求數增加超過閾值的場景
+    
+    Args:
+        results: 本次測試結果
+        baseline: 基準測試結果
+        threshold: 允許的相對增幅（例如0.2表示20%）
+    
+    Returns:
+        性能回退列表
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("seconds", "requests"):
+            before = previous.get(metric) or 0
+            after = current.get(metric) or 0
+            if before and after > before * (1 + threshold):
+                regressions.append({
+                    "scenario": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": (after - before) / before
+                })
+    return regressions
+
+
+def parse_arguments():
+    """解析命令行參數"""
+    parser = argparse.ArgumentParser(description="離線性能測試套件")
+    parser.add_argument("--scale", choices=list(SCALES), default="small", help="數據規模")
+    parser.add_argument("--repeat", type=int, default=3, help="每個場景的運行次數")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模擬的網絡延遲（毫秒）")
+    parser.add_argument("--page-size", type=int, default=25, help="模擬服務器的分頁大小")
+    parser.add_argument("--error-rate", type=float, default=0, help="模擬服務器的瞬時錯誤概率")
+    parser.add_argument("--scenario", action="append", help="只運行指定的場景（可重複）")
+    parser.add_argument("--output", help="保存結果的JSON文件路徑")
+    parser.add_argument("--baseline", help="用於比較的基準結果JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定為性能回退的相對增幅")
+    parser.add_argument("--keep", action="store_true", help="保留臨時工作目錄")
+    parser.add_argument("-v", "--verbose", action="store_true", help="顯示詳細日誌")
+    return parser.parse_args()
+
+
+def main():
+    """主函數"""
+    args = parse_arguments()
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    if args.verbose:
+        logger.setLevel(logging.INFO)
+    
+    results = run_suite(
+        args.scale, repeat=args.repeat, latency_ms=args.latency_ms, page_size=args.page_size,
+        error_rate=args.error_rate, scenarios=args.scenario, keep_dir=args.keep
+    )
+    
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        results["regressions"] = compare_with_baseline(results, baseline, args.threshold)
+        if results["regressions"]:
+            exit_code = 1
+    
+    if any(not scenario["success"] for scenario in results["scenarios"].values()):
+        exit_code = 1
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+廣告系列狀態變更捕獲模塊
+
+每次收集廣告數據都會得到完整的廣告系列快照。這個模塊把快照與上次已知的狀態比較，包括：
+- 以廣告系列ID為主鍵、按廣告賬戶建立索引的SQLite狀態表，每次只讀取快照所屬廣告賬戶的狀態
+- 只記錄變化：新建和刪除的廣告系列、狀態變化、日預算和總預算修改
+- 只比較本次請求了的字段；字段第一次被請求時只記錄基準值，不記為變更
+- 變更日誌按序號遞增，下游消費者記住最後處理的序號，只讀取之後的變更
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Collection
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 變更類型
+CREATED = "created"
+REMOVED = "removed"
+STATUS_CHANGED = "status_changed"
+BUDGET_CHANGED = "budget_changed"
+
+# 比較的字段及其變化對應的變更類型（只比較本次請求了的字段，例如 minimal 和 analysis 字段配置不請求預算）
+TRACKED_FIELDS = {
+    "status": STATUS_CHANGED,
+    "daily_budget": BUDGET_CHANGED,
+    "lifetime_budget": BUDGET_CHANGED
+}
+
+
+def _text(value: Any) -> Optional[str]:
+    """統一字段值的表示（API返回的預算是字符串形式的最小貨幣單位）"""
+    return None if value is None else str(value)
+
+
+def _split_fields(value: Optional[str]) -> set:
+    """解析狀態表中逗號分隔的已知字段"""
+    return set(value.split(",")) if value else set()
+
+
+class CampaignChangeLog:
+    """廣告系列狀態表和變更日誌"""
+    
+    def __init__(self, db_path: str):
+        """
+        初始化
+        
+        Args:
+            db_path: SQLite數據庫文件路徑
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        
+        # 多個收集線程和API服務器共用一個連接
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS campaign_state ("
+                "campaign_id TEXT PRIMARY KEY, "
+                "ad_account_id TEXT NOT NULL, "
+                "name TEXT, "
+                "status TEXT, "
+                "daily_budget TEXT, "
+                "lifetime_budget TEXT, "
+                "first_seen TEXT NOT NULL, "
+                "last_seen TEXT NOT NULL, "
+                "known_fields TEXT)"
+            )
+            # 舊版本創建的狀態表沒有已知字段列
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(campaign_state)")}
+            if "known_fields" not in columns:
+                self.conn.execute("ALTER TABLE campaign_state ADD COLUMN known_fields TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS campaign_state_account ON campaign_state (ad_account_id)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS campaign_changes ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "detected_at TEXT NOT NULL, "
+                "campaign_id TEXT NOT NULL, "
+                "ad_account_id TEXT NOT NULL, "
+                "name TEXT, "
+                "change TEXT NOT NULL, "
+                "field TEXT, "
+                "old_value TEXT, "
+                "new_value TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS campaign_changes_campaign ON campaign_changes (campaign_id)")
+    
+    def apply_snapshot(self, ad_account_id: str, campaigns: List[Dict[str, Any]], fields: List[str] = None,
+                       complete: bool = True) -> List[Dict[str, Any]]:
+        """
+        比較一個廣告賬戶的廣告系列快照與已知狀態，記錄並返回變更
+        
+        Args:
+            ad_account_id: 廣告賬戶ID
+            campaigns: 該廣告賬戶當前的廣告系列
+            fields: 本次請求的廣告系列字段（API不返回空值字段，請求了但缺少的字段視為空值）；
+                不提供時只比較快照中出現的字段
+            complete: 快照是否包含該廣告賬戶的所有廣告系列；只獲取部分廣告系列時不判斷刪除
+        
+        Returns:
+            變更列表（按記錄順序）
+        """
+        now = datetime.now().isoformat()
+        changes = []
+        
+        with self._lock, self.conn:
+            known = {
+                row["campaign_id"]: row for row in self.conn.execute(
+                    "SELECT * FROM campaign_state WHERE ad_account_id = ?", (ad_account_id,)
+                )
+            }
+            
+            upserts = []
+            seen = set()
+            for campaign in campaigns:
+                campaign_id = _text(campaign.get("id"))
+                if campaign_id is None or campaign_id in seen:
+                    continue
+                seen.add(campaign_id)
+                name = campaign.get("name")
+                previous = known.get(campaign_id)
+                
+                requested = {
+                    field for field in TRACKED_FIELDS
+                    if (field in fields if fields is not None else field in campaign)
+                }
+                state = {field: _text(campaign.get(field)) for field in TRACKED_FIELDS}
+                if previous is None:
+                    known_fields = requested
+                    changes.append(self._change(campaign_id, ad_account_id, name, CREATED,
+                                                new_value=state.get("status")))
+                else:
+                    if previous["known_fields"] is None:
+                        # 舊版本沒有記錄已知字段，有值的字段視為已知
+                        previous_fields = {field for field in TRACKED_FIELDS if previous[field] is not None}
+                    else:
+                        previous_fields = _split_fields(previous["known_fields"])
+                    known_fields = previous_fields | requested
+                    for field, change in TRACKED_FIELDS.items():
+                        if field not in requested:
+                            # 本次沒有請求這個字段，沿用已知的值
+                            state[field] = previous[field]
+                        elif field in previous_fields and state[field] != previous[field]:
+                            changes.append(self._change(campaign_id, ad_account_id, name, change, field,
+                                                        previous[field], state[field]))
+                    if name is None:
+                        name = previous["name"]
+                
+                upserts.append((campaign_id, ad_account_id, name, state["status"], state["daily_budget"],
+                                state["lifetime_budget"], now, now, ",".join(sorted(known_fields))))
+            
+            removed = [row for campaign_id, row in known.items() if campaign_id not in seen] if complete else []
+            for row in removed:
+                changes.append(self._change(row["campaign_id"], ad_account_id, row["name"], REMOVED,
+                                            old_value=row["status"]))
+            
+            self.conn.executemany(
+                "INSERT INTO campaign_state (campaign_id, ad_account_id, name, status, daily_budget, "
+                "lifetime_budget, first_seen, last_seen, known_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(campaign_id) DO UPDATE SET ad_account_id = excluded.ad_account_id, "
+                "name = excluded.name, status = excluded.status, daily_budget = excluded.daily_budget, "
+                "lifetime_budget = excluded.lifetime_budget, last_seen = excluded.last_seen, "
+                "known_fields = excluded.known_fields",
+                upserts
+            )
+            self.conn.executemany("DELETE FROM campaign_state WHERE campaign_id = ?",
+                                  [(row["campaign_id"],) for row in removed])
+            
+            for change in changes:
+                change["detected_at"] = now
+                cursor = self.conn.execute(
+                    "INSERT INTO campaign_changes (detected_at, campaign_id, ad_account_id, name, change, field, "
+                    "old_value, new_value) VALUES (:detected_at, :campaign_id, :ad_account_id, :name, :change, "
+                    ":field, :old_value, :new_value)",
+                    change
+                )
+                change["seq"] = cursor.lastrowid
+        
+        if changes:
+            logger.info(f"廣告賬戶 {ad_account_id} 的廣告系列有 {len(changes)} 項變更")
+        return changes
+    
+    def _change(self, campaign_id: str, ad_account_id: str, name: Optional[str], change: str,
+                field: str = None, old_value: str = None, new_value: str = None) -> Dict[str, Any]:
+        return {
+            "campaign_id": campaign_id,
+            "ad_account_id": ad_account_id,
+            "name": name,
+            "change": change,
+            "field": field,
+            "old_value": old_value,
+            "new_value": new_value
+        }
+    
+    def apply_collected(self, ad_data: List[Dict[str, Any]], fields: List[str] = None,
+                        complete: bool = True, incomplete_accounts: Collection[str] = ()) -> Dict[str, int]:
+        """
+        處理 collect_ad_data 的結果數據（只處理廣告系列不為空的廣告賬戶）
+        
+        Args:
+            ad_data: 廣告賬戶數據列表
+            fields: 請求的廣告系列字段，參見 apply_snapshot
+            complete: 是否獲取了每個廣告賬戶的所有廣告系列，參見 apply_snapshot
+            incomplete_accounts: 廣告系列不完整的廣告賬戶ID（分頁失敗或沒有讀完所有分頁），這些賬戶不判斷刪除
+        
+        Returns:
+            按變更類型統計的變更數
+        """
+        summary = {}
+        for account_data in ad_data:
+            account = account_data.get("account") or {}
+            campaigns = account_data.get("campaigns")
+            # 空列表無法區分「沒有廣告系列」和「獲取失敗」，不據此判斷廣告系列被刪除
+            if not campaigns or not account.get("id"):
+                continue
+            account_complete = complete and account["id"] not in incomplete_accounts
+            for change in self.apply_snapshot(account["id"], campaigns, fields, account_complete):
+                summary[change["change"]] = summary.get(change["change"], 0) + 1
+        return summary
+    
+    def changes(self, after: int = 0, limit: int = 500, campaign_id: str = None,
+                ad_account_id: str = None, change: str = None) -> List[Dict[str, Any]]:
+        """
+        讀取變更日誌
+        
+        Args:
+            after: 只返回序號大於此值的變更
+            limit: 最多返回的變更數
+            campaign_id: 只返回這個廣告系列的變更（可選）
+            ad_account_id: 只返回這個廣告賬戶的變更（可選）
+            change: 只返回這種類型的變更（可選）
+        
+        Returns:
+            按序號排序的變更列表
+        """
+        conditions = ["seq > ?"]
+        params = [after]
+        for column, value in (("campaign_id", campaign_id), ("ad_account_id", ad_account_id), ("change", change)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        params.append(limit)
+        
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM campaign_changes WHERE {' AND '.join(conditions)} ORDER BY seq LIMIT ?", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def state(self, ad_account_id: str = None) -> List[Dict[str, Any]]:
+        """
+        返回廣告系列的當前已知狀態
+        
+        Args:
+            ad_account_id: 只返回這個廣告賬戶的廣告系列（可選）
+        
+        Returns:
+            廣告系列狀態列表
+        """
+        with self._lock:
+            if ad_account_id:
+                rows = self.conn.execute("SELECT * FROM campaign_state WHERE ad_account_id = ? ORDER BY campaign_id",
+                                         (ad_account_id,)).fetchall()
+            else:
+                rows = self.conn.execute("SELECT * FROM campaign_state ORDER BY campaign_id").fetchall()
+        return [dict(row) for row in rows]
+    
+    def last_seq(self) -> int:
+        """返回最新變更的序號（沒有變更時為0）"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM campaign_changes").fetchone()[0]
+    
+    def close(self) -> None:
+        """關閉數據庫連接"""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+數據快照壓縮合併模塊
+
+save_collected_data 每次收集都會寫入一個新的帶時間戳的快照文件。這個模塊定期整理數據目錄，包括：
+- 把小快照文件合併為按時間段（默認按月）劃分的gzip壓縮分區，分區內記錄按自然鍵排序
+- 按自然鍵去重（頁面/群組的 id，廣告數據的廣告賬戶 id），只保留最新快照中的記錄
+- 按數據類型設置保留期限，刪除過期的快照和分區
+
+分區文件與快照文件格式相同（記錄數組），只是經過壓縮，所有讀取數據文件的地方無需區分。
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from configparser import ConfigParser
+from typing import Dict, List, Any, Tuple
+
+from utils import save_json, load_json, is_data_file, COMPRESSED_JSON_SUFFIX
+from metrics import METRICS_JSON_SUFFIX, METRICS_PROM_SUFFIX
+from tracing import span
+from snapshot_store import ObjectStore, read_manifest
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 分區時間段對應的分區標識格式
+PARTITION_PERIODS = {
+    "day": "%Y%m%d",
+    "month": "%Y%m"
+}
+
+# save_collected_data 文件名中的時間戳
+SNAPSHOT_TIMESTAMP = re.compile(r"_(\d{8}_\d{6})\.json$")
+
+
+def record_key(data_type: str, record: Any) -> str:
+    """
+    返回記錄的自然鍵
+    
+    Args:
+        data_type: 數據類型
+        record: 快照中的一條記錄
+    
+    Returns:
+        自然鍵，記錄沒有ID時使用內容哈希（只合併完全相同的記錄）
+    """
+    value = None
+    if isinstance(record, dict):
+        if data_type == "ad_data":
+            value = (record.get("account") or {}).get("id")
+        else:
+            value = record.get("id")
+    if value is None:
+        content = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+        return "sha1:" + hashlib.sha1(content.encode("utf-8")).hexdigest()
+    return str(value)
+
+
+class SnapshotCompactor:
+    """數據目錄的快照合併和保留策略"""
+    
+    def __init__(self, config: ConfigParser):
+        """
+        初始化
+        
+        Args:
+            config: 配置對象
+        """
+        self.config = config
+        self.data_dir = config.get('Files', 'data_dir', fallback='data')
+        self.data_types = [data_type.strip() for data_type in
+                           config.get('Compaction', 'data_types', fallback='page, group, ad_data').split(',')
+                           if data_type.strip()]
+        self.period = config.get('Compaction', 'partition_period', fallback='month')
+        if self.period not in PARTITION_PERIODS:
+            raise ValueError(f"不支持的分區時間段: {self.period}，可選: {', '.join(PARTITION_PERIODS)}")
+        
+        # 按內容尋址的快照對象（與收集器使用相同的目錄）
+        self.object_store = ObjectStore(
+            config.get('Collection', 'objects_dir', fallback='') or os.path.join(self.data_dir, '.objects')
+        )
+        self.object_grace_seconds = config.getfloat('Compaction', 'object_grace_seconds', fallback=3600)
+    
+    def max_age_days(self, data_type: str) -> int:
+        """數據類型的保留天數（0表示永久保留），可以用 max_age_days.<數據類型> 單獨設置"""
+        fallback = self.config.getint('Compaction', 'max_age_days', fallback=0)
+        return self.config.getint('Compaction', f'max_age_days.{data_type}', fallback=fallback)
+    
+    def _partition_name(self, data_type: str, period: str) -> str:
+        return f"{data_type}_part_{period}{COMPRESSED_JSON_SUFFIX}"
+    
+    def _period_bounds(self, period: str) -> Tuple[datetime, datetime]:
+        """返回分區時間段的開始和結束時間"""
+        start = datetime.strptime(period, PARTITION_PERIODS[self.period])
+        if self.period == "day":
+            return start, start + timedelta(days=1)
+        if start.month == 12:
+            return start, start.replace(year=start.year + 1, month=1)
+        return start, start.replace(month=start.month + 1)
+    
+    def _snapshot_time(self, entry: os.DirEntry) -> datetime:
+        """快照的收集時間：文件名中的時間戳，沒有時使用修改時間"""
+        match = SNAPSHOT_TIMESTAMP.search(entry.name)
+        if match:
+            try:
+                return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+            except ValueError:
+                pass
+        return datetime.fromtimestamp(entry.stat().st_mtime)
+    
+    def _scan(self, data_type: str) -> Tuple[Dict[str, str], List[Tuple[datetime, str]]]:
+        """
+        列出數據類型目錄中的分區和快照
+        
+        Returns:
+            ({分區標識: 分區路徑}, [(快照時間, 快照路徑)]，按時間排序)
+        """
+        type_dir = os.path.join(self.data_dir, data_type)
+        partition_pattern = re.compile(rf"^{re.escape(data_type)}_part_(\d+){re.escape(COMPRESSED_JSON_SUFFIX)}$")
+        partitions = {}
+        snapshots = []
+        with os.scandir(type_dir) as entries:
+            for entry in entries:
+                if not is_data_file(entry.name):
+                    continue
+                match = partition_pattern.match(entry.name)
+                if match:
+                    partitions[match.group(1)] = entry.path
+                    continue
+                snapshots.append((self._snapshot_time(entry), entry.path))
+        snapshots.sort()
+        return partitions, snapshots
+    
+    def _remove(self, path: str) -> int:
+        """刪除文件及其指標快照，返回釋放的字節數"""
+        freed = 0
+        stem = path[:-len(".json")] if path.endswith(".json") else path
+        for file_path in (path, stem + METRICS_JSON_SUFFIX, stem + METRICS_PROM_SUFFIX):
+            try:
+                size = os.path.getsize(file_path)
+                os.remove(file_path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+    
+    def compact_type(self, data_type: str, now: datetime = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        合併一種數據類型的快照並應用保留期限
+        
+        Args:
+            data_type: 數據類型 (page, group, ad_data)
+            now: 當前時間（用於計算保留期限，默認為現在）
+            dry_run: 只統計不修改文件
+        
+        Returns:
+            合併統計
+        """
+        now = now or datetime.now()
+        stats = {
+            "snapshots_merged": 0,
+            "snapshots_expired": 0,
+            "partitions_written": [],
+            "partitions_removed": [],
+            "records_in": 0,
+            "records_out": 0,
+            "duplicates_removed": 0,
+            "bytes_before": 0,
+            "bytes_after": 0
+        }
+        type_dir = os.path.join(self.data_dir, data_type)
+        if not os.path.isdir(type_dir):
+            return stats
+        
+        partitions, snapshots = self._scan(data_type)
+        max_age = self.max_age_days(data_type)
+        cutoff = now - timedelta(days=max_age) if max_age > 0 else None
+        
+        expired_partitions = [period for period in partitions
+                              if cutoff is not None and self._period_bounds(period)[1] <= cutoff]
+        expired_snapshots = [path for snapshot_time, path in snapshots
+                             if cutoff is not None and snapshot_time < cutoff]
+        snapshots = [(snapshot_time, path) for snapshot_time, path in snapshots if path not in expired_snapshots]
+        if not snapshots and not expired_partitions and not expired_snapshots:
+            return stats
+        
+        stats["bytes_before"] = sum(os.path.getsize(path) for path in partitions.values()) + \
+            sum(os.path.getsize(path) for _, path in snapshots)
+        
+        # 按時間從舊到新讀取：分區（按時間段開始時間）在同一時間段的快照之前，後讀取的記錄覆蓋先讀取的
+        sources = [(self._period_bounds(period)[0], 0, period, path)
+                   for period, path in partitions.items() if period not in expired_partitions]
+        sources += [(snapshot_time, 1, snapshot_time.strftime(PARTITION_PERIODS[self.period]), path)
+                    for snapshot_time, path in snapshots]
+        sources.sort(key=lambda source: source[:2])
+        
+        latest = {}
+        original_counts = {}
+        with span("compact.merge", "compact", data_type=data_type, sources=len(sources)):
+            for _, is_snapshot, period, path in sources:
+                records = load_json(path)
+                if records is None:
+                    raise ValueError(f"無法讀取數據文件: {path}")
+                if not isinstance(records, list):
+                    records = [records]
+                if not is_snapshot:
+                    original_counts[period] = len(records)
+                stats["records_in"] += len(records)
+                for record in records:
+                    latest[record_key(data_type, record)] = (period, is_snapshot, record)
+        
+        # 按記錄所在時間段劃分分區，只重寫有變化的分區
+        by_period = {}
+        changed_periods = set()
+        for key, (period, is_snapshot, record) in latest.items():
+            by_period.setdefault(period, []).append((key, record))
+            if is_snapshot:
+                changed_periods.add(period)
+        for period, count in original_counts.items():
+            if len(by_period.get(period, [])) != count:
+                changed_periods.add(period)
+        
+        stats["records_out"] = len(latest)
+        stats["duplicates_removed"] = stats["records_in"] - stats["records_out"]
+        stats["snapshots_merged"] = len(snapshots)
+        stats["snapshots_expired"] = len(expired_snapshots)
+        
+        for period in sorted(changed_periods):
+            path = os.path.join(type_dir, self._partition_name(data_type, period))
+            if period not in by_period:
+                stats["partitions_removed"].append(os.path.basename(path))
+                if not dry_run:
+                    self._remove(path)
+                continue
+            records = [record for _, record in sorted(by_period[period], key=lambda item: item[0])]
+            stats["partitions_written"].append(os.path.basename(path))
+            if not dry_run and not save_json(path, records, indent=None):
+                raise IOError(f"無法寫入分區: {path}")
+        
+        # 分區寫入成功後才刪除已合併的快照和過期文件
+        for period in expired_partitions:
+            stats["partitions_removed"].append(os.path.basename(partitions[period]))
+        if not dry_run:
+            for _, path in snapshots:
+                self._remove(path)
+            for path in expired_snapshots:
+                self._remove(path)
+            for period in expired_partitions:
+                self._remove(partitions[period])
+            
+            stats["bytes_after"] = sum(os.path.getsize(os.path.join(type_dir, self._partition_name(data_type, period)))
+                                       for period in by_period)
+        return stats
+    
+    def collect_garbage(self) -> Dict[str, int]:
+        """
+        刪除不再被任何快照清單引用的對象（合併後的快照不再引用對象）
+        
+        Returns:
+            刪除的對象數和釋放的字節數
+        """
+        manifests = []
+        with os.scandir(self.data_dir) as type_entries:
+            for type_entry in type_entries:
+                if not type_entry.is_dir():
+                    continue
+                with os.scandir(type_entry.path) as entries:
+                    for entry in entries:
+                        if is_data_file(entry.name):
+                            manifest = read_manifest(entry.path)
+                            if manifest is not None:
+                                manifests.append((entry.path, manifest))
+        
+        with span("compact.gc", "compact", manifests=len(manifests)):
+            live = self.object_store.live_hashes(manifests)
+            return self.object_store.collect_garbage(live, self.object_grace_seconds)
+    
+    def run(self, data_types: List[str] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        合併所有數據類型的快照
+        
+        Args:
+            data_types: 要處理的數據類型（默認使用 [Compaction] data_types）
+            dry_run: 只統計不修改文件
+        
+        Returns:
+            每種數據類型的合併統計
+        """
+        results = {"success": True, "dry_run": dry_run, "types": {}}
+        for data_type in data_types or self.data_types:
+            try:
+                with span("compact.type", "compact", data_type=data_type):
+                    stats = self.compact_type(data_type, dry_run=dry_run)
+            except Exception as e:
+                logger.exception(f"合併 {data_type} 數據時出錯: {e}")
+                results["success"] = False
+                results["types"][data_type] = {"error": str(e)}
+                continue
+            
+            results["types"][data_type] = stats
+            if stats["snapshots_merged"] or stats["snapshots_expired"] or stats["partitions_removed"]:
+                logger.info(f"{data_type}: 合併 {stats['snapshots_merged']} 個快照，"
+                            f"去除 {stats['duplicates_removed']} 條重複記錄，"
+                            f"刪除 {stats['snapshots_expired']} 個過期快照和 {len(stats['partitions_removed'])} 個分區，"
+                            f"{stats['bytes_before']} → {stats['bytes_after']} 字節")
+        
+        if not dry_run and results["success"] and os.path.isdir(self.object_store.objects_dir):
+            results["objects"] = self.collect_garbage()
+            if results["objects"]["objects_removed"]:
+                logger.info(f"刪除了 {results['objects']['objects_removed']} 個不再引用的快照對象，"
+                            f"釋放 {results['objects']['bytes_freed']} 字節")
+        return results
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+守護進程客戶端
+
+向 `main.py --mode daemon` 啟動的守護進程提交收集、分析和導出任務。
+只依賴標準庫，不導入收集器和分析器，適合在cron中頻繁調用。
+
+示例:
+    python daemon_client.py '{"kind": "collect", "task": {"type": "page", "query": "news"}}' --wait 600
+    python daemon_client.py @jobs/hourly_analysis.json --wait 300
+    python daemon_client.py --status collect_3
+"""
+
+import sys
+import json
+import socket
+import argparse
+import http.client
+from configparser import ConfigParser
+from typing import Dict, Any, Optional
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """通過Unix套接字發送HTTP請求"""
+    
+    def __init__(self, socket_path: str, timeout: float = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+    
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(method: str, path: str, body: Dict[str, Any] = None, socket_path: str = None,
+            url: str = None, timeout: float = None, token: str = None) -> Dict[str, Any]:
+    """
+    向守護進程發送請求
+    
+    Args:
+        method: 請求方法
+        path: 請求路徑，例如 /api/jobs?wait=60
+        body: 請求體（可選）
+        socket_path: Unix套接字路徑（與url二選一）
+        url: 守護進程的HTTP地址，例如 http://127.0.0.1:8000
+        timeout: 超時時間（秒）
+        token: 通過HTTP地址提交任務時的令牌（[Server] api_token）
+    
+    Returns:
+        響應JSON
+    """
+    if url:
+        host = url.split("://", 1)[-1].rstrip("/")
+        connection = http.client.HTTPConnection(host, timeout=timeout)
+    else:
+        connection = UnixHTTPConnection(socket_path, timeout=timeout)
+    
+    try:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "close"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        return json.loads(response.read().decode("utf-8") or "{}")
+    finally:
+        connection.close()
+
+
+def submit_job(job: Dict[str, Any], wait: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+    """
+    提交任務
+    
+    Args:
+        job: 任務，例如 {"kind": "analyze", "analysis_type": "all"}
+        wait: 等待任務完成的最長秒數（可選，不提供時立即返回任務ID）
+        **kwargs: 傳給 request 的連接參數 (socket_path, url, token)
+    
+    Returns:
+        任務記錄，完成的任務包含 result
+    """
+    path = "/api/jobs" + (f"?wait={wait}" if wait else "")
+    return request("POST", path, job, timeout=(wait + 30) if wait else 30, **kwargs)
+
+
+def get_job(job_id: str, wait: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+    """
+    查詢任務狀態和結果
+    
+    Args:
+        job_id: 任務ID
+        wait: 等待任務完成的最長秒數（可選）
+        **kwargs: 傳給 request 的連接參數 (socket_path, url)
+    
+    Returns:
+        任務記錄
+    """
+    path = f"/api/jobs/{job_id}" + (f"?wait={wait}" if wait else "")
+    return request("GET", path, timeout=(wait + 30) if wait else 30, **kwargs)
+
+
+def parse_arguments():
+    """解析命令行參數"""
+    parser = argparse.ArgumentParser(description="向Facebook數據挖掘守護進程提交任務")
+    parser.add_argument("job", nargs="?", help="任務JSON，或 @文件路徑")
+    parser.add_argument("--status", metavar="JOB_ID", help="查詢任務狀態而不是提交任務")
+    parser.add_argument("--wait", type=float, default=None, help="等待任務完成的最長秒數")
+    parser.add_argument("-c", "--config", default="config.ini", help="配置文件路徑（用於確定Unix套接字路徑）")
+    parser.add_argument("--socket", default=None, help="Unix套接字路徑")
+    parser.add_argument("--url", default=None, help="守護進程的HTTP地址（代替Unix套接字）")
+    parser.add_argument("--token", default=None, help="通過HTTP地址提交任務時的令牌（默認使用 [Server] api_token）")
+    return parser.parse_args()
+
+
+def main() -> int:
+    """主函數，任務成功時返回0"""
+    args = parse_arguments()
+    
+    config = ConfigParser()
+    config.read(args.config, encoding="utf-8")
+    token = args.token or config.get('Server', 'api_token', fallback='') or None
+    
+    socket_path = args.socket
+    if not socket_path and not args.url:
+        # 與 api_server.default_socket_path 相同的默認值
+        socket_path = config.get('Server', 'unix_socket', fallback='') or \
+            f"{config.get('Files', 'data_dir', fallback='data')}/collector.sock"
+    
+    try:
+        if args.status:
+            record = get_job(args.status, args.wait, socket_path=socket_path, url=args.url, token=token)
+        elif args.job:
+            text = args.job
+            if text.startswith("@"):
+                with open(text[1:], "r", encoding="utf-8") as f:
+                    text = f.read()
+            record = submit_job(json.loads(text), args.wait, socket_path=socket_path, url=args.url, token=token)
+        else:
+            print("必須提供任務JSON或 --status", file=sys.stderr)
+            return 2
+    except (OSError, ValueError) as e:
+        print(f"無法連接守護進程或響應無效: {e}", file=sys.stderr)
+        return 2
+    
+    print(json.dumps(record, ensure_ascii=False, indent=2))
+    return 1 if record.get("status") == "failed" or record.get("success") is False else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
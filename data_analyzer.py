@@ -15,6 +15,7 @@ Facebook數據分析模塊
 import os
 import json
 import time
+import hashlib
 import logging
 import pandas as pd
 import numpy as np
@@ -23,11 +24,85 @@ from typing import Dict, List, Optional, Union, Any, Tuple
 from configparser import ConfigParser
 from datetime import datetime, timedelta
 
-from utils import save_json, load_json
+from utils import save_json, load_json, is_data_file
+from tracing import span, traced
+from analysis_cache import AnalysisCache
 
 # 設置日誌
 logger = logging.getLogger(__name__)
 
+# 廣告洞察數據中按廣告系列匯總的指標
+AD_METRICS = ("spend", "impressions", "clicks", "reach")
+
+# 按頁面匯總的帖子互動指標
+ENGAGEMENT_METRICS = ("reactions", "comments", "shares", "total_engagement")
+
+# 洞察數據中 [{"action_type", "value"}] 形式的行為列表字段
+ACTION_LIST_COLUMNS = ("actions", "action_values", "conversions", "conversion_values", "cost_per_action_type")
+
+# 可以按廣告系列相加的行為列表字段（cost_per_action_type 是比率，匯總後由支出和轉化數重新計算）
+ADDITIVE_ACTION_COLUMNS = ("actions", "action_values", "conversions", "conversion_values")
+
+# 按廣告系列匯總的轉化指標
+CONVERSION_METRICS = ("spend", "impressions", "clicks", "conversions", "conversion_value")
+
+# 分析代碼版本（本模塊源代碼的哈希），分析或報告代碼變化時緩存的分析結果自動失效
+with open(__file__, "rb") as _source:
+    ANALYSIS_CODE_VERSION = hashlib.sha256(_source.read()).hexdigest()[:16]
+
+
+def explode_action_columns(df: pd.DataFrame, columns: Tuple[str, ...] = ACTION_LIST_COLUMNS) -> pd.DataFrame:
+    """把行為列表字段展開為每種行為類型一列的數值列
+    
+    每個字段只做一次 explode，再用行位置和行為類型編碼一次 bincount 匯總，不逐行處理，
+    適用於大量洞察數據行。
+    
+    Args:
+        df: 洞察數據DataFrame，不修改
+        columns: 要展開的行為列表字段
+    
+    Returns:
+        去掉行為列表字段、增加 "<字段>:<行為類型>" 數值列的DataFrame；
+        可相加字段中缺少的行為記為0，cost_per_action_type 中缺少的記為NaN
+    """
+    present = [column for column in columns if column in df.columns]
+    if not present:
+        return df
+    
+    wide = [df.drop(columns=present)]
+    for column in present:
+        # 每個元素一行，索引是原數據的行位置
+        items = pd.Series(df[column].to_numpy()).explode().dropna()
+        if items.empty:
+            continue
+        
+        # str.get 按鍵取值，不是字典的元素得到NaN
+        raw_values = items.str.get("value")
+        try:
+            # API返回的值是數字字符串，直接轉換比 to_numeric 快得多
+            values = raw_values.astype(float).to_numpy()
+        except (TypeError, ValueError):
+            values = pd.to_numeric(raw_values, errors="coerce").to_numpy(dtype=float)
+        action_types = items.str.get("action_type").to_numpy()
+        
+        valid = pd.notna(action_types) & ~np.isnan(values)
+        codes, names = pd.factorize(action_types[valid])
+        if not len(names):
+            continue
+        
+        # 行位置 × 行為類型 的扁平下標，相同的行和行為類型相加
+        flat = items.index.to_numpy()[valid] * len(names) + codes
+        shape = (len(df), len(names))
+        table = np.bincount(flat, weights=values[valid], minlength=shape[0] * shape[1]).reshape(shape)
+        if column not in ADDITIVE_ACTION_COLUMNS:
+            counts = np.bincount(flat, minlength=shape[0] * shape[1]).reshape(shape)
+            table[counts == 0] = np.nan
+        
+        wide.append(pd.DataFrame(table, index=df.index,
+                                 columns=[f"{column}:{action_type}" for action_type in names]))
+    
+    return pd.concat(wide, axis=1)
+
 
 class FacebookDataAnalyzer:
     """Facebook數據分析類"""
@@ -47,11 +122,24 @@ class FacebookDataAnalyzer:
         # 創建報告目錄
         os.makedirs(self.reports_dir, exist_ok=True)
         
+        # 分析結果緩存（輸入文件內容和分析代碼未變化時直接返回上次的結果）
+        self.cache = None
+        if config.getboolean('Analysis', 'cache_enabled', fallback=True):
+            self.cache = AnalysisCache(
+                config.get('Analysis', 'cache_dir', fallback='') or os.path.join(self.reports_dir, ".cache"),
+                max_entries=config.getint('Analysis', 'cache_max_entries', fallback=64),
+                max_bytes=int(config.getfloat('Analysis', 'cache_max_mb', fallback=50) * 1024 * 1024)
+            )
+        
+        # 計為轉化的行為類型（CPA、轉化率和ROAS按這種行為計算）
+        self.conversion_action_type = config.get('Analysis', 'conversion_action_type', fallback='') or 'offsite_conversion.fb_pixel_purchase'
+        
         # 圖表樣式設置
         plt.style.use('ggplot')
         
         logger.info("Facebook數據分析器初始化完成")
     
+    @traced("analyze.load_file", "analyze")
     def load_data(self, file_path: str) -> Dict:
         """加載數據文件
         
@@ -69,6 +157,7 @@ class FacebookDataAnalyzer:
             logger.exception(f"加載數據時出錯: {e}")
             return {}
     
+    @traced("analyze.load", "analyze")
     def load_all_data(self, data_type: str) -> List[Dict]:
         """加載指定類型的所有數據
         
@@ -85,7 +174,7 @@ class FacebookDataAnalyzer:
         
         all_data = []
         for filename in os.listdir(type_dir):
-            if filename.endswith('.json'):
+            if is_data_file(filename):
                 file_path = os.path.join(type_dir, filename)
                 data = self.load_data(file_path)
                 if data:
@@ -97,208 +186,376 @@ class FacebookDataAnalyzer:
         logger.info(f"加載了 {len(all_data)} 個 {data_type} 類型的數據文件")
         return all_data
     
-    def analyze_ad_performance(self, ad_data: List[Dict]) -> Dict:
-        """分析廣告表現
+    def _iter_ad_accounts(self, ad_data: List[Dict]):
+        """逐個返回廣告賬戶數據，展開 load_all_data 返回的 {"file", "data"} 包裝"""
+        for item in ad_data:
+            if not isinstance(item, dict):
+                continue
+            if "campaigns" not in item and isinstance(item.get("data"), list):
+                yield from (account for account in item["data"] if isinstance(account, dict))
+            else:
+                yield item
+    
+    def list_data_files(self, data_type: str) -> List[str]:
+        """返回指定類型的所有數據文件路徑（與 load_all_data 讀取的文件相同）
         
         Args:
-            ad_data: 廣告數據列表
+            data_type: 數據類型 (page, group, ad_data)
             
         Returns:
-            分析結果
+            文件路徑列表
         """
-        if not ad_data:
-            return {"success": False, "error": "沒有廣告數據"}
+        type_dir = os.path.join(self.data_dir, data_type)
+        if not os.path.exists(type_dir):
+            return []
+        return [os.path.join(type_dir, filename) for filename in sorted(os.listdir(type_dir))
+                if is_data_file(filename)]
+    
+    @traced("analyze.ad_partial", "analyze")
+    def ad_partial(self, ad_data: List[Dict]) -> Dict[str, Any]:
+        """把廣告數據匯總為按廣告系列分組的部分聚合結果
         
-        try:
+        部分聚合結果可以相加（watch模式下每個數據文件一份），
+        由 ad_performance_from_partial 計算最終指標。
+        
+        Args:
+            ad_data: 廣告賬戶數據列表
+            
+        Returns:
+            {"campaigns": 廣告系列數量, "by_campaign": 以 campaign_name 為索引、
+            包含 spend, impressions, clicks, reach 和 rows（洞察數據行數）的DataFrame,
+            "conversions": 廣告賬戶洞察數據按廣告系列匯總的轉化數據（見 conversion_partial）}
+        """
+        with span("analyze.flatten", "analyze") as flatten_span:
             # 提取所有廣告系列數據
             campaigns = []
-            for account_data in ad_data:
-                if "campaigns" in account_data:
-                    campaigns.extend(account_data["campaigns"])
-            
-            if not campaigns:
-                return {"success": False, "error": "沒有廣告系列數據"}
+            account_insights = []
+            for account_data in self._iter_ad_accounts(ad_data):
+                campaigns.extend(account_data.get("campaigns") or [])
+                # 廣告賬戶的洞察數據（get_ad_insights，包含行為和轉化列表）
+                account_insights.extend(row for row in account_data.get("insights") or [] if isinstance(row, dict))
             
             # 提取洞察數據
             insights_data = []
             for campaign in campaigns:
                 if "insights" in campaign and "data" in campaign["insights"]:
                     for insight in campaign["insights"]["data"]:
-                        insight["campaign_name"] = campaign.get("name", "未知")
-                        insight["campaign_id"] = campaign.get("id", "未知")
-                        insights_data.append(insight)
-            
-            if not insights_data:
-                return {"success": False, "error": "沒有洞察數據"}
+                        # 不修改輸入數據（流水線模式下同一份數據同時在後台保存）
+                        insights_data.append(dict(insight, campaign_name=campaign.get("name", "未知"),
+                                                  campaign_id=campaign.get("id", "未知")))
             
-            # 轉換為DataFrame進行分析
-            df = pd.DataFrame(insights_data)
+            # 轉換為DataFrame，確保數值列是數值類型
+            df = pd.DataFrame(insights_data, columns=None if insights_data else ["campaign_name"])
+            for col in AD_METRICS:
+                df[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else 0
             
-            # 確保數值列是數值類型
-            numeric_cols = ['impressions', 'clicks', 'spend', 'reach']
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+            flatten_span.set(campaigns=len(campaigns), rows=len(df))
+        
+        with span("analyze.groupby", "analyze", by="campaign_name"):
+            grouped = df.groupby('campaign_name')
+            by_campaign = grouped[list(AD_METRICS)].sum()
+            by_campaign["rows"] = grouped.size()
+        
+        with span("analyze.explode_actions", "analyze", rows=len(account_insights)):
+            conversions = self.conversion_partial(account_insights)
+        
+        return {"campaigns": len(campaigns), "by_campaign": by_campaign, "conversions": conversions}
+    
+    def conversion_partial(self, insights: List[Dict]) -> pd.DataFrame:
+        """把洞察數據行的行為列表展開，並按廣告系列匯總轉化數據
+        
+        Args:
+            insights: 洞察數據行（get_ad_insights 的結果，可以是任意級別）
+        
+        Returns:
+            以 campaign_name 為索引、包含 spend, impressions, clicks, conversions, conversion_value,
+            各行為類型的 "<字段>:<行為類型>" 列和 rows（洞察數據行數）的DataFrame
+        """
+        df = pd.DataFrame(insights, columns=None if insights else ["campaign_name"])
+        df = explode_action_columns(df)
+        for col in ("spend", "impressions", "clicks"):
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0) if col in df.columns else 0
+        
+        # 轉化數和轉化價值：優先使用 actions / action_values，其次是 conversions / conversion_values
+        action_type = self.conversion_action_type
+        for metric, sources in (("conversions", ("actions", "conversions")),
+                                ("conversion_value", ("action_values", "conversion_values"))):
+            df[metric] = 0
+            for source in reversed(sources):
+                if f"{source}:{action_type}" in df.columns:
+                    df[metric] = df[f"{source}:{action_type}"]
+        
+        # 賬戶級洞察數據沒有廣告系列字段，計入「全部廣告系列」
+        campaign = pd.Series("全部廣告系列", index=df.index, dtype=object)
+        for key in ("campaign_id", "campaign_name"):
+            if key in df.columns:
+                campaign = df[key].where(df[key].notna(), campaign)
+        df["campaign_name"] = campaign
+        
+        action_columns = [col for col in df.columns
+                          if isinstance(col, str) and col.split(":", 1)[0] in ADDITIVE_ACTION_COLUMNS and ":" in col]
+        grouped = df.groupby("campaign_name")
+        conversions = grouped[list(CONVERSION_METRICS) + action_columns].sum()
+        conversions["rows"] = grouped.size()
+        return conversions
+    
+    def ad_performance_from_partial(self, partial: Dict[str, Any]) -> Dict:
+        """從部分聚合結果計算廣告表現
+        
+        Args:
+            partial: ad_partial 的結果（或多個結果之和）
             
+        Returns:
+            分析結果
+        """
+        if not partial["campaigns"]:
+            return {"success": False, "error": "沒有廣告系列數據"}
+        
+        by_campaign = partial["by_campaign"]
+        if by_campaign.empty or not by_campaign["rows"].sum():
+            return {"success": False, "error": "沒有洞察數據"}
+        
+        with span("analyze.derived_metrics", "analyze", level="account"):
             # 計算關鍵指標
-            total_spend = df['spend'].sum() if 'spend' in df.columns else 0
-            total_impressions = df['impressions'].sum() if 'impressions' in df.columns else 0
-            total_clicks = df['clicks'].sum() if 'clicks' in df.columns else 0
-            total_reach = df['reach'].sum() if 'reach' in df.columns else 0
+            total_spend = by_campaign['spend'].sum()
+            total_impressions = by_campaign['impressions'].sum()
+            total_clicks = by_campaign['clicks'].sum()
+            total_reach = by_campaign['reach'].sum()
             
             # 計算衍生指標
             ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
             cpc = (total_spend / total_clicks) if total_clicks > 0 else 0
             cpm = (total_spend / total_impressions * 1000) if total_impressions > 0 else 0
             frequency = (total_impressions / total_reach) if total_reach > 0 else 0
+        
+        with span("analyze.derived_metrics", "analyze", level="campaign"):
+            # 計算每個廣告系列的CTR和CPC
+            campaign_performance = by_campaign[list(AD_METRICS)].reset_index()
+            campaign_performance['ctr'] = campaign_performance['clicks'] / campaign_performance['impressions'] * 100
+            campaign_performance['cpc'] = campaign_performance['spend'] / campaign_performance['clicks']
+            campaign_performance['cpm'] = campaign_performance['spend'] / campaign_performance['impressions'] * 1000
             
-            # 按廣告系列分組
-            campaign_performance = None
-            if 'campaign_name' in df.columns and 'spend' in df.columns:
-                campaign_performance = df.groupby('campaign_name').agg({
-                    'spend': 'sum',
-                    'impressions': 'sum',
-                    'clicks': 'sum',
-                    'reach': 'sum'
-                }).reset_index()
-                
-                # 計算每個廣告系列的CTR和CPC
-                campaign_performance['ctr'] = campaign_performance['clicks'] / campaign_performance['impressions'] * 100
-                campaign_performance['cpc'] = campaign_performance['spend'] / campaign_performance['clicks']
-                campaign_performance['cpm'] = campaign_performance['spend'] / campaign_performance['impressions'] * 1000
-                
-                # 處理無限值和NaN
-                campaign_performance = campaign_performance.replace([np.inf, -np.inf], np.nan)
-                campaign_performance = campaign_performance.fillna(0)
-                
-                # 轉換為字典列表
-                campaign_performance = campaign_performance.to_dict('records')
-            
-            # 返回分析結果
-            return {
-                "success": True,
-                "summary": {
-                    "total_spend": total_spend,
-                    "total_impressions": total_impressions,
-                    "total_clicks": total_clicks,
-                    "total_reach": total_reach,
-                    "ctr": ctr,
-                    "cpc": cpc,
-                    "cpm": cpm,
-                    "frequency": frequency
-                },
-                "campaign_performance": campaign_performance
+            # 處理無限值和NaN
+            campaign_performance = campaign_performance.replace([np.inf, -np.inf], np.nan)
+            campaign_performance = campaign_performance.fillna(0)
+        
+        # 返回分析結果
+        result = {
+            "success": True,
+            "summary": {
+                "total_spend": total_spend,
+                "total_impressions": total_impressions,
+                "total_clicks": total_clicks,
+                "total_reach": total_reach,
+                "ctr": ctr,
+                "cpc": cpc,
+                "cpm": cpm,
+                "frequency": frequency
+            },
+            "campaign_performance": campaign_performance.to_dict('records')
+        }
+        
+        # 洞察數據包含行為列表時才計算轉化表現
+        conversions = partial.get("conversions")
+        if conversions is not None and any(":" in str(col) for col in conversions.columns):
+            result["conversion_performance"] = self.conversion_performance_from_partial(conversions)
+        return result
+    
+    def conversion_performance_from_partial(self, conversions: pd.DataFrame) -> Dict[str, Any]:
+        """從按廣告系列匯總的轉化數據計算CPA、轉化率和ROAS
+        
+        Args:
+            conversions: conversion_partial 的結果（或多個結果之和）
+        
+        Returns:
+            {"action_type": 轉化行為類型, "summary": 總計指標, "campaigns": 每個廣告系列的指標,
+            "actions": 每種行為類型的總數}
+        """
+        with span("analyze.derived_metrics", "analyze", level="conversion"):
+            # 合併時只在一側出現的列為NaN
+            conversions = conversions.fillna(0)
+            totals = conversions[list(CONVERSION_METRICS)].sum()
+            
+            summary = {
+                "total_spend": totals["spend"],
+                "total_clicks": totals["clicks"],
+                "total_conversions": totals["conversions"],
+                "total_conversion_value": totals["conversion_value"],
+                "cpa": (totals["spend"] / totals["conversions"]) if totals["conversions"] > 0 else 0,
+                "conversion_rate": (totals["conversions"] / totals["clicks"] * 100) if totals["clicks"] > 0 else 0,
+                "roas": (totals["conversion_value"] / totals["spend"]) if totals["spend"] > 0 else 0
             }
             
+            campaigns = conversions[list(CONVERSION_METRICS)].reset_index()
+            campaigns['cpa'] = campaigns['spend'] / campaigns['conversions']
+            campaigns['conversion_rate'] = campaigns['conversions'] / campaigns['clicks'] * 100
+            campaigns['roas'] = campaigns['conversion_value'] / campaigns['spend']
+            campaigns = campaigns.replace([np.inf, -np.inf], np.nan).fillna(0)
+            
+            action_columns = [col for col in conversions.columns if col.startswith("actions:")]
+            actions = {col.split(":", 1)[1]: value for col, value in conversions[action_columns].sum().items()}
+        
+        return {
+            "action_type": self.conversion_action_type,
+            "summary": summary,
+            "campaigns": campaigns.to_dict('records'),
+            "actions": actions
+        }
+    
+    @traced("analyze.ad_performance", "analyze")
+    def analyze_ad_performance(self, ad_data: List[Dict]) -> Dict:
+        """分析廣告表現
+        
+        Args:
+            ad_data: 廣告數據列表（廣告賬戶數據，或 load_all_data 返回的數據文件列表）
+            
+        Returns:
+            分析結果
+        """
+        if not ad_data:
+            return {"success": False, "error": "沒有廣告數據"}
+        
+        try:
+            return self.ad_performance_from_partial(self.ad_partial(ad_data))
         except Exception as e:
             logger.exception(f"分析廣告表現時出錯: {e}")
             return {"success": False, "error": str(e)}
     
-    def analyze_page_engagement(self, page_data: List[Dict]) -> Dict:
-        """分析頁面互動
+    @traced("analyze.page_partial", "analyze")
+    def page_partial(self, page_data: List[Any]) -> Dict[str, Any]:
+        """把頁面數據匯總為可以相加的部分聚合結果
         
         Args:
             page_data: 頁面數據列表
             
         Returns:
-            分析結果
+            {"pages", "fans", "verified", "posts": 計數, "engagement": 以 page_name 為索引的互動匯總DataFrame
+            （含 rows: 有反應數據的帖子數）, "top_posts": 互動最高的帖子}
         """
-        if not page_data:
-            return {"success": False, "error": "沒有頁面數據"}
-        
-        try:
+        with span("analyze.flatten", "analyze") as flatten_span:
             # 提取所有頁面和帖子數據
             pages = []
             posts = []
             
             for page_item in page_data:
                 if isinstance(page_item, dict) and "data" in page_item:
-                    for page in page_item["data"]:
-                        pages.append(page)
-                        if "posts" in page:
-                            for post in page["posts"]:
-                                post["page_id"] = page.get("id", "未知")
-                                post["page_name"] = page.get("name", "未知")
-                                posts.append(post)
-                elif isinstance(page_item, list):
-                    for page in page_item:
-                        pages.append(page)
-                        if "posts" in page:
-                            for post in page["posts"]:
-                                post["page_id"] = page.get("id", "未知")
-                                post["page_name"] = page.get("name", "未知")
-                                posts.append(post)
-            
-            if not pages:
-                return {"success": False, "error": "沒有頁面數據"}
+                    page_item = page_item["data"]
+                if not isinstance(page_item, list):
+                    continue
+                for page in page_item:
+                    pages.append(page)
+                    if "posts" in page:
+                        for post in page["posts"]:
+                            posts.append(dict(post, page_id=page.get("id", "未知"),
+                                              page_name=page.get("name", "未知")))
+            
+            flatten_span.set(pages=len(pages), posts=len(posts))
+        
+        partial = {
+            "pages": len(pages),
+            "fans": sum(page.get("fan_count", 0) for page in pages),
+            "verified": sum(1 for page in pages if page.get("verification_status") == "verified"),
+            "posts": len(posts),
+            "engagement": pd.DataFrame(columns=list(ENGAGEMENT_METRICS) + ["rows"]),
+            "top_posts": []
+        }
+        
+        with span("analyze.flatten", "analyze", level="post"):
+            # 提取互動數據
+            reactions_data = []
+            for post in posts:
+                if "reactions" in post and "summary" in post["reactions"]:
+                    reactions_data.append({
+                        "post_id": post.get("id", "未知"),
+                        "page_name": post.get("page_name", "未知"),
+                        "created_time": post.get("created_time", ""),
+                        "message": post.get("message", "")[:100] + "..." if len(post.get("message", "")) > 100 else post.get("message", ""),
+                        "reactions": post["reactions"]["summary"].get("total_count", 0),
+                        "comments": post["comments"]["summary"].get("total_count", 0) if "comments" in post and "summary" in post["comments"] else 0,
+                        "shares": post.get("shares", {}).get("count", 0) if "shares" in post else 0
+                    })
+        
+        if reactions_data:
+            reactions_df = pd.DataFrame(reactions_data)
             
+            # 計算總互動
+            reactions_df["total_engagement"] = reactions_df["reactions"] + reactions_df["comments"] + reactions_df["shares"]
+            
+            with span("analyze.groupby", "analyze", by="page_name"):
+                # 按頁面分組
+                grouped = reactions_df.groupby("page_name")
+                engagement = grouped[list(ENGAGEMENT_METRICS)].sum()
+                engagement["rows"] = grouped.size()
+                partial["engagement"] = engagement
+                
+                # 找出互動最高的帖子
+                partial["top_posts"] = reactions_df.sort_values("total_engagement", ascending=False).head(5).to_dict("records")
+        
+        return partial
+    
+    def page_engagement_from_partial(self, partial: Dict[str, Any]) -> Dict:
+        """從部分聚合結果計算頁面互動
+        
+        Args:
+            partial: page_partial 的結果（或多個結果之和）
+            
+        Returns:
+            分析結果
+        """
+        if not partial["pages"]:
+            return {"success": False, "error": "沒有頁面數據"}
+        
+        with span("analyze.derived_metrics", "analyze", level="page"):
             # 頁面統計
             page_stats = {
-                "total_pages": len(pages),
-                "total_fans": sum(page.get("fan_count", 0) for page in pages),
-                "avg_fans": sum(page.get("fan_count", 0) for page in pages) / len(pages) if pages else 0,
-                "verified_pages": sum(1 for page in pages if page.get("verification_status") == "verified")
+                "total_pages": partial["pages"],
+                "total_fans": partial["fans"],
+                "avg_fans": partial["fans"] / partial["pages"],
+                "verified_pages": partial["verified"]
             }
-            
-            # 帖子分析
-            post_stats = {}
-            if posts:
-                # 提取互動數據
-                post_df = pd.DataFrame(posts)
-                
-                # 處理反應數據
-                reactions_data = []
-                for post in posts:
-                    if "reactions" in post and "summary" in post["reactions"]:
-                        reactions_data.append({
-                            "post_id": post.get("id", "未知"),
-                            "page_name": post.get("page_name", "未知"),
-                            "created_time": post.get("created_time", ""),
-                            "message": post.get("message", "")[:100] + "..." if len(post.get("message", "")) > 100 else post.get("message", ""),
-                            "reactions": post["reactions"]["summary"].get("total_count", 0),
-                            "comments": post["comments"]["summary"].get("total_count", 0) if "comments" in post and "summary" in post["comments"] else 0,
-                            "shares": post.get("shares", {}).get("count", 0) if "shares" in post else 0
-                        })
-                
-                if reactions_data:
-                    reactions_df = pd.DataFrame(reactions_data)
-                    
-                    # 計算總互動
-                    reactions_df["total_engagement"] = reactions_df["reactions"] + reactions_df["comments"] + reactions_df["shares"]
-                    
-                    # 按頁面分組
-                    page_engagement = reactions_df.groupby("page_name").agg({
-                        "reactions": "sum",
-                        "comments": "sum",
-                        "shares": "sum",
-                        "total_engagement": "sum"
-                    }).reset_index()
-                    
-                    # 找出互動最高的帖子
-                    top_posts = reactions_df.sort_values("total_engagement", ascending=False).head(5).to_dict("records")
-                    
-                    post_stats = {
-                        "total_posts": len(posts),
-                        "total_reactions": reactions_df["reactions"].sum(),
-                        "total_comments": reactions_df["comments"].sum(),
-                        "total_shares": reactions_df["shares"].sum(),
-                        "total_engagement": reactions_df["total_engagement"].sum(),
-                        "avg_engagement_per_post": reactions_df["total_engagement"].mean(),
-                        "page_engagement": page_engagement.to_dict("records"),
-                        "top_posts": top_posts
-                    }
-            
-            # 返回分析結果
-            return {
-                "success": True,
-                "page_stats": page_stats,
-                "post_stats": post_stats
+        
+        # 帖子分析
+        post_stats = {}
+        engagement = partial["engagement"]
+        if partial["posts"] and not engagement.empty and engagement["rows"].sum():
+            post_stats = {
+                "total_posts": partial["posts"],
+                "total_reactions": engagement["reactions"].sum(),
+                "total_comments": engagement["comments"].sum(),
+                "total_shares": engagement["shares"].sum(),
+                "total_engagement": engagement["total_engagement"].sum(),
+                "avg_engagement_per_post": engagement["total_engagement"].sum() / engagement["rows"].sum(),
+                "page_engagement": engagement[list(ENGAGEMENT_METRICS)].reset_index().to_dict("records"),
+                "top_posts": partial["top_posts"]
             }
+        
+        # 返回分析結果
+        return {
+            "success": True,
+            "page_stats": page_stats,
+            "post_stats": post_stats
+        }
+    
+    @traced("analyze.page_engagement", "analyze")
+    def analyze_page_engagement(self, page_data: List[Dict]) -> Dict:
+        """分析頁面互動
+        
+        Args:
+            page_data: 頁面數據列表
             
+        Returns:
+            分析結果
+        """
+        if not page_data:
+            return {"success": False, "error": "沒有頁面數據"}
+        
+        try:
+            return self.page_engagement_from_partial(self.page_partial(page_data))
         except Exception as e:
             logger.exception(f"分析頁面互動時出錯: {e}")
             return {"success": False, "error": str(e)}
     
+    @traced("report.ad_chart", "report")
     def generate_ad_performance_chart(self, ad_data: Dict, chart_type: str = "bar") -> str:
         """生成廣告表現圖表
         
@@ -373,6 +630,7 @@ class FacebookDataAnalyzer:
             logger.exception(f"生成廣告表現圖表時出錯: {e}")
             return ""
     
+    @traced("report.engagement_chart", "report")
     def generate_engagement_chart(self, engagement_data: Dict) -> str:
         """生成互動數據圖表
         
@@ -436,6 +694,7 @@ class FacebookDataAnalyzer:
             logger.exception(f"生成互動數據圖表時出錯: {e}")
             return ""
     
+    @traced("report.generate", "report")
     def generate_report(self, analysis_results: Dict, report_type: str = "html") -> str:
         """生成分析報告
         
@@ -477,6 +736,7 @@ class FacebookDataAnalyzer:
             logger.exception(f"生成報告時出錯: {e}")
             return ""
     
+    @traced("report.html", "report")
     def _generate_html_report(self, analysis_results: Dict) -> str:
         """生成HTML格式的報告
         
@@ -558,6 +818,44 @@ class FacebookDataAnalyzer:
                 
                 html.append("    </table>")
             
+            # 轉化表現（CPA、轉化率和ROAS）
+            conversion = ad_perf.get("conversion_performance")
+            if conversion:
+                conversion_summary = conversion["summary"]
+                html.extend([
+                    f"    <h3>轉化表現（{conversion['action_type']}）</h3>",
+                    "    <div class=\"summary-box\">",
+                    "        <div class=\"metric\"><span class=\"metric-name\">轉化數:</span> " + f"{int(conversion_summary['total_conversions']):,}</div>",
+                    "        <div class=\"metric\"><span class=\"metric-name\">轉化價值:</span> $" + f"{conversion_summary['total_conversion_value']:.2f}</div>",
+                    "        <div class=\"metric\"><span class=\"metric-name\">每次轉化成本 (CPA):</span> $" + f"{conversion_summary['cpa']:.2f}</div>",
+                    "        <div class=\"metric\"><span class=\"metric-name\">轉化率:</span> " + f"{conversion_summary['conversion_rate']:.2f}%</div>",
+                    "        <div class=\"metric\"><span class=\"metric-name\">廣告支出回報率 (ROAS):</span> " + f"{conversion_summary['roas']:.2f}</div>",
+                    "    </div>",
+                    "    <table>",
+                    "        <tr>",
+                    "            <th>廣告系列</th>",
+                    "            <th>支出</th>",
+                    "            <th>轉化數</th>",
+                    "            <th>轉化價值</th>",
+                    "            <th>每次轉化成本</th>",
+                    "            <th>轉化率</th>",
+                    "            <th>ROAS</th>",
+                    "        </tr>"
+                ])
+                
+                for campaign in conversion["campaigns"]:
+                    html.append(f"        <tr>")
+                    html.append(f"            <td>{campaign['campaign_name']}</td>")
+                    html.append(f"            <td>${campaign['spend']:.2f}</td>")
+                    html.append(f"            <td>{int(campaign['conversions']):,}</td>")
+                    html.append(f"            <td>${campaign['conversion_value']:.2f}</td>")
+                    html.append(f"            <td>${campaign['cpa']:.2f}</td>")
+                    html.append(f"            <td>{campaign['conversion_rate']:.2f}%</td>")
+                    html.append(f"            <td>{campaign['roas']:.2f}</td>")
+                    html.append(f"        </tr>")
+                
+                html.append("    </table>")
+            
             # 圖表引用
             if "ad_chart_path" in analysis_results:
                 chart_filename = os.path.basename(analysis_results["ad_chart_path"])
@@ -679,6 +977,7 @@ class FacebookDataAnalyzer:
         
         return "\n".join(html)
     
+    @traced("report.text", "report")
     def _generate_text_report(self, analysis_results: Dict) -> str:
         """生成文本格式的報告
         
@@ -725,6 +1024,28 @@ class FacebookDataAnalyzer:
                     lines.append(f"{name:<30} ${campaign['spend']:>9.2f} {int(campaign['impressions']):>10,} {int(campaign['clicks']):>10,} {campaign['ctr']:>9.2f}% ${campaign['cpc']:>9.2f} ${campaign['cpm']:>9.2f}")
                 
                 lines.append("")  # 空行
+            
+            # 轉化表現
+            conversion = ad_perf.get("conversion_performance")
+            if conversion:
+                conversion_summary = conversion["summary"]
+                lines.extend([
+                    f"轉化表現（{conversion['action_type']}）:",
+                    f"  轉化數: {int(conversion_summary['total_conversions']):,}",
+                    f"  轉化價值: ${conversion_summary['total_conversion_value']:.2f}",
+                    f"  每次轉化成本 (CPA): ${conversion_summary['cpa']:.2f}",
+                    f"  轉化率: {conversion_summary['conversion_rate']:.2f}%",
+                    f"  廣告支出回報率 (ROAS): {conversion_summary['roas']:.2f}",
+                    "-" * 80,
+                    f"{'廣告系列':<30} {'支出':>10} {'轉化數':>10} {'轉化價值':>10} {'CPA':>10} {'轉化率':>10} {'ROAS':>10}",
+                    "-" * 80
+                ])
+                
+                for campaign in conversion["campaigns"]:
+                    name = str(campaign['campaign_name'])[:30]
+                    lines.append(f"{name:<30} ${campaign['spend']:>9.2f} {int(campaign['conversions']):>10,} ${campaign['conversion_value']:>9.2f} ${campaign['cpa']:>9.2f} {campaign['conversion_rate']:>9.2f}% {campaign['roas']:>10.2f}")
+                
+                lines.append("")  # 空行
         
         # 頁面互動部分
         if "page_engagement" in analysis_results and analysis_results["page_engagement"].get("success", False):
@@ -802,6 +1123,56 @@ class FacebookDataAnalyzer:
         
         return "\n".join(lines)
     
+    @traced("analyze.collected", "analyze")
+    def analyze_collected(self, ad_data: List[Dict], page_data: List[Any], analysis_type: str = "all",
+                          generate_charts: bool = True, report_format: str = "html") -> Dict:
+        """分析內存中的收集數據並生成報告
+        
+        Args:
+            ad_data: 廣告賬戶數據列表（collect_ad_data 的結果數據）
+            page_data: 頁面數據列表，每項是一次 collect_page_data 的結果數據或已加載的數據文件
+            analysis_type: 分析類型 (ad_performance, page_engagement, all)
+            generate_charts: 是否生成圖表
+            report_format: 報告格式 (html, json, txt)
+            
+        Returns:
+            分析結果和報告路徑
+        """
+        results = {}
+        
+        # 執行分析
+        if analysis_type in ["ad_performance", "all"] and ad_data:
+            ad_performance = self.analyze_ad_performance(ad_data)
+            results["ad_performance"] = ad_performance
+            
+            # 生成圖表
+            if generate_charts and ad_performance.get("success", False):
+                chart_path = self.generate_ad_performance_chart(ad_performance)
+                if chart_path:
+                    results["ad_chart_path"] = chart_path
+        
+        if analysis_type in ["page_engagement", "all"] and page_data:
+            page_engagement = self.analyze_page_engagement(page_data)
+            results["page_engagement"] = page_engagement
+            
+            # 生成圖表
+            if generate_charts and page_engagement.get("success", False):
+                chart_path = self.generate_engagement_chart(page_engagement)
+                if chart_path:
+                    results["engagement_chart_path"] = chart_path
+        
+        # 生成報告
+        if results:
+            report_path = self.generate_report(results, report_format)
+            results["report_path"] = report_path
+            results["success"] = True
+        else:
+            results["success"] = False
+            results["error"] = "沒有可分析的數據"
+        
+        return results
+    
+    @traced("analyze.run", "analyze")
     def run_analysis(self, analysis_type: str, data_source: str = None, 
                     generate_charts: bool = True, report_format: str = "html") -> Dict:
         """運行數據分析
@@ -816,8 +1187,26 @@ class FacebookDataAnalyzer:
             分析結果和報告路徑
         """
         results = {}
+        cache_key = None
         
         try:
+            if self.cache is not None:
+                with span("analyze.cache_lookup", "analyze") as lookup_span:
+                    if data_source:
+                        inputs = [("source", data_source)]
+                    else:
+                        inputs = [(data_type, path) for section, data_type in
+                                  (("ad_performance", "ad_data"), ("page_engagement", "page"))
+                                  if analysis_type in [section, "all"]
+                                  for path in self.list_data_files(data_type)]
+                    cache_key = self.cache.key(inputs, analysis_type=analysis_type, generate_charts=generate_charts,
+                                               report_format=report_format, code_version=ANALYSIS_CODE_VERSION,
+                                               conversion_action_type=self.conversion_action_type)
+                    cached = self.cache.get(cache_key)
+                    lookup_span.set(inputs=len(inputs), hit=cached is not None)
+                if cached is not None:
+                    return cached
+            
             # 加載數據
             if data_source:
                 data = self.load_data(data_source)
@@ -848,34 +1237,11 @@ class FacebookDataAnalyzer:
                     page_data = []
             
             # 執行分析
-            if analysis_type in ["ad_performance", "all"] and ad_data:
-                ad_performance = self.analyze_ad_performance(ad_data)
-                results["ad_performance"] = ad_performance
-                
-                # 生成圖表
-                if generate_charts and ad_performance.get("success", False):
-                    chart_path = self.generate_ad_performance_chart(ad_performance)
-                    if chart_path:
-                        results["ad_chart_path"] = chart_path
-            
-            if analysis_type in ["page_engagement", "all"] and page_data:
-                page_engagement = self.analyze_page_engagement(page_data)
-                results["page_engagement"] = page_engagement
-                
-                # 生成圖表
-                if generate_charts and page_engagement.get("success", False):
-                    chart_path = self.generate_engagement_chart(page_engagement)
-                    if chart_path:
-                        results["engagement_chart_path"] = chart_path
-            
-            # 生成報告
-            if results:
-                report_path = self.generate_report(results, report_format)
-                results["report_path"] = report_path
-                results["success"] = True
-            else:
-                results["success"] = False
-                results["error"] = "沒有可分析的數據"
+            results = self.analyze_collected(ad_data, page_data, analysis_type, generate_charts, report_format)
+            
+            if cache_key and results.get("success"):
+                self.cache.put(cache_key, results)
+                results["cache"] = {"hit": False, "key": cache_key}
             
         except Exception as e:
             logger.exception(f"運行分析時出錯: {e}")
@@ -883,6 +1249,39 @@ class FacebookDataAnalyzer:
             results["error"] = str(e)
         
         return results
+    
+    def watch(self, analysis_type: str = "all", interval: float = None, max_iterations: int = None) -> Dict:
+        """監視數據目錄，新的收集結果出現時增量更新分析報告
+        
+        Args:
+            analysis_type: 分析類型 (ad_performance, page_engagement, all)
+            interval: 檢查間隔秒數（默認使用 [Analysis] watch_interval）
+            max_iterations: 最多檢查的次數（默認一直運行直到中斷）
+            
+        Returns:
+            最後一次的分析結果和報告路徑
+        """
+        from analysis_watcher import AnalysisWatcher
+        
+        watcher = AnalysisWatcher(self, self.config, analysis_type, interval)
+        return watcher.watch(max_iterations=max_iterations)
+    
+    def run(self) -> Dict:
+        """按配置分析所有已收集的數據並生成報告
+        
+        Returns:
+            分析結果和報告路徑
+        """
+        generate_charts = self.config.getboolean('Analysis', 'generate_charts', fallback=True)
+        report_format = self.config.get('Analysis', 'default_report_format', fallback='html')
+        
+        results = self.run_analysis("all", generate_charts=generate_charts, report_format=report_format)
+        if results.get("success"):
+            logger.info(f"分析完成，報告已保存到: {results.get('report_path')}")
+        else:
+            logger.warning(f"分析未完成: {results.get('error', '未知錯誤')}")
+        
+        return results
 
 
 if __name__ == "__main__":
@@ -18,15 +18,51 @@ import time
 import random
 import logging
 import requests
-from typing import Dict, List, Optional, Union, Any
+import functools
+import threading
+from typing import Dict, List, Optional, Union, Any, Callable, Tuple
 from configparser import ConfigParser
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qsl, urlencode
 
 from utils import save_json, load_json
+from snapshot_store import ObjectStore
+from campaign_cdc import CampaignChangeLog
+from metrics import MetricsRegistry, normalize_endpoint, write_metrics_files
+from tracing import span, traced
+from task_scheduler import TaskScheduler
+from job_journal import JobJournal
+from retry_policy import RetryPolicy, classify_error, PERMANENT, RATE_LIMIT
+from field_profiles import PROFILE_NAMES, resolve_fields, join_fields, field_name
+from progress import ProgressBus, TASK_STARTED, TASK_FINISHED
 
 # 設置日誌
 logger = logging.getLogger(__name__)
 
+# 每個頁面默認獲取的帖子數量
+DEFAULT_POSTS_LIMIT = 25
+
+# 每個多ID查詢（?ids=）請求最多包含的ID數量
+MAX_IDS_PER_REQUEST = 50
+
+
+def _instrumented_collection(operation: str):
+    """記錄收集操作的耗時、結果狀態和收集到的對象數量"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            labels = {"operation": operation}
+            with span(f"collect.{operation}", "collect") as collect_span, \
+                    self.metrics.timer("collect_duration_seconds", labels, in_flight="collect_in_flight"):
+                result = func(self, *args, **kwargs)
+                collect_span.set(success=bool(result.get("success")), items=len(result.get("data") or []))
+            if result.get("success"):
+                self.metrics.inc("collect_items_total", len(result.get("data") or []), labels)
+            self.metrics.inc("collect_runs_total", labels=dict(labels, success=bool(result.get("success"))))
+            return result
+        return wrapper
+    return decorator
+
 
 class FacebookDataCollector:
     """Facebook數據收集類"""
@@ -50,46 +86,251 @@ class FacebookDataCollector:
         # 數據存儲路徑
         self.data_dir = config.get('Files', 'data_dir', fallback='data')
         os.makedirs(self.data_dir, exist_ok=True)
+        # 正在寫入的數據文件（多個工作線程同一秒內保存同一目標的數據時避免文件名衝突）
+        self._save_lock = threading.Lock()
+        self._saving_paths = set()
+        
+        # 按內容尋址保存快照：只寫入變化的記錄和引用它們的清單（為空時保存完整的JSON文件）
+        self.snapshot_store = None
+        if config.getboolean('Collection', 'dedup_snapshots', fallback=False):
+            self.snapshot_store = ObjectStore(
+                config.get('Collection', 'objects_dir', fallback='') or os.path.join(self.data_dir, '.objects')
+            )
+        
+        # 廣告系列狀態變更日誌：每次收集廣告數據時與上次已知的狀態比較
+        self.campaign_changes = None
+        if config.getboolean('Collection', 'campaign_cdc', fallback=True):
+            self.campaign_changes = CampaignChangeLog(
+                config.get('Collection', 'campaign_state_db', fallback='') or
+                os.path.join(self.data_dir, 'campaign_state.db')
+            )
+        
+        # 任務檢查點日誌目錄（為空時不記錄檢查點）
+        self.journal_dir = config.get('Collection', 'journal_dir', fallback=os.path.join(self.data_dir, 'jobs'))
+        # 檢查點有效期（小時），更早創建的檢查點不再恢復（0表示不限制）
+        self.journal_ttl_hours = config.getfloat('Collection', 'journal_ttl_hours', fallback=24)
+        
+        # 默認請求字段配置 (minimal, standard, full, analysis)，
+        # 可以用 field_profile.<收集方法> 為單個方法單獨設置
+        self.field_profile = config.get('Collection', 'field_profile', fallback='full')
+        
+        # 廣告洞察數據的級別（轉化分析按廣告系列匯總，需要 campaign 或更細的級別）
+        self.ad_insights_level = config.get('Collection', 'ad_insights_level', fallback='campaign')
+        
+        # 是否用嵌套字段展開在父對象的請求中同時獲取帖子、廣告系列和洞察數據
+        self.field_expansion = config.getboolean('Collection', 'field_expansion', fallback=True)
         
         # 請求限制設置
         self.request_limit = config.getint('Limits', 'request_limit', fallback=100)
         self.request_interval = config.getfloat('Limits', 'request_interval', fallback=1.0)
         
-        # 請求計數器
+        # 請求計數器（所有工作線程共享）
         self.request_count = 0
         self.last_request_time = 0
+        self._rate_lock = threading.Lock()
+        
+        # HTTP會話（所有工作線程共享連接池，長時間運行時連接保持複用）
+        self.session = requests.Session()
+        pool_size = max(10, config.getint('Collection', 'max_workers', fallback=4))
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # 重試策略（錯誤分類、退避、重試預算和按端點的熔斷器，所有工作線程共享）
+        self.retry_policy = RetryPolicy.from_config(config)
+        
+        # 請求指標 (json, prometheus, both, none)
+        self.metrics = MetricsRegistry()
+        self.metrics_format = config.get('Metrics', 'export_format', fallback='json')
+        self._describe_metrics()
+        
+        # 進度事件總線（每個訂閱者的隊列大小，隊列已滿時丟棄最舊的事件，收集線程從不等待）
+        self.progress = ProgressBus(config.getint('Collection', 'progress_queue_size', fallback=1000))
         
         logger.info("Facebook數據收集器初始化完成")
     
+    def _describe_metrics(self) -> None:
+        """設置收集器指標的說明"""
+        self.metrics.describe("http_request_duration_seconds", "API請求耗時（按端點）")
+        self.metrics.describe("http_requests_total", "API請求次數（按端點和狀態）")
+        self.metrics.describe("http_response_bytes_total", "API響應字節數（按端點）")
+        self.metrics.describe("http_requests_in_flight", "正在進行的API請求數")
+        self.metrics.describe("http_retries_total", "API請求重試次數（按端點和原因）")
+        self.metrics.describe("http_throttled_total", "API速率限制響應次數（按端點）")
+        self.metrics.describe("http_circuit_rejected_total", "因端點熔斷器打開而跳過的API請求次數（按端點）")
+        self.metrics.describe("sleep_seconds_total", "因限速或重試而等待的秒數（按原因）")
+        self.metrics.describe("collect_duration_seconds", "收集操作耗時（按操作）")
+        self.metrics.describe("collect_items_total", "收集到的頂層對象數量（按操作）")
+        self.metrics.describe("collect_runs_total", "收集操作次數（按操作和結果）")
+        self.metrics.describe("collect_in_flight", "正在進行的收集操作數")
+        self.metrics.describe("snapshot_objects_total", "保存快照時寫入和複用的對象數（按結果）")
+        self.metrics.describe("snapshot_bytes_written_total", "保存快照時寫入的對象字節數")
+    
+    def _fields(self, method: str, profile: str = None) -> str:
+        """
+        返回收集方法的fields參數
+        
+        Args:
+            method: 收集方法，參見 field_profiles.FIELD_PROFILES
+            profile: 字段配置（默認使用配置文件中該方法或全局的設置）
+        
+        Returns:
+            逗號分隔的字段
+        """
+        if not profile:
+            profile = self.config.get('Collection', f'field_profile.{method}', fallback=self.field_profile)
+        return join_fields(resolve_fields(method, profile))
+    
+    def _expand(self, edge: str, fields: str, **modifiers) -> str:
+        """
+        返回嵌套展開字段
+        
+        Args:
+            edge: 連接名稱，例如 "posts"
+            fields: 子對象的字段，逗號分隔
+            **modifiers: 修飾符，值為None的忽略，例如 limit=25
+        
+        Returns:
+            嵌套展開字段，例如 "posts.limit(25){id,message}"
+        """
+        modifier_text = "".join(f".{key}({value})" for key, value in modifiers.items() if value is not None)
+        return f"{edge}{modifier_text}{{{fields}}}"
+    
+    def _follow_paging(self, items: List[Dict], result: Dict, limit: int = None, checkpoint=None,
+                       description: str = "數據", account_id: str = None) -> Tuple[List[Dict], bool]:
+        """
+        沿分頁的下一頁URL繼續獲取數據
+        
+        Args:
+            items: 已獲取的數據（會被擴展）
+            result: 最近一次的響應或嵌套連接，包含 paging
+            limit: 數量上限，None表示獲取所有分頁
+            checkpoint: 分頁檢查點（可選），每獲取一頁記錄一次，失敗時由檢查點處理（參見 JobJournal.partial_failure）
+            description: 日誌中的數據描述
+            account_id: 使用的賬戶ID（可選）
+        
+        Returns:
+            (數據列表, 是否已獲取所有分頁)；分頁失敗或達到數量上限時還有下一頁則不完整
+        """
+        complete = True
+        while "paging" in result and "next" in result["paging"] and (limit is None or len(items) < limit):
+            next_url = urlsplit(result["paging"]["next"])
+            next_endpoint = next_url.path[len(urlsplit(self.base_url).path):].lstrip("/")
+            params = dict(parse_qsl(next_url.query))
+            
+            result = self._make_request(next_endpoint, params, account_id=account_id)
+            if "data" in result:
+                items.extend(result["data"])
+                logger.info(f"{description}: 獲取到額外 {len(result['data'])} 條")
+                self.progress.rows_collected(len(result["data"]), description)
+                if checkpoint:
+                    checkpoint.save(result["data"], self._next_page_url(result))
+            else:
+                if checkpoint:
+                    checkpoint.fail(f"獲取{description}分頁失敗: {result.get('error', '未知錯誤')}")
+                complete = False
+                break
+        else:
+            complete = "next" not in result.get("paging", {})
+        
+        return (items if limit is None else items[:limit]), complete
+    
+    def _expanded_edge(self, parent: Dict, edge: str, fallback: Callable[[], Tuple[Any, bool]] = None,
+                       limit: int = None, checkpoint=None, description: str = "數據", account_id: str = None) -> Tuple[Any, bool]:
+        """
+        取出父對象中嵌套展開的連接數據，嵌套結果分頁時繼續獲取後續分頁
+        
+        父對象中沒有該連接時（未請求、沒有數據或沒有權限），或檢查點中已有數據時，調用fallback單獨請求。
+        
+        Args:
+            parent: 父對象（會移除其中的連接字段）
+            edge: 連接名稱
+            fallback: 單獨請求連接數據的函數（可選，不提供時返回None），返回 (數據, 是否完整)
+            limit: 數量上限，None表示獲取所有分頁
+            checkpoint: 分頁檢查點（可選）
+            description: 日誌中的數據描述
+            account_id: 獲取後續分頁時使用的賬戶ID（可選）
+        
+        Returns:
+            (數據列表, 是否已獲取所有分頁)，父對象中沒有該連接且沒有fallback時返回 (None, False)
+        """
+        nested = parent.pop(edge, None)
+        if checkpoint is not None and any(checkpoint.load()):
+            # 檢查點中已有數據時由fallback從檢查點繼續
+            nested = None
+        if not isinstance(nested, dict) or "data" not in nested:
+            return fallback() if fallback else (None, False)
+        
+        items = list(nested["data"])
+        if checkpoint:
+            checkpoint.save(items, self._next_page_url(nested))
+        return self._follow_paging(items, nested, limit, checkpoint, description, account_id)
+    
+    def _sleep(self, seconds: float, reason: str) -> None:
+        """等待指定秒數並記錄等待時間
+        
+        Args:
+            seconds: 等待秒數
+            reason: 等待原因 (request_interval, request_limit, rate_limit, error_backoff)
+        """
+        self.metrics.inc("sleep_seconds_total", seconds, {"reason": reason})
+        if reason != "request_interval":
+            self.progress.waited(seconds, reason)
+        time.sleep(seconds)
+    
+    def _acquire_request_slot(self) -> None:
+        """預留下一個請求時段並等待到該時段
+        
+        多個工作線程共享同一個請求間隔和請求限制：每個請求在鎖內預留
+        不早於上一個預留時段加上請求間隔的時段，然後在鎖外等待。
+        """
+        with self._rate_lock:
+            current_time = time.time()
+            slot = max(current_time, self.last_request_time + self.request_interval)
+            reason = "request_interval"
+            
+            # 更新請求計數，檢查是否超過請求限制
+            self.request_count += 1
+            if self.request_count >= self.request_limit:
+                logger.warning(f"已達到請求限制 ({self.request_limit})，等待重置")
+                slot = max(slot, current_time + 60)  # 等待1分鐘後重置
+                reason = "request_limit"
+                self.request_count = 0
+            
+            self.last_request_time = slot
+        
+        if slot > current_time:
+            self._sleep(slot - current_time, reason)
+    
     def _make_request(self, endpoint: str, params: Dict = None, method: str = 'GET', 
-                     account_id: str = None, retry: int = 3) -> Dict:
+                     account_id: str = None) -> Dict:
         """發送API請求
         
+        失敗的請求按 self.retry_policy 重試：永久錯誤（例如令牌無效、參數無效）不重試，
+        瞬時錯誤和速率限制錯誤按去相關抖動退避後重試；端點的熔斷器打開時直接返回錯誤。
+        
         Args:
             endpoint: API端點
             params: 請求參數
             method: 請求方法 (GET, POST等)
             account_id: 使用的賬戶ID（如果需要特定賬戶的訪問令牌）
-            retry: 重試次數
             
         Returns:
             API響應數據
         """
-        # 限制請求頻率
-        current_time = time.time()
-        if current_time - self.last_request_time < self.request_interval:
-            sleep_time = self.request_interval - (current_time - self.last_request_time)
-            time.sleep(sleep_time)
+        policy = self.retry_policy
+        labels = {"endpoint": normalize_endpoint(endpoint), "method": method.upper()}
+        # 熔斷器按規範化的端點劃分（例如所有廣告賬戶的 act_{id}/insights 共用一個），數量有上限
+        circuit_key = labels["endpoint"]
         
-        # 更新請求計數和時間
-        self.request_count += 1
-        self.last_request_time = time.time()
+        if not policy.allow(circuit_key):
+            logger.warning(f"端點 {circuit_key} 的熔斷器已打開，跳過請求")
+            self.metrics.inc("http_circuit_rejected_total", labels=labels)
+            return {"error": {"message": f"端點 {circuit_key} 的熔斷器已打開", "type": "CircuitOpenError"},
+                    "success": False}
         
-        # 檢查是否超過請求限制
-        if self.request_count >= self.request_limit:
-            logger.warning(f"已達到請求限制 ({self.request_limit})，等待重置")
-            time.sleep(60)  # 等待1分鐘後重置
-            self.request_count = 0
+        # 限制請求頻率
+        self._acquire_request_slot()
         
         # 準備請求參數
         if params is None:
@@ -99,7 +340,8 @@ class FacebookDataCollector:
         if 'access_token' not in params:
             params['access_token'] = f"{self.app_id}|{self.app_secret}"
         
-        # 如果提供了賬戶ID，嘗試使用該賬戶的訪問令牌
+        # 如果提供了賬戶ID，嘗試使用該賬戶的訪問令牌和代理
+        account = None
         if account_id and self.account_manager:
             account = self.account_manager.get_account(account_id)
             if account and 'access_token' in account:
@@ -107,74 +349,169 @@ class FacebookDataCollector:
         
         # 準備代理設置
         proxies = None
-        if account_id and self.account_manager:
-            account = self.account_manager.get_account(account_id)
-            if account and account.get("use_proxy") and account.get("proxy_id"):
-                proxy = next((p for p in self.account_manager.proxies if p["id"] == account["proxy_id"]), None)
-                if proxy:
+        if account and account.get("use_proxy") and account.get("proxy_id"):
+            proxy = self.account_manager.get_proxy(account["proxy_id"])
+            if proxy:
+                proxies = {
+                    "http": f"http://{proxy['ip']}:{proxy['port']}",
+                    "https": f"https://{proxy['ip']}:{proxy['port']}"
+                }
+                if proxy.get("username") and proxy.get("password"):
+                    auth = f"{proxy['username']}:{proxy['password']}"
                     proxies = {
-                        "http": f"http://{proxy['ip']}:{proxy['port']}",
-                        "https": f"https://{proxy['ip']}:{proxy['port']}"
+                        "http": f"http://{auth}@{proxy['ip']}:{proxy['port']}",
+                        "https": f"https://{auth}@{proxy['ip']}:{proxy['port']}"
                     }
-                    if proxy.get("username") and proxy.get("password"):
-                        auth = f"{proxy['username']}:{proxy['password']}"
-                        proxies = {
-                            "http": f"http://{auth}@{proxy['ip']}:{proxy['port']}",
-                            "https": f"https://{auth}@{proxy['ip']}:{proxy['port']}"
-                        }
         
         # 發送請求
         url = f"{self.base_url}/{endpoint}"
+        delay = None
+        attempt = 0
         
-        for attempt in range(retry):
+        while True:
+            if attempt:
+                self._acquire_request_slot()
             try:
-                if method.upper() == 'GET':
-                    response = requests.get(url, params=params, proxies=proxies, timeout=30)
-                elif method.upper() == 'POST':
-                    response = requests.post(url, data=params, proxies=proxies, timeout=30)
-                else:
-                    raise ValueError(f"不支持的請求方法: {method}")
+                with span(f"http.{method.lower()}", "http", attempt=attempt, **labels) as http_span, \
+                        self.metrics.timer("http_request_duration_seconds", labels, in_flight="http_requests_in_flight"):
+                    if method.upper() == 'GET':
+                        response = self.session.get(url, params=params, proxies=proxies, timeout=30)
+                    elif method.upper() == 'POST':
+                        response = self.session.post(url, data=params, proxies=proxies, timeout=30)
+                    else:
+                        raise ValueError(f"不支持的請求方法: {method}")
+                    http_span.set(status=response.status_code, bytes=len(response.content))
+                
+                self.metrics.inc("http_requests_total", labels=dict(labels, status=response.status_code))
+                self.metrics.inc("http_response_bytes_total", len(response.content), labels)
                 
                 # 檢查響應
                 if response.status_code == 200:
+                    policy.record_success(circuit_key)
+                    self.progress.page_fetched(labels["endpoint"], len(response.content))
                     return response.json()
-                else:
+                
+                try:
                     error = response.json().get("error", {})
-                    logger.error(f"API請求失敗: {error.get('message', '未知錯誤')}")
-                    
-                    # 如果是速率限制錯誤，等待後重試
-                    if error.get("code") == 4 or "rate limit" in error.get("message", "").lower():
-                        wait_time = min(60 * (attempt + 1), 300)  # 最多等待5分鐘
-                        logger.warning(f"達到速率限制，等待 {wait_time} 秒後重試")
-                        time.sleep(wait_time)
-                        continue
-                    
-                    return {"error": error, "success": False}
+                except ValueError:
+                    error = {"message": response.text[:200]}
+                logger.error(f"API請求失敗: {error.get('message', '未知錯誤')}")
+                kind = classify_error(response.status_code, error)
+                failure = {"error": error, "success": False}
                     
             except Exception as e:
                 logger.exception(f"請求異常: {e}")
-                if attempt < retry - 1:
-                    wait_time = 5 * (attempt + 1)
-                    logger.info(f"等待 {wait_time} 秒後重試")
-                    time.sleep(wait_time)
-                else:
-                    return {"error": str(e), "success": False}
+                self.metrics.inc("http_requests_total", labels=dict(labels, status="exception"))
+                kind = classify_error(None)
+                failure = {"error": str(e), "success": False}
+            
+            # 每次嘗試都記錄結果（半開狀態的試探請求因此總會關閉或重新打開熔斷器）：
+            # 永久錯誤說明請求本身有問題，不計入端點的熔斷器；速率限制針對整個應用，不計入失敗次數
+            policy.record_outcome(circuit_key, kind)
+            if kind == PERMANENT:
+                return failure
+            if not policy.should_retry(circuit_key, attempt, kind):
+                return failure
+            
+            self.metrics.inc("http_retries_total", labels=dict(labels, reason=kind))
+            delay = policy.backoff(delay, kind)
+            if kind == RATE_LIMIT:
+                logger.warning(f"達到速率限制，等待 {delay:.1f} 秒後重試")
+                self.metrics.inc("http_throttled_total", labels=labels)
+                self._sleep(delay, "rate_limit")
+            else:
+                logger.info(f"等待 {delay:.1f} 秒後重試")
+                self._sleep(delay, "error_backoff")
+            attempt += 1
+    
+    def get_objects(self, ids: List[str], fields: str = None, account_id: str = None) -> Dict[str, Dict]:
+        """批量獲取對象（Graph API的 ?ids=a,b,c 形式，每個請求最多 MAX_IDS_PER_REQUEST 個ID）
+        
+        Args:
+            ids: 對象ID列表（重複的ID只請求一次）
+            fields: 要獲取的字段，逗號分隔（可以包含嵌套展開字段）
+            account_id: 使用的賬戶ID（可選）
+            
+        Returns:
+            以ID為鍵的字典，獲取失敗的ID對應 {"error": 錯誤信息, "success": False}
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        objects = {}
+        for start in range(0, len(unique_ids), MAX_IDS_PER_REQUEST):
+            self._get_object_chunk(unique_ids[start:start + MAX_IDS_PER_REQUEST], fields, account_id, objects)
+        
+        failed = sum(1 for obj in objects.values() if obj.get("success") is False)
+        logger.info(f"批量獲取 {len(unique_ids)} 個對象，{failed} 個失敗")
+        return objects
+    
+    def _get_objects_with_fallback(self, ids: List[str], fields: str, plain_fields: str,
+                                   account_id: str = None) -> Dict[str, Dict]:
+        """
+        批量獲取對象，包含嵌套展開字段的請求失敗時（沒有權限、數據量過大等）對失敗的ID不展開重試一次
+        
+        不展開時連接數據由各自的單獨請求獲取（參見 _expanded_edge 的 fallback）。
+        
+        Args:
+            ids: 對象ID列表
+            fields: 要獲取的字段（可以包含嵌套展開字段）
+            plain_fields: 不展開時的字段
+            account_id: 使用的賬戶ID（可選）
+            
+        Returns:
+            以ID為鍵的字典，參見 get_objects
+        """
+        objects = self.get_objects(ids, fields, account_id=account_id)
+        if fields != plain_fields:
+            failed_ids = [object_id for object_id, obj in objects.items() if obj.get("success") is False]
+            if failed_ids:
+                logger.warning(f"嵌套展開請求失敗，不展開重試 {len(failed_ids)} 個對象")
+                objects.update(self.get_objects(failed_ids, plain_fields, account_id=account_id))
+        return objects
+    
+    def _get_object_chunk(self, ids: List[str], fields: str, account_id: str, objects: Dict[str, Dict]) -> None:
+        """
+        用一個請求獲取一組對象，結果寫入objects
         
-        return {"error": "所有重試都失敗了", "success": False}
+        任何一個ID無效時Graph API讓整個請求失敗（錯誤碼100），此時把這組ID對半拆分後重新請求，
+        直到定位出無效的ID；其他錯誤記錄到這組的每個ID。
+        """
+        params = {"ids": ",".join(ids)}
+        if fields:
+            params["fields"] = fields
+        
+        result = self._make_request("", params, account_id=account_id)
+        
+        if result.get("success") is False:
+            error = result.get("error")
+            if isinstance(error, dict) and error.get("code") == 100 and len(ids) > 1:
+                middle = len(ids) // 2
+                self._get_object_chunk(ids[:middle], fields, account_id, objects)
+                self._get_object_chunk(ids[middle:], fields, account_id, objects)
+                return
+            
+            message = error.get("message", "未知錯誤") if isinstance(error, dict) else error
+            logger.warning(f"批量獲取對象失敗 ({', '.join(ids)}): {message}")
+            for object_id in ids:
+                objects[object_id] = {"error": message, "success": False}
+            return
+        
+        for object_id in ids:
+            objects[object_id] = result.get(object_id) or {"error": "響應中沒有該對象", "success": False}
     
-    def search_pages(self, query: str, limit: int = 10, fields: str = None) -> List[Dict]:
+    def search_pages(self, query: str, limit: int = 10, fields: str = None, field_profile: str = None) -> List[Dict]:
         """搜索Facebook頁面
         
         Args:
             query: 搜索關鍵詞
             limit: 返回結果數量限制
-            fields: 要獲取的字段，逗號分隔
+            fields: 要獲取的字段，逗號分隔（優先於field_profile）
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             頁面列表
         """
         if not fields:
-            fields = "id,name,category,link,fan_count,verification_status,about,description,website"
+            fields = self._fields("page_search", field_profile)
         
         params = {
             "q": query,
@@ -193,18 +530,19 @@ class FacebookDataCollector:
             logger.warning(f"搜索頁面失敗: {result.get('error', '未知錯誤')}")
             return []
     
-    def get_page_details(self, page_id: str, fields: str = None) -> Dict:
+    def get_page_details(self, page_id: str, fields: str = None, field_profile: str = None) -> Dict:
         """獲取頁面詳細信息
         
         Args:
             page_id: 頁面ID
-            fields: 要獲取的字段，逗號分隔
+            fields: 要獲取的字段，逗號分隔（優先於field_profile）
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             頁面詳細信息
         """
         if not fields:
-            fields = "id,name,category,link,fan_count,verification_status,about,description,website,location,phone,emails,founded,company_overview,mission,products,hours"
+            fields = self._fields("page_details", field_profile)
         
         params = {"fields": fields}
         
@@ -217,55 +555,80 @@ class FacebookDataCollector:
             logger.warning(f"獲取頁面詳情失敗: {result.get('error', '未知錯誤')}")
             return {}
     
-    def get_page_posts(self, page_id: str, limit: int = 25, since: str = None) -> List[Dict]:
+    def _page_fields(self, include_posts: bool, checkpoint=None, field_profile: str = None) -> str:
+        """
+        返回頁面詳情的fields參數
+        
+        啟用嵌套字段展開時同時請求第一頁帖子；帖子檢查點中已有數據時不展開，由 get_page_posts 從檢查點繼續。
+        """
+        fields = self._fields("page_details", field_profile)
+        resumed = checkpoint is not None and any(checkpoint.load())
+        if include_posts and self.field_expansion and not resumed:
+            fields += "," + self._expand("posts", self._fields("page_posts", field_profile), limit=DEFAULT_POSTS_LIMIT)
+        return fields
+    
+    def get_page_posts(self, page_id: str, limit: int = DEFAULT_POSTS_LIMIT, since: str = None, checkpoint=None,
+                       field_profile: str = None) -> List[Dict]:
         """獲取頁面發布的帖子
         
         Args:
             page_id: 頁面ID
             limit: 返回結果數量限制
             since: 開始日期 (ISO格式: YYYY-MM-DD)
+            checkpoint: 分頁檢查點（JournalStream，可選）。提供時每獲取一頁記錄一次；明確要求恢復的任務
+                分頁中途失敗時拋出APIError，重新運行時從失敗的那一頁繼續，其他任務返回已獲取的帖子
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             帖子列表
         """
-        params = {
-            "limit": limit,
-            "fields": "id,message,created_time,type,permalink_url,shares,reactions.summary(true),comments.summary(true)"
-        }
-        
-        if since:
-            params["since"] = since
-        
-        result = self._make_request(f"{page_id}/posts", params)
+        posts, next_url = checkpoint.load() if checkpoint else ([], None)
         
-        if "data" in result:
-            posts = result["data"]
-            logger.info(f"獲取到 {len(posts)} 個帖子，頁面ID: {page_id}")
+        if posts or next_url:
+            logger.info(f"從檢查點恢復頁面 {page_id} 的帖子: 已獲取 {len(posts)} 個")
+            result = {"paging": {"next": next_url}} if next_url else {}
+        else:
+            params = {
+                "limit": limit,
+                "fields": self._fields("page_posts", field_profile)
+            }
             
-            # 處理分頁
-            while "paging" in result and "next" in result["paging"] and len(posts) < limit:
-                next_url = result["paging"]["next"]
-                next_url = next_url.replace(self.base_url, "").split("?")[0]
-                params = {k: v for k, v in [p.split("=") for p in next_url.split("?")[1].split("&")]}
-                
-                result = self._make_request(next_url, params)
-                if "data" in result:
-                    posts.extend(result["data"])
-                    logger.info(f"獲取到額外 {len(result['data'])} 個帖子")
-                else:
-                    break
+            if since:
+                params["since"] = since
             
-            return posts[:limit]
-        else:
-            logger.warning(f"獲取頁面帖子失敗: {result.get('error', '未知錯誤')}")
-            return []
+            result = self._make_request(f"{page_id}/posts", params)
+            
+            if "data" not in result:
+                logger.warning(f"獲取頁面帖子失敗: {result.get('error', '未知錯誤')}")
+                if checkpoint:
+                    checkpoint.fail(f"獲取頁面 {page_id} 的帖子失敗")
+                return []
+            
+            posts = result["data"]
+            logger.info(f"獲取到 {len(posts)} 個帖子，頁面ID: {page_id}")
+            if checkpoint:
+                checkpoint.save(result["data"], self._next_page_url(result))
+        
+        # 處理分頁
+        posts, _ = self._follow_paging(posts, result, limit, checkpoint, f"頁面 {page_id} 的帖子")
+        return posts
+    
+    def _next_page_url(self, result: Dict) -> Optional[str]:
+        """返回去掉訪問令牌的下一頁URL（用於寫入檢查點）"""
+        next_url = result.get("paging", {}).get("next")
+        if not next_url:
+            return None
+        parts = urlsplit(next_url)
+        query = urlencode([(key, value) for key, value in parse_qsl(parts.query) if key != "access_token"])
+        return parts._replace(query=query).geturl()
     
-    def search_groups(self, query: str, limit: int = 10) -> List[Dict]:
+    def search_groups(self, query: str, limit: int = 10, field_profile: str = None) -> List[Dict]:
         """搜索Facebook群組
         
         Args:
             query: 搜索關鍵詞
             limit: 返回結果數量限制
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             群組列表
@@ -274,7 +637,7 @@ class FacebookDataCollector:
             "q": query,
             "type": "group",
             "limit": limit,
-            "fields": "id,name,description,privacy,member_count,owner"
+            "fields": self._fields("group_search", field_profile)
         }
         
         result = self._make_request("search", params)
@@ -287,18 +650,19 @@ class FacebookDataCollector:
             logger.warning(f"搜索群組失敗: {result.get('error', '未知錯誤')}")
             return []
     
-    def get_group_details(self, group_id: str, account_id: str = None) -> Dict:
+    def get_group_details(self, group_id: str, account_id: str = None, field_profile: str = None) -> Dict:
         """獲取群組詳細信息
         
         Args:
             group_id: 群組ID
             account_id: 使用的賬戶ID（需要是群組成員）
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             群組詳細信息
         """
         params = {
-            "fields": "id,name,description,privacy,member_count,owner,cover,updated_time"
+            "fields": self._fields("group_details", field_profile)
         }
         
         result = self._make_request(group_id, params, account_id=account_id)
@@ -310,20 +674,22 @@ class FacebookDataCollector:
             logger.warning(f"獲取群組詳情失敗: {result.get('error', '未知錯誤')}")
             return {}
     
-    def get_group_posts(self, group_id: str, limit: int = 25, account_id: str = None) -> List[Dict]:
+    def get_group_posts(self, group_id: str, limit: int = 25, account_id: str = None,
+                        field_profile: str = None) -> List[Dict]:
         """獲取群組帖子
         
         Args:
             group_id: 群組ID
             limit: 返回結果數量限制
             account_id: 使用的賬戶ID（需要是群組成員）
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             帖子列表
         """
         params = {
             "limit": limit,
-            "fields": "id,message,created_time,type,permalink_url,from,reactions.summary(true),comments.summary(true)"
+            "fields": self._fields("group_posts", field_profile)
         }
         
         result = self._make_request(f"{group_id}/feed", params, account_id=account_id)
@@ -336,12 +702,13 @@ class FacebookDataCollector:
             logger.warning(f"獲取群組帖子失敗: {result.get('error', '未知錯誤')}")
             return []
     
-    def search_users(self, query: str, limit: int = 10) -> List[Dict]:
+    def search_users(self, query: str, limit: int = 10, field_profile: str = None) -> List[Dict]:
         """搜索Facebook用戶
         
         Args:
             query: 搜索關鍵詞
             limit: 返回結果數量限制
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             用戶列表
@@ -350,7 +717,7 @@ class FacebookDataCollector:
             "q": query,
             "type": "user",
             "limit": limit,
-            "fields": "id,name,link,picture"
+            "fields": self._fields("user_search", field_profile)
         }
         
         result = self._make_request("search", params)
@@ -363,18 +730,19 @@ class FacebookDataCollector:
             logger.warning(f"搜索用戶失敗: {result.get('error', '未知錯誤')}")
             return []
     
-    def get_user_details(self, user_id: str, account_id: str = None) -> Dict:
+    def get_user_details(self, user_id: str, account_id: str = None, field_profile: str = None) -> Dict:
         """獲取用戶詳細信息
         
         Args:
             user_id: 用戶ID
             account_id: 使用的賬戶ID（可能需要是好友關係）
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             用戶詳細信息
         """
         params = {
-            "fields": "id,name,first_name,last_name,link,picture,gender,locale,timezone,verified"
+            "fields": self._fields("user_details", field_profile)
         }
         
         result = self._make_request(user_id, params, account_id=account_id)
@@ -386,11 +754,13 @@ class FacebookDataCollector:
             logger.warning(f"獲取用戶詳情失敗: {result.get('error', '未知錯誤')}")
             return {}
     
-    def get_ad_accounts(self, account_id: str) -> List[Dict]:
+    def get_ad_accounts(self, account_id: str, field_profile: str = None, fields: str = None) -> List[Dict]:
         """獲取廣告賬戶列表
         
         Args:
             account_id: 使用的賬戶ID
+            field_profile: 字段配置 (minimal, standard, full, analysis)
+            fields: 要獲取的字段，逗號分隔（優先於field_profile，可以包含嵌套展開字段）
             
         Returns:
             廣告賬戶列表
@@ -406,7 +776,7 @@ class FacebookDataCollector:
         
         params = {
             "access_token": account['access_token'],
-            "fields": "id,name,account_id,account_status,business_name,currency,timezone_name"
+            "fields": fields or self._fields("ad_accounts", field_profile)
         }
         
         result = self._make_request("me/adaccounts", params, account_id=account_id)
@@ -419,70 +789,109 @@ class FacebookDataCollector:
             logger.warning(f"獲取廣告賬戶失敗: {result.get('error', '未知錯誤')}")
             return []
     
+    def _campaign_fields(self, date_preset: str, field_profile: str = None) -> str:
+        """返回廣告系列的fields參數（嵌套的洞察字段單獨按 campaign_insights 配置）"""
+        insights_field = self._expand("insights", self._fields("campaign_insights", field_profile),
+                                      date_preset=date_preset)
+        return ",".join(
+            insights_field if field == "insights" else field
+            for field in self._fields("ad_campaigns", field_profile).split(",")
+        )
+    
+    def get_campaigns(self, campaign_ids: List[str], account_id: str, date_preset: str = "last_30days",
+                      field_profile: str = None) -> Dict[str, Dict]:
+        """按ID批量獲取廣告系列
+        
+        Args:
+            campaign_ids: 廣告系列ID列表
+            account_id: 使用的賬戶ID
+            date_preset: 日期範圍預設值
+            field_profile: 字段配置 (minimal, standard, full, analysis)
+            
+        Returns:
+            以ID為鍵的字典（每個廣告系列包含所屬廣告賬戶的 account_id），
+            獲取失敗的ID對應 {"error": 錯誤信息, "success": False}
+        """
+        fields = self._campaign_fields(date_preset, field_profile)
+        if "account_id" not in fields.split(","):
+            fields += ",account_id"
+        return self.get_objects(campaign_ids, fields, account_id=account_id)
+    
     def get_ad_campaigns(self, ad_account_id: str, account_id: str, 
-                        date_preset: str = "last_30days") -> List[Dict]:
+                        date_preset: str = "last_30days", field_profile: str = None) -> List[Dict]:
         """獲取廣告系列
         
         Args:
             ad_account_id: 廣告賬戶ID
             account_id: 使用的賬戶ID
             date_preset: 日期範圍預設值
+            field_profile: 字段配置 (minimal, standard, full, analysis)，同時用於嵌套的洞察字段
             
         Returns:
-            廣告系列列表
+            廣告系列列表（沿分頁獲取所有廣告系列）
         """
+        campaigns, _ = self._get_ad_campaigns(ad_account_id, account_id, date_preset, field_profile)
+        return campaigns
+    
+    def _get_ad_campaigns(self, ad_account_id: str, account_id: str, date_preset: str = "last_30days",
+                          field_profile: str = None) -> Tuple[List[Dict], bool]:
+        """獲取廣告系列，同時返回是否獲取了該廣告賬戶的所有廣告系列（參見 get_ad_campaigns）"""
         if not ad_account_id.startswith('act_'):
             ad_account_id = f"act_{ad_account_id}"
         
-        params = {
-            "fields": "id,name,objective,status,created_time,start_time,stop_time,daily_budget,lifetime_budget,insights.date_preset({}){{\
-                impressions,clicks,cpc,cpm,ctr,spend,reach\
-            }}".format(date_preset)
-        }
+        params = {"fields": self._campaign_fields(date_preset, field_profile)}
         
         result = self._make_request(f"{ad_account_id}/campaigns", params, account_id=account_id)
         
         if "data" in result:
-            campaigns = result["data"]
+            campaigns, complete = self._follow_paging(list(result["data"]), result,
+                                                      description=f"廣告賬戶 {ad_account_id} 的廣告系列",
+                                                      account_id=account_id)
             logger.info(f"獲取到 {len(campaigns)} 個廣告系列，廣告賬戶: {ad_account_id}")
-            return campaigns
+            return campaigns, complete
         else:
             logger.warning(f"獲取廣告系列失敗: {result.get('error', '未知錯誤')}")
-            return []
+            return [], False
     
     def get_ad_insights(self, ad_account_id: str, account_id: str, 
-                       date_preset: str = "last_30days", level: str = "account") -> Dict:
+                       date_preset: str = "last_30days", level: str = None,
+                       field_profile: str = None) -> Dict:
         """獲取廣告洞察數據
         
         Args:
             ad_account_id: 廣告賬戶ID
             account_id: 使用的賬戶ID
             date_preset: 日期範圍預設值
-            level: 數據級別 (account, campaign, adset, ad)
+            level: 數據級別 (account, campaign, adset, ad)，默認使用配置文件中的設置
+            field_profile: 字段配置 (minimal, standard, full, analysis)
             
         Returns:
             廣告洞察數據
         """
         if not ad_account_id.startswith('act_'):
             ad_account_id = f"act_{ad_account_id}"
+        level = level or self.ad_insights_level
         
         params = {
             "level": level,
             "date_preset": date_preset,
-            "fields": "account_id,account_name,campaign_id,campaign_name,adset_id,adset_name,ad_id,ad_name,\
-                      impressions,clicks,cpc,cpm,ctr,spend,reach,frequency,actions,conversions,cost_per_action_type"
+            "fields": self._fields("ad_insights", field_profile)
         }
         
         result = self._make_request(f"{ad_account_id}/insights", params, account_id=account_id)
         
         if "data" in result:
-            insights = result["data"]
-            logger.info(f"獲取到廣告洞察數據，廣告賬戶: {ad_account_id}, 級別: {level}")
+            # 廣告系列及以下級別每個對象一行，沿分頁獲取所有行
+            insights, _ = self._follow_paging(list(result["data"]), result,
+                                              description=f"廣告賬戶 {ad_account_id} 的洞察數據",
+                                              account_id=account_id)
+            logger.info(f"獲取到 {len(insights)} 條廣告洞察數據，廣告賬戶: {ad_account_id}, 級別: {level}")
             return {"success": True, "data": insights}
         else:
             logger.warning(f"獲取廣告洞察數據失敗: {result.get('error', '未知錯誤')}")
             return {"success": False, "error": result.get('error', '未知錯誤')}
     
+    @traced("collect.save", "collect")
     def save_collected_data(self, data_type: str, data: Union[Dict, List], 
                           identifier: str = None) -> str:
         """保存收集的數據
@@ -499,23 +908,46 @@ class FacebookDataCollector:
         type_dir = os.path.join(self.data_dir, data_type)
         os.makedirs(type_dir, exist_ok=True)
         
-        # 生成文件名
+        # 生成文件名（同名文件已存在或正在寫入時加上序號後綴）
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         if identifier:
-            filename = f"{data_type}_{identifier}_{timestamp}.json"
+            filename = f"{data_type}_{identifier}_{timestamp}"
         else:
-            filename = f"{data_type}_{timestamp}.json"
+            filename = f"{data_type}_{timestamp}"
         
-        file_path = os.path.join(type_dir, filename)
+        with self._save_lock:
+            file_path = os.path.join(type_dir, f"{filename}.json")
+            suffix = 1
+            while file_path in self._saving_paths or os.path.exists(file_path):
+                suffix += 1
+                file_path = os.path.join(type_dir, f"{filename}_{suffix}.json")
+            self._saving_paths.add(file_path)
         
         # 保存數據
-        save_json(file_path, data)
-        logger.info(f"數據已保存到: {file_path}")
+        try:
+            if self.snapshot_store is not None:
+                stats = self.snapshot_store.write_snapshot(file_path, data)
+                self.metrics.inc("snapshot_objects_total", stats["written"], {"result": "written"})
+                self.metrics.inc("snapshot_objects_total", stats["reused"], {"result": "reused"})
+                self.metrics.inc("snapshot_bytes_written_total", stats["bytes"])
+                logger.info(f"數據已保存到: {file_path}（寫入 {stats['written']} 個新對象，複用 {stats['reused']} 個）")
+            else:
+                save_json(file_path, data)
+                logger.info(f"數據已保存到: {file_path}")
+        finally:
+            with self._save_lock:
+                self._saving_paths.discard(file_path)
+        
+        # 保存截至目前的請求指標快照
+        for metrics_path in write_metrics_files(self.metrics, file_path, self.metrics_format):
+            logger.debug(f"指標快照已保存到: {metrics_path}")
         
         return file_path
     
+    @_instrumented_collection("page")
     def collect_page_data(self, query: str = None, page_id: str = None, 
-                        include_posts: bool = True, save: bool = True) -> Dict:
+                        include_posts: bool = True, save: bool = True, journal: JobJournal = None,
+                        field_profile: str = None) -> Dict:
         """收集頁面數據
         
         Args:
@@ -523,6 +955,8 @@ class FacebookDataCollector:
             page_id: 頁面ID（與query二選一）
             include_posts: 是否包含帖子
             save: 是否保存數據
+            journal: 任務檢查點日誌（可選），跳過已完成的頁面並從中斷的帖子分頁繼續
+            field_profile: 字段配置 (minimal, standard, full, analysis)，默認使用配置文件中的設置
             
         Returns:
             收集的數據
@@ -531,37 +965,79 @@ class FacebookDataCollector:
         
         try:
             if page_id:
-                # 直接獲取頁面詳情
-                page = self.get_page_details(page_id)
+                # 直接獲取頁面詳情（啟用嵌套字段展開時同時獲取第一頁帖子）
+                checkpoint = journal.stream(f"posts:{page_id}") if journal else None
+                fields = self._page_fields(include_posts, checkpoint, field_profile)
+                page = self.get_page_details(page_id, fields=fields)
+                plain_fields = self._fields("page_details", field_profile)
+                if not page and fields != plain_fields:
+                    # 嵌套展開的請求失敗時（沒有權限、數據量過大等）不展開重試一次，帖子單獨請求
+                    logger.warning(f"嵌套展開請求頁面 {page_id} 失敗，不展開重試")
+                    page = self.get_page_details(page_id, fields=plain_fields)
                 if not page:
                     return {"success": False, "error": "無法獲取頁面詳情"}
                 
                 pages = [page]
             elif query:
                 # 搜索頁面
-                pages = self.search_pages(query)
+                pages = journal.get_unit("search") if journal and journal.has_unit("search") else self.search_pages(query, field_profile=field_profile)
                 if not pages:
                     return {"success": False, "error": "未找到匹配的頁面"}
+                if journal and not journal.has_unit("search"):
+                    journal.complete_unit("search", pages)
             else:
                 return {"success": False, "error": "必須提供query或page_id參數"}
             
+            # 批量獲取搜索結果的頁面詳情（啟用嵌套字段展開時同時獲取第一頁帖子）
+            details = {}
+            if page_id is None:
+                pending_ids = [page["id"] for page in pages if not (journal and journal.has_unit(f"page:{page['id']}"))]
+                if pending_ids:
+                    details = self._get_objects_with_fallback(
+                        pending_ids, self._page_fields(include_posts, field_profile=field_profile),
+                        self._fields("page_details", field_profile)
+                    )
+            
             # 收集頁面詳情
             collected_data = []
+            self.progress.set_total(len(pages))
             for page in pages:
-                page_data = self.get_page_details(page["id"]) if page_id is None else page
-                
-                # 收集帖子
-                if include_posts:
-                    posts = self.get_page_posts(page["id"])
-                    page_data["posts"] = posts
+                unit = f"page:{page['id']}"
+                if journal and journal.has_unit(unit):
+                    collected_data.append(journal.get_unit(unit))
+                    self.progress.unit_completed(unit, 1 + len(collected_data[-1].get("posts") or []))
+                    continue
                 
-                collected_data.append(page_data)
+                with span("collect.page_item", "collect", page_id=page["id"]):
+                    checkpoint = journal.stream(f"posts:{page['id']}") if journal else None
+                    if page_id is None:
+                        page_data = details.get(page["id"], {})
+                        if page_data.get("success") is False:
+                            page_data = {}
+                    else:
+                        page_data = page
+                    if journal and not page_data:
+                        journal.partial_failure(f"無法獲取頁面詳情: {page['id']}")
+                    
+                    # 收集帖子（優先使用嵌套展開的結果，分頁時繼續獲取後續分頁）
+                    if include_posts:
+                        page_data["posts"], _ = self._expanded_edge(
+                            page_data, "posts",
+                            lambda: (self.get_page_posts(page["id"], checkpoint=checkpoint, field_profile=field_profile),
+                                     False),
+                            limit=DEFAULT_POSTS_LIMIT, checkpoint=checkpoint, description=f"頁面 {page['id']} 的帖子"
+                        )
+                    
+                    collected_data.append(page_data)
+                    if journal:
+                        journal.complete_unit(unit, page_data)
+                    self.progress.unit_completed(unit, 1 + len(page_data.get("posts") or []))
             
-            # 保存數據
+            # 保存數據（不保存時調用方可以用 data_type 和 identifier 自行保存）
+            result["data_type"] = "page"
+            result["identifier"] = page_id if page_id else query.replace(" ", "_")[:30]
             if save:
-                identifier = page_id if page_id else query.replace(" ", "_")[:30]
-                file_path = self.save_collected_data("page", collected_data, identifier)
-                result["file_path"] = file_path
+                result["file_path"] = self.save_collected_data("page", collected_data, result["identifier"])
             
             result["success"] = True
             result["data"] = collected_data
@@ -572,9 +1048,10 @@ class FacebookDataCollector:
         
         return result
     
+    @_instrumented_collection("group")
     def collect_group_data(self, query: str = None, group_id: str = None, 
                          include_posts: bool = True, account_id: str = None, 
-                         save: bool = True) -> Dict:
+                         save: bool = True, journal: JobJournal = None, field_profile: str = None) -> Dict:
         """收集群組數據
         
         Args:
@@ -583,6 +1060,8 @@ class FacebookDataCollector:
             include_posts: 是否包含帖子
             account_id: 使用的賬戶ID（需要是群組成員）
             save: 是否保存數據
+            journal: 任務檢查點日誌（可選），跳過已完成的群組
+            field_profile: 字段配置 (minimal, standard, full, analysis)，默認使用配置文件中的設置
             
         Returns:
             收集的數據
@@ -592,36 +1071,51 @@ class FacebookDataCollector:
         try:
             if group_id:
                 # 直接獲取群組詳情
-                group = self.get_group_details(group_id, account_id)
+                group = self.get_group_details(group_id, account_id, field_profile=field_profile)
                 if not group:
                     return {"success": False, "error": "無法獲取群組詳情"}
                 
                 groups = [group]
             elif query:
                 # 搜索群組
-                groups = self.search_groups(query)
+                groups = journal.get_unit("search") if journal and journal.has_unit("search") else self.search_groups(query, field_profile=field_profile)
                 if not groups:
                     return {"success": False, "error": "未找到匹配的群組"}
+                if journal and not journal.has_unit("search"):
+                    journal.complete_unit("search", groups)
             else:
                 return {"success": False, "error": "必須提供query或group_id參數"}
             
             # 收集群組詳情
             collected_data = []
+            self.progress.set_total(len(groups))
             for group in groups:
-                group_data = self.get_group_details(group["id"], account_id) if group_id is None else group
+                unit = f"group:{group['id']}"
+                if journal and journal.has_unit(unit):
+                    collected_data.append(journal.get_unit(unit))
+                    self.progress.unit_completed(unit, 1 + len(collected_data[-1].get("posts") or []))
+                    continue
                 
-                # 收集帖子
-                if include_posts:
-                    posts = self.get_group_posts(group["id"], account_id=account_id)
-                    group_data["posts"] = posts
-                
-                collected_data.append(group_data)
+                with span("collect.group_item", "collect", group_id=group["id"]):
+                    group_data = self.get_group_details(group["id"], account_id, field_profile=field_profile) if group_id is None else group
+                    if journal and not group_data:
+                        journal.partial_failure(f"無法獲取群組詳情: {group['id']}")
+                    
+                    # 收集帖子
+                    if include_posts:
+                        posts = self.get_group_posts(group["id"], account_id=account_id, field_profile=field_profile)
+                        group_data["posts"] = posts
+                    
+                    collected_data.append(group_data)
+                    if journal:
+                        journal.complete_unit(unit, group_data)
+                    self.progress.unit_completed(unit, 1 + len(group_data.get("posts") or []))
             
-            # 保存數據
+            # 保存數據（不保存時調用方可以用 data_type 和 identifier 自行保存）
+            result["data_type"] = "group"
+            result["identifier"] = group_id if group_id else query.replace(" ", "_")[:30]
             if save:
-                identifier = group_id if group_id else query.replace(" ", "_")[:30]
-                file_path = self.save_collected_data("group", collected_data, identifier)
-                result["file_path"] = file_path
+                result["file_path"] = self.save_collected_data("group", collected_data, result["identifier"])
             
             result["success"] = True
             result["data"] = collected_data
@@ -632,17 +1126,22 @@ class FacebookDataCollector:
         
         return result
     
-    def collect_ad_data(self, account_id: str, ad_account_id: str = None, 
+    @_instrumented_collection("ad")
+    def collect_ad_data(self, account_id: str, ad_account_id: Union[str, List[str]] = None, 
                       include_campaigns: bool = True, include_insights: bool = True, 
-                      save: bool = True) -> Dict:
+                      save: bool = True, journal: JobJournal = None, field_profile: str = None,
+                      campaign_ids: List[str] = None) -> Dict:
         """收集廣告數據
         
         Args:
             account_id: 使用的賬戶ID
-            ad_account_id: 廣告賬戶ID（如果不提供，將獲取所有廣告賬戶）
+            ad_account_id: 廣告賬戶ID或ID列表（如果不提供，將獲取所有廣告賬戶）
             include_campaigns: 是否包含廣告系列
             include_insights: 是否包含廣告洞察數據
             save: 是否保存數據
+            journal: 任務檢查點日誌（可選），跳過已完成的廣告賬戶
+            field_profile: 字段配置 (minimal, standard, full, analysis)，默認使用配置文件中的設置
+            campaign_ids: 只收集這些廣告系列（可選），按ID批量獲取後歸入所屬的廣告賬戶
             
         Returns:
             收集的數據
@@ -650,40 +1149,126 @@ class FacebookDataCollector:
         result = {"success": False, "data": None, "file_path": None}
         
         try:
+            # 按ID批量獲取指定的廣告系列
+            campaigns_by_account = None
+            if include_campaigns and campaign_ids:
+                campaigns_by_account = {}
+                for campaign_id, campaign in self.get_campaigns(campaign_ids, account_id,
+                                                                field_profile=field_profile).items():
+                    if campaign.get("success") is False:
+                        if journal:
+                            journal.partial_failure(f"無法獲取廣告系列 {campaign_id}: {campaign['error']}")
+                        continue
+                    campaigns_by_account.setdefault(campaign.get("account_id"), []).append(campaign)
+            
+            # 啟用嵌套字段展開時，在獲取廣告賬戶的請求中同時獲取廣告系列和洞察數據
+            fields = None
+            if self.field_expansion and (include_campaigns or include_insights):
+                expansions = [self._fields("ad_accounts", field_profile)]
+                if include_campaigns and campaigns_by_account is None:
+                    expansions.append(self._expand("campaigns", self._campaign_fields("last_30days", field_profile)))
+                if include_insights:
+                    expansions.append(self._expand("insights", self._fields("ad_insights", field_profile),
+                                                   level=self.ad_insights_level, date_preset="last_30days"))
+                fields = ",".join(expansions)
+            
             # 獲取廣告賬戶
             if ad_account_id:
-                ad_accounts = [{
-                    "id": ad_account_id if ad_account_id.startswith('act_') else f"act_{ad_account_id}",
-                    "account_id": ad_account_id.replace('act_', '')
-                }]
+                ad_account_ids = [ad_account_id] if isinstance(ad_account_id, str) else list(ad_account_id)
+                ad_account_ids = [value if value.startswith('act_') else f"act_{value}" for value in ad_account_ids]
+                plain_fields = self._fields("ad_accounts", field_profile)
+                found = self._get_objects_with_fallback(ad_account_ids, fields or plain_fields, plain_fields,
+                                                        account_id=account_id)
+                # 獲取失敗的廣告賬戶仍然單獨請求其廣告系列和洞察數據
+                ad_accounts = [
+                    found[value] if found[value].get("success") is not False
+                    else {"id": value, "account_id": value.replace('act_', '')}
+                    for value in ad_account_ids
+                ]
             else:
-                ad_accounts = self.get_ad_accounts(account_id)
+                if journal and journal.has_unit("ad_accounts"):
+                    ad_accounts = journal.get_unit("ad_accounts")
+                else:
+                    ad_accounts = self.get_ad_accounts(account_id, field_profile=field_profile, fields=fields)
+                    if not ad_accounts and fields:
+                        # 嵌套展開的請求失敗時（沒有權限、數據量過大等）不展開重試一次，廣告系列和洞察數據單獨請求
+                        logger.warning("嵌套展開請求廣告賬戶失敗，不展開重試")
+                        ad_accounts = self.get_ad_accounts(account_id, field_profile=field_profile)
                 if not ad_accounts:
                     return {"success": False, "error": "未找到廣告賬戶"}
+                if journal and not journal.has_unit("ad_accounts"):
+                    # 檢查點不保存嵌套數據（其分頁URL包含訪問令牌），恢復時單獨請求
+                    journal.complete_unit("ad_accounts", [
+                        {key: value for key, value in ad_account.items() if key not in ("campaigns", "insights")}
+                        for ad_account in ad_accounts
+                    ])
             
-            # 收集廣告數據
+            # 收集廣告數據（記錄廣告系列不完整的廣告賬戶，變更捕獲不據此判斷刪除）
             collected_data = []
+            incomplete_accounts = set()
+            self.progress.set_total(len(ad_accounts))
             for ad_account in ad_accounts:
-                account_data = {"account": ad_account}
-                
-                # 收集廣告系列
-                if include_campaigns:
-                    campaigns = self.get_ad_campaigns(ad_account["id"], account_id)
-                    account_data["campaigns"] = campaigns
+                unit = f"ad_account:{ad_account['id']}"
+                if journal and journal.has_unit(unit):
+                    # 檢查點沒有記錄當時是否獲取了所有分頁
+                    incomplete_accounts.add(ad_account["id"])
+                    collected_data.append(journal.get_unit(unit))
+                    self.progress.unit_completed(unit, self._ad_rows(collected_data[-1]))
+                    continue
                 
-                # 收集廣告洞察數據
-                if include_insights:
-                    insights = self.get_ad_insights(ad_account["id"], account_id)
-                    if insights["success"]:
-                        account_data["insights"] = insights["data"]
-                
-                collected_data.append(account_data)
+                with span("collect.ad_account", "collect", ad_account_id=ad_account["id"]):
+                    account_data = {"account": ad_account}
+                    
+                    # 收集廣告系列（優先使用嵌套展開的結果）
+                    if include_campaigns and campaigns_by_account is not None:
+                        account_data["campaigns"] = campaigns_by_account.get(ad_account.get("account_id"), [])
+                    elif include_campaigns:
+                        account_data["campaigns"], complete = self._expanded_edge(
+                            ad_account, "campaigns",
+                            lambda: self._get_ad_campaigns(ad_account["id"], account_id, field_profile=field_profile),
+                            description=f"廣告賬戶 {ad_account['id']} 的廣告系列", account_id=account_id
+                        )
+                        if not complete:
+                            incomplete_accounts.add(ad_account["id"])
+                    
+                    # 收集廣告洞察數據（優先使用嵌套展開的結果）
+                    if include_insights:
+                        insights, _ = self._expanded_edge(
+                            ad_account, "insights", description=f"廣告賬戶 {ad_account['id']} 的洞察數據",
+                            account_id=account_id
+                        )
+                        if insights is not None:
+                            account_data["insights"] = insights
+                        else:
+                            insights = self.get_ad_insights(ad_account["id"], account_id, field_profile=field_profile)
+                            if insights["success"]:
+                                account_data["insights"] = insights["data"]
+                            elif journal:
+                                journal.partial_failure(f"獲取廣告洞察數據失敗: {ad_account['id']}")
+                    
+                    collected_data.append(account_data)
+                    if journal:
+                        journal.complete_unit(unit, account_data)
+                    self.progress.unit_completed(unit, self._ad_rows(account_data))
+            
+            # 記錄與上次已知狀態相比的廣告系列變更（失敗不影響收集結果）
+            if self.campaign_changes is not None and include_campaigns:
+                try:
+                    with span("collect.campaign_cdc", "collect", ad_accounts=len(collected_data)):
+                        # 只比較請求了的字段；按ID獲取部分廣告系列或分頁沒有讀完時不判斷刪除
+                        requested = [field_name(field) for field in self._fields("ad_campaigns", field_profile).split(",")]
+                        result["campaign_changes"] = self.campaign_changes.apply_collected(
+                            collected_data, requested, complete=not campaign_ids,
+                            incomplete_accounts=incomplete_accounts
+                        )
+                except Exception as e:
+                    logger.exception(f"記錄廣告系列變更時出錯: {e}")
             
-            # 保存數據
+            # 保存數據（不保存時調用方可以用 data_type 和 identifier 自行保存）
+            result["data_type"] = "ad_data"
+            result["identifier"] = "_".join(ad_account_ids)[:30] if ad_account_id else f"acc_{account_id}"
             if save:
-                identifier = ad_account_id if ad_account_id else f"acc_{account_id}"
-                file_path = self.save_collected_data("ad_data", collected_data, identifier)
-                result["file_path"] = file_path
+                result["file_path"] = self.save_collected_data("ad_data", collected_data, result["identifier"])
             
             result["success"] = True
             result["data"] = collected_data
@@ -694,41 +1279,131 @@ class FacebookDataCollector:
         
         return result
     
+    def _ad_rows(self, account_data: Dict) -> int:
+        """返回一個廣告賬戶收集到的數據行數（賬戶、廣告系列和洞察數據）"""
+        return 1 + len(account_data.get("campaigns") or []) + len(account_data.get("insights") or [])
+    
+    @traced("collect.task", "collect")
     def run_collection_task(self, task_config: Dict) -> Dict:
         """運行數據收集任務
         
         Args:
-            task_config: 任務配置
+            task_config: 任務配置，可以用 field_profile 指定本任務的字段配置，
+                用 task_id 指定進度事件中的任務ID，save 為 false 時不保存數據（由調用方處理結果數據），
+                resume 為 true 時表示明確從檢查點恢復：部分失敗時任務失敗並保留檢查點，而不是返回部分數據
             
         Returns:
-            任務結果
+            任務結果，部分失敗時 errors 包含錯誤信息
         """
         task_type = task_config.get("type")
         logger.info(f"開始執行 {task_type} 類型的數據收集任務")
         
-        if task_type == "page":
-            return self.collect_page_data(
-                query=task_config.get("query"),
-                page_id=task_config.get("page_id"),
-                include_posts=task_config.get("include_posts", True)
-            )
-        elif task_type == "group":
-            return self.collect_group_data(
-                query=task_config.get("query"),
-                group_id=task_config.get("group_id"),
-                include_posts=task_config.get("include_posts", True),
-                account_id=task_config.get("account_id")
-            )
-        elif task_type == "ad_data":
-            return self.collect_ad_data(
-                account_id=task_config.get("account_id"),
-                ad_account_id=task_config.get("ad_account_id"),
-                include_campaigns=task_config.get("include_campaigns", True),
-                include_insights=task_config.get("include_insights", True)
-            )
-        else:
+        if task_type not in ("page", "group", "ad_data"):
             logger.error(f"不支持的任務類型: {task_type}")
             return {"success": False, "error": f"不支持的任務類型: {task_type}"}
+        
+        field_profile = task_config.get("field_profile")
+        if field_profile and field_profile not in PROFILE_NAMES:
+            logger.error(f"不支持的字段配置: {field_profile}")
+            return {"success": False, "error": f"不支持的字段配置: {field_profile}"}
+        
+        # 相同的任務配置使用同一份檢查點日誌，中斷的任務重新運行時從檢查點繼續（超過有效期的檢查點被丟棄）
+        journal = JobJournal.for_task(self.journal_dir, task_config,
+                                      ttl_hours=self.journal_ttl_hours) if self.journal_dir else None
+        
+        # 任務期間發布的進度事件都帶上任務ID（默認使用檢查點日誌的任務ID）
+        task_id = task_config.get("task_id") or (journal.job_id if journal else task_type)
+        with self.progress.task(str(task_id), task_type) as progress:
+            self.progress.publish(TASK_STARTED)
+            
+            if task_type == "page":
+                result = self.collect_page_data(
+                    query=task_config.get("query"),
+                    page_id=task_config.get("page_id"),
+                    include_posts=task_config.get("include_posts", True),
+                    journal=journal,
+                    save=task_config.get("save", True),
+                    field_profile=field_profile
+                )
+            elif task_type == "group":
+                result = self.collect_group_data(
+                    query=task_config.get("query"),
+                    group_id=task_config.get("group_id"),
+                    include_posts=task_config.get("include_posts", True),
+                    account_id=task_config.get("account_id"),
+                    journal=journal,
+                    save=task_config.get("save", True),
+                    field_profile=field_profile
+                )
+            else:
+                result = self.collect_ad_data(
+                    account_id=task_config.get("account_id"),
+                    ad_account_id=task_config.get("ad_account_id"),
+                    include_campaigns=task_config.get("include_campaigns", True),
+                    include_insights=task_config.get("include_insights", True),
+                    journal=journal,
+                    save=task_config.get("save", True),
+                    field_profile=field_profile,
+                    campaign_ids=task_config.get("campaign_ids")
+                )
+            
+            self.progress.publish(
+                TASK_FINISHED, success=bool(result.get("success")), items=len(result.get("data") or []),
+                file_path=result.get("file_path"), error=result.get("error"), **progress.snapshot()
+            )
+        
+        if journal:
+            if journal.errors:
+                # 部分失敗時保留已獲取的數據，並在結果中報告錯誤
+                result["errors"] = list(journal.errors)
+            if result.get("success"):
+                journal.finish()
+            else:
+                logger.warning(f"任務未完成，檢查點已保存到: {journal.file_path}")
+        
+        return result
+    
+    def load_tasks(self) -> List[Dict]:
+        """從 [Collection] tasks_file 加載任務配置列表
+        
+        Returns:
+            任務配置列表（文件不存在時為空列表）
+        """
+        tasks_file = self.config.get('Collection', 'tasks_file', fallback=os.path.join(self.data_dir, 'tasks.json'))
+        tasks = load_json(tasks_file, default=[])
+        if isinstance(tasks, dict):
+            tasks = tasks.get("tasks", [])
+        return tasks
+    
+    def run(self, tasks: List[Dict] = None, max_workers: int = None) -> Dict:
+        """並發運行多個數據收集任務
+        
+        Args:
+            tasks: 任務配置列表（默認從 [Collection] tasks_file 加載）
+            max_workers: 工作線程數量（默認使用 [Collection] max_workers）
+            
+        Returns:
+            執行摘要和每個任務的狀態
+        """
+        if tasks is None:
+            tasks = self.load_tasks()
+        
+        if not tasks:
+            logger.warning("沒有需要執行的收集任務")
+            return {"success": False, "error": "沒有收集任務"}
+        
+        if max_workers is None:
+            max_workers = self.config.getint('Collection', 'max_workers', fallback=4)
+        
+        scheduler = TaskScheduler(self, max_workers=max_workers)
+        try:
+            summary = scheduler.run(tasks)
+        except ValueError as e:
+            logger.error(f"收集任務配置無效: {e}")
+            return {"success": False, "error": str(e)}
+        logger.info(f"收集任務完成: {summary['completed']} 個成功，{summary['failed']} 個失敗，"
+                    f"{summary['expired']} 個過期，{summary['duplicates']} 個重複提交已合併")
+        return summary
 
 
 if __name__ == "__main__":
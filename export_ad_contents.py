@@ -4,15 +4,18 @@
 """
 Facebook廣告內容導出腳本
 
-這個腳本用於導出Facebook廣告內容數據，支持Excel和CSV格式。
+這個腳本用於導出Facebook廣告內容數據，支持Excel、CSV、Parquet和NDJSON格式。
+導出單個CSV、Parquet或NDJSON格式時會逐條讀取輸入文件並分塊寫入，可以用有限的內存導出大型數據文件。
+同時指定多種格式時，輸入文件只解析一次，各格式並發寫入。
 
 用法:
-    python export_ad_contents.py --input <input_file> --format <format> --output <output_dir>
+    python export_ad_contents.py --input <input_file> --format <format> [<format> ...] --output <output_dir>
 
 參數:
-    --input: 輸入JSON文件路徑
-    --format: 導出格式 (excel, csv)
+    --input: 輸入JSON文件路徑（JSON數組、{"data": [...]} 或 NDJSON）
+    --format: 導出格式 (excel, csv, parquet, ndjson)，可以指定多個
     --output: 輸出目錄
+    --chunk-size: 流式導出時每個數據塊的記錄數
 """
 
 import os
@@ -20,12 +23,13 @@ import sys
 import json
 import logging
 import argparse
+import itertools
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
 # 導入導出工具
-from export_utils import export_data
-from utils import setup_logging
+from export_utils import export_data, EXPORT_FORMATS, DEFAULT_CHUNK_SIZE
+from utils import setup_logging, iter_json_records
 
 # 設置日誌記錄器
 logger = logging.getLogger(__name__)
@@ -40,8 +44,10 @@ def parse_arguments():
     """
     parser = argparse.ArgumentParser(description="Facebook廣告內容導出工具")
     parser.add_argument("--input", "-i", required=True, help="輸入JSON文件路徑")
-    parser.add_argument("--format", "-f", default="excel", choices=["excel", "csv"], help="導出格式 (excel, csv)")
+    parser.add_argument("--format", "-f", nargs="+", default=["excel"], choices=list(EXPORT_FORMATS),
+                        help="導出格式 (excel, csv, parquet, ndjson)，可以指定多個")
     parser.add_argument("--output", "-o", default="./output", help="輸出目錄")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="流式導出時每個數據塊的記錄數")
     parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], help="日誌級別")
     
     return parser.parse_args()
@@ -58,17 +64,7 @@ def load_json_data(file_path: str) -> List[Dict[str, Any]]:
         JSON數據列表
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # 確保數據是列表格式
-        if isinstance(data, dict) and "data" in data:
-            return data["data"]
-        elif isinstance(data, list):
-            return data
-        else:
-            logger.warning(f"未知的數據格式: {type(data)}")
-            return []
+        return list(iter_json_records(file_path))
     
     except Exception as e:
         logger.exception(f"加載JSON數據時出錯: {e}")
@@ -86,41 +82,62 @@ def main():
     setup_logging(args.log_level)
     
     # 顯示開始信息
-    logger.info(f"開始導出Facebook廣告內容 (格式: {args.format})")
+    formats = list(dict.fromkeys(args.format))
+    logger.info(f"開始導出Facebook廣告內容 (格式: {', '.join(formats)})")
     
     # 檢查輸入文件
     if not os.path.exists(args.input):
         logger.error(f"輸入文件不存在: {args.input}")
         sys.exit(1)
     
-    # 加載數據
-    logger.info(f"正在加載數據: {args.input}")
-    data = load_json_data(args.input)
+    # 逐條讀取數據，先取出第一條記錄以確認文件中有數據
+    logger.info(f"正在讀取數據: {args.input}")
+    records = iter_json_records(args.input)
+    try:
+        first_record = next(records, None)
+    except Exception as e:
+        logger.exception(f"加載JSON數據時出錯: {e}")
+        first_record = None
     
-    if not data:
+    if first_record is None:
         logger.error("沒有找到有效數據")
         sys.exit(1)
     
-    logger.info(f"已加載 {len(data)} 條廣告內容記錄")
+    data = itertools.chain([first_record], records)
     
     # 導出數據
-    logger.info(f"正在導出數據到 {args.format} 格式")
-    result = export_data(data, args.format, args.output)
+    logger.info(f"正在導出數據到 {', '.join(formats)} 格式")
+    result = export_data(data, formats, args.output, chunk_size=args.chunk_size)
     
     # 顯示結果
     if result["success"]:
-        logger.info(f"導出成功: {result['file_path']}")
-        logger.info(f"導出了 {result['row_count']} 條記錄, {result['column_count']} 個欄位")
+        format_results = result["formats"] if len(formats) > 1 else {formats[0]: result}
+        for format_name, format_result in format_results.items():
+            logger.info(f"導出成功: {format_result['file_path']} ({format_result['bytes']} 字節, {format_result['seconds']:.2f} 秒)")
+            logger.info(f"導出了 {format_result['row_count']} 條記錄, {format_result['column_count']} 個欄位")
         
-        # 輸出結果JSON
+        # 輸出結果JSON，單一格式時保留頂層的文件信息
         output_json = {
             "success": True,
-            "file_path": result["file_path"],
-            "format": args.format,
-            "row_count": result["row_count"],
-            "column_count": result["column_count"],
+            "formats": {
+                format_name: {
+                    "file_path": format_result["file_path"],
+                    "row_count": format_result["row_count"],
+                    "column_count": format_result["column_count"],
+                    "bytes": format_result["bytes"],
+                    "seconds": format_result["seconds"]
+                }
+                for format_name, format_result in format_results.items()
+            },
             "timestamp": datetime.now().isoformat()
         }
+        if len(formats) == 1:
+            output_json.update({
+                "file_path": result["file_path"],
+                "format": formats[0],
+                "row_count": result["row_count"],
+                "column_count": result["column_count"]
+            })
         print(json.dumps(output_json))
         return 0
     else:
@@ -6,27 +6,243 @@
 
 這個模塊提供數據導出功能，包括：
 - Excel文件生成
-- CSV文件生成
+- CSV文件生成（分塊流式寫入）
+- Parquet文件生成（分塊流式寫入）
+- NDJSON文件生成（分塊流式寫入）
+- 多種格式並發導出
 - 數據格式化
 """
 
 import os
+import csv
 import json
 import logging
+import time
+import functools
+import itertools
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Callable, Tuple, Union
 from datetime import datetime
 
 # 設置日誌記錄器
 logger = logging.getLogger(__name__)
 
+# 流式導出時每個數據塊的記錄數
+DEFAULT_CHUNK_SIZE = 10000
 
-def export_to_excel(data: List[Dict[str, Any]], output_path: str, sheet_name: str = "廣告內容") -> Dict[str, Any]:
+
+def _iter_chunks(data: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    將記錄迭代器切分為固定大小的數據塊
+    
+    Args:
+        data: 記錄迭代器
+        chunk_size: 每個數據塊的記錄數
+        
+    Returns:
+        數據塊迭代器
+    """
+    iterator = iter(data)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _ensure_output_dir(output_path: str) -> None:
+    """
+    確保輸出文件所在目錄存在
+    
+    Args:
+        output_path: 輸出文件路徑
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+
+
+# 嵌套字段展開規則: (源字段, 子字段, 是否將列表以逗號連接, 源字段不是字典時的默認值, 列類型, Excel列名, CSV列名)
+# 列類型固定每個展開列的類型（string 或 float），分塊導出時每個數據塊得到相同的列類型
+NESTED_FIELD_SPEC = [
+    ("audienceAnalysis", "ageRange", False, "", "string", "受眾年齡範圍", "audience_age_range"),
+    ("audienceAnalysis", "genders", True, "", "string", "受眾性別", "audience_genders"),
+    ("audienceAnalysis", "locations", True, "", "string", "受眾地區", "audience_locations"),
+    ("audienceAnalysis", "interests", True, "", "string", "受眾興趣", "audience_interests"),
+    ("audienceAnalysis", "behaviors", True, "", "string", "受眾行為", "audience_behaviors"),
+    ("potentialCustomers", "estimatedReach", False, 0, "float", "估計觸及人數", "estimated_reach"),
+    ("potentialCustomers", "engagementRate", False, 0, "float", "參與率", "engagement_rate"),
+    ("potentialCustomers", "costPerLead", False, 0, "float", "每個潛在客戶成本", "cost_per_lead"),
+    ("potentialCustomers", "qualityScore", False, 0, "float", "質量評分", "quality_score"),
+]
+
+# 按出現順序排列的源字段
+NESTED_SOURCE_FIELDS = tuple(dict.fromkeys(rule[0] for rule in NESTED_FIELD_SPEC))
+
+# 已展開數據（CSV列名）導出到Excel時使用的列名
+EXCEL_NESTED_LABELS = {rule[6]: rule[5] for rule in NESTED_FIELD_SPEC}
+
+# 展開列（兩種列名風格）的類型
+NESTED_COLUMN_TYPES = {label: rule[4] for rule in NESTED_FIELD_SPEC for label in (rule[5], rule[6])}
+
+
+@functools.lru_cache(maxsize=None)
+def _nested_extractor(sources: Tuple[str, ...], style: str) -> Tuple[Callable[..., List[list]], List[str]]:
+    """
+    按嵌套字段展開規則創建提取函數
+    
+    提取函數接收各源字段的值列表，每個源字段只做一次類型檢查，
+    每個展開列由一個列表推導式生成（每列遍歷一次記錄），不為每條記錄創建中間對象。
+    逐條記錄一次填充所有列需要在每條記錄上循環展開規則，實測比逐列生成慢數倍。
+    展開規則按源字段組合和列名風格整理一次並緩存。
+    
+    Args:
+        sources: 數據中存在的源字段
+        style: 列名風格 (excel, csv)
+        
+    Returns:
+        (提取函數, 展開後的列名列表)
+    """
+    label_index = 5 if style == "excel" else 6
+    source_rules = [[rule for rule in NESTED_FIELD_SPEC if rule[0] == source] for source in sources]
+    labels = [rule[label_index] for rules in source_rules for rule in rules]
+    
+    def extract(*source_values: list) -> List[list]:
+        columns = []
+        for values, rules in zip(source_values, source_rules):
+            # 不是字典的值（缺失或格式錯誤）記為None，展開時使用規則的默認值
+            dicts = [value if isinstance(value, dict) else None for value in values]
+            for _, key, join, default, *_ in rules:
+                if join:
+                    columns.append([default if d is None else ", ".join(d.get(key, [])) for d in dicts])
+                else:
+                    columns.append([default if d is None else d.get(key) for d in dicts])
+        return columns
+    
+    return extract, labels
+
+
+def _flatten_nested_fields(df: pd.DataFrame, style: str = "csv") -> pd.DataFrame:
+    """
+    按 NESTED_FIELD_SPEC 展開嵌套字段
+    
+    Args:
+        df: 原始數據
+        style: 列名風格 (excel, csv)
+        
+    Returns:
+        展開後的數據，源字段會被移除，展開的列追加在末尾
+    """
+    sources = tuple(source for source in NESTED_SOURCE_FIELDS if source in df.columns)
+    if not sources:
+        return df
+    
+    extractor, labels = _nested_extractor(sources, style)
+    columns = extractor(*(df[source].tolist() for source in sources))
+    
+    # 使用object類型直接構建，避免逐列推斷類型帶來的額外遍歷；數值列轉換為浮點數
+    flattened = pd.DataFrame(dict(zip(labels, columns)), index=df.index, dtype=object)
+    for label in labels:
+        if NESTED_COLUMN_TYPES[label] == "float":
+            flattened[label] = _numeric_column(flattened[label])
+    return pd.concat([df.drop(columns=list(sources)), flattened], axis=1)
+
+
+def _numeric_column(values: pd.Series) -> pd.Series:
+    """
+    將展開的數值列轉換為浮點數（API返回的數值可能是數字或 toFixed 生成的字符串）
+    
+    無法解析的值（例如 "n/a"）保留原值並記錄警告，不靜默記為空；這時該列為object類型，
+    只有導出Parquet時才按列類型記為空（參見 _arrow_array）。
+    
+    Args:
+        values: 展開的數值列
+        
+    Returns:
+        轉換後的列
+    """
+    try:
+        # 快速路徑：所有值都是數字、數字字符串或空值時由NumPy直接轉換（比 pd.to_numeric 快數倍）
+        return pd.Series(values.to_numpy().astype("float64"), index=values.index, name=values.name)
+    except (ValueError, TypeError):
+        pass
+    
+    numeric = pd.to_numeric(values, errors="coerce")
+    invalid = numeric.isna() & values.notna()
+    if not invalid.any():
+        return numeric.astype("float64")
+    
+    samples = values[invalid].astype(str).unique()[:5].tolist()
+    logger.warning(f"嵌套字段 {values.name} 中有 {int(invalid.sum())} 個值不是數字，保留原值: {samples}")
+    return numeric.astype(object).where(~invalid, values)
+
+
+def normalize_records(data: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    將記錄轉換為展開嵌套字段後的DataFrame（CSV列名）
+    
+    結果可以直接傳給各導出函數，同一份數據導出多種格式時只需解析和展開一次。
+    
+    Args:
+        data: 記錄列表或迭代器
+        
+    Returns:
+        展開後的DataFrame
+    """
+    return _flatten_nested_fields(pd.DataFrame(list(data)), "csv")
+
+
+def _iter_flattened_chunks(data: Union[Iterable[Dict[str, Any]], pd.DataFrame], chunk_size: int,
+                           align: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    分塊展開記錄
+    
+    align 為True時（CSV和Parquet需要固定的表頭），所有數據塊對齊到第一個數據塊的列加上
+    NESTED_FIELD_SPEC 的全部展開列，缺失的列以空值填充；後續數據塊中出現其他新欄位時追加在末尾，
+    之後的數據塊都包含這些欄位，由導出函數為之前寫入的行補齊空值（參見 _widen_csv 和 _widen_parquet）。
+    align 為False時（NDJSON）每個數據塊保留自己的列。
+    傳入 normalize_records 的結果時直接按塊切分，不再重複展開。
+    
+    Args:
+        data: 記錄迭代器或已展開的DataFrame
+        chunk_size: 每個數據塊的記錄數
+        align: 是否對齊所有數據塊的列
+        
+    Returns:
+        DataFrame迭代器
+    """
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunk_size):
+            yield data.iloc[start:start + chunk_size]
+        return
+    
+    columns = None
+    for index, chunk in enumerate(_iter_chunks(data, chunk_size), 1):
+        df = _flatten_nested_fields(pd.DataFrame(chunk), "csv")
+        if not align:
+            yield df
+            continue
+        
+        if columns is None:
+            # 第一個數據塊作為欄位樣本；嵌套字段的展開列是已知的，即使第一個數據塊中沒有也預先包含
+            columns = list(df.columns) + [rule[6] for rule in NESTED_FIELD_SPEC if rule[6] not in df.columns]
+        else:
+            extra = [column for column in df.columns if column not in columns]
+            if extra:
+                logger.info(f"第 {index} 個數據塊中出現新欄位: {extra}，擴展表頭")
+                columns = columns + extra
+        yield df.reindex(columns=columns)
+
+
+def export_to_excel(data: Union[Iterable[Dict[str, Any]], pd.DataFrame], output_path: str, sheet_name: str = "廣告內容") -> Dict[str, Any]:
     """
     將數據導出為Excel文件
     
+    Excel需要計算列寬，因此會將全部記錄加載到內存。
+    
     Args:
-        data: 要導出的數據列表
+        data: 要導出的數據列表、迭代器或 normalize_records 的結果
         output_path: 輸出文件路徑
         sheet_name: Excel工作表名稱
         
@@ -34,13 +250,10 @@ def export_to_excel(data: List[Dict[str, Any]], output_path: str, sheet_name: st
         包含導出結果的字典
     """
     try:
-        # 確保輸出目錄存在
-        output_dir = os.path.dirname(output_path)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
+        from openpyxl.utils import get_column_letter
         
-        # 將數據轉換為DataFrame
-        df = pd.DataFrame(data)
+        # 確保輸出目錄存在
+        _ensure_output_dir(output_path)
         
         # 重命名列以便於閱讀
         column_mapping = {
@@ -67,20 +280,10 @@ def export_to_excel(data: List[Dict[str, Any]], output_path: str, sheet_name: st
         }
         
         # 處理嵌套字段
-        if "audienceAnalysis" in df.columns:
-            df["受眾年齡範圍"] = df["audienceAnalysis"].apply(lambda x: x.get("ageRange") if isinstance(x, dict) else "")
-            df["受眾性別"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("genders", [])) if isinstance(x, dict) else "")
-            df["受眾地區"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("locations", [])) if isinstance(x, dict) else "")
-            df["受眾興趣"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("interests", [])) if isinstance(x, dict) else "")
-            df["受眾行為"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("behaviors", [])) if isinstance(x, dict) else "")
-            df = df.drop(columns=["audienceAnalysis"])
-        
-        if "potentialCustomers" in df.columns:
-            df["估計觸及人數"] = df["potentialCustomers"].apply(lambda x: x.get("estimatedReach") if isinstance(x, dict) else 0)
-            df["參與率"] = df["potentialCustomers"].apply(lambda x: x.get("engagementRate") if isinstance(x, dict) else "0")
-            df["每個潛在客戶成本"] = df["potentialCustomers"].apply(lambda x: x.get("costPerLead") if isinstance(x, dict) else "0")
-            df["質量評分"] = df["potentialCustomers"].apply(lambda x: x.get("qualityScore") if isinstance(x, dict) else "0")
-            df = df.drop(columns=["potentialCustomers"])
+        if isinstance(data, pd.DataFrame):
+            df = data.rename(columns=EXCEL_NESTED_LABELS)
+        else:
+            df = _flatten_nested_fields(pd.DataFrame(list(data)), "excel")
         
         # 重命名列
         df = df.rename(columns=column_mapping)
@@ -94,12 +297,12 @@ def export_to_excel(data: List[Dict[str, Any]], output_path: str, sheet_name: st
             worksheet = writer.sheets[sheet_name]
             
             # 調整列寬
-            for idx, col in enumerate(df.columns):
+            for idx, col in enumerate(df.columns, 1):
                 max_len = max(
-                    df[col].astype(str).map(len).max(),
+                    df[col].map(lambda value: len(str(value))).max() if len(df) else 0,
                     len(col)
                 ) + 2  # 添加一些額外空間
-                worksheet.column_dimensions[chr(65 + idx)].width = min(max_len, 50)  # 限制最大寬度
+                worksheet.column_dimensions[get_column_letter(idx)].width = min(max_len, 50)  # 限制最大寬度
         
         return {
             "success": True,
@@ -116,50 +319,43 @@ def export_to_excel(data: List[Dict[str, Any]], output_path: str, sheet_name: st
         }
 
 
-def export_to_csv(data: List[Dict[str, Any]], output_path: str) -> Dict[str, Any]:
+def export_to_csv(data: Union[Iterable[Dict[str, Any]], pd.DataFrame], output_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
     """
-    將數據導出為CSV文件
+    將數據分塊導出為CSV文件
     
     Args:
-        data: 要導出的數據列表
+        data: 要導出的數據列表、迭代器或 normalize_records 的結果
         output_path: 輸出文件路徑
+        chunk_size: 每個數據塊的記錄數
         
     Returns:
         包含導出結果的字典
     """
     try:
         # 確保輸出目錄存在
-        output_dir = os.path.dirname(output_path)
-        if output_dir and not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
+        _ensure_output_dir(output_path)
         
-        # 將數據轉換為DataFrame
-        df = pd.DataFrame(data)
+        row_count = 0
+        column_count = 0
+        widened = False
         
-        # 處理嵌套字段
-        if "audienceAnalysis" in df.columns:
-            df["audience_age_range"] = df["audienceAnalysis"].apply(lambda x: x.get("ageRange") if isinstance(x, dict) else "")
-            df["audience_genders"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("genders", [])) if isinstance(x, dict) else "")
-            df["audience_locations"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("locations", [])) if isinstance(x, dict) else "")
-            df["audience_interests"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("interests", [])) if isinstance(x, dict) else "")
-            df["audience_behaviors"] = df["audienceAnalysis"].apply(lambda x: ", ".join(x.get("behaviors", [])) if isinstance(x, dict) else "")
-            df = df.drop(columns=["audienceAnalysis"])
-        
-        if "potentialCustomers" in df.columns:
-            df["estimated_reach"] = df["potentialCustomers"].apply(lambda x: x.get("estimatedReach") if isinstance(x, dict) else 0)
-            df["engagement_rate"] = df["potentialCustomers"].apply(lambda x: x.get("engagementRate") if isinstance(x, dict) else "0")
-            df["cost_per_lead"] = df["potentialCustomers"].apply(lambda x: x.get("costPerLead") if isinstance(x, dict) else "0")
-            df["quality_score"] = df["potentialCustomers"].apply(lambda x: x.get("qualityScore") if isinstance(x, dict) else "0")
-            df = df.drop(columns=["potentialCustomers"])
-        
-        # 寫入CSV文件
-        df.to_csv(output_path, index=False, encoding="utf-8-sig")  # 使用帶BOM的UTF-8以支持Excel正確顯示中文
+        # 使用帶BOM的UTF-8以支持Excel正確顯示中文，BOM只在文件開頭寫入一次
+        with open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+            for i, df in enumerate(_iter_flattened_chunks(data, chunk_size)):
+                df.to_csv(f, index=False, header=(i == 0))
+                row_count += len(df)
+                widened = widened or (i > 0 and len(df.columns) > column_count)
+                column_count = len(df.columns)
+        
+        # 後續數據塊中出現了新欄位時重寫表頭並補齊之前寫入的行
+        if widened:
+            _widen_csv(output_path, list(df.columns))
         
         return {
             "success": True,
             "file_path": output_path,
-            "row_count": len(df),
-            "column_count": len(df.columns)
+            "row_count": row_count,
+            "column_count": column_count
         }
     
     except Exception as e:
@@ -170,45 +366,377 @@ def export_to_csv(data: List[Dict[str, Any]], output_path: str) -> Dict[str, Any
         }
 
 
-def export_data(data: List[Dict[str, Any]], format: str, output_dir: str, filename_prefix: str = "facebook_ad_contents") -> Dict[str, Any]:
+def _widen_csv(output_path: str, columns: List[str]) -> None:
+    """
+    將CSV文件的表頭替換為擴展後的欄位，較早寫入的行在末尾以空值補齊
+    
+    新欄位總是追加在末尾（參見 _iter_flattened_chunks），所以只需補齊每行末尾的空欄位。
+    按CSV格式逐行讀寫，字段中的換行不會被拆開。
+    
+    Args:
+        output_path: CSV文件路徑
+        columns: 擴展後的全部欄位
+    """
+    temp_path = output_path + ".widen"
+    with open(output_path, encoding="utf-8-sig", newline="") as source, \
+            open(temp_path, "w", encoding="utf-8-sig", newline="") as target:
+        reader = csv.reader(source)
+        writer = csv.writer(target, lineterminator=os.linesep)
+        next(reader, None)
+        writer.writerow(columns)
+        for row in reader:
+            writer.writerow(row + [""] * (len(columns) - len(row)))
+    os.replace(temp_path, output_path)
+
+
+def _arrow_array(pa, values: pd.Series, arrow_type=None, coerce: bool = False):
+    """
+    將一列數據轉換為Arrow數組
+    
+    目標類型為字符串（或未指定且無法推斷類型）時，非空值統一轉換為字符串，
+    因此同一列中混合的數字和字符串不會導致失敗；數值列中的數字字符串會被解析。
+    
+    Args:
+        pa: pyarrow模塊
+        values: 列數據
+        arrow_type: 目標類型，None表示自動推斷
+        coerce: 數值列中無法解析的值是否記為空（記錄警告），而不是拋出錯誤
+        
+    Returns:
+        Arrow數組
+        
+    Raises:
+        ValueError: 數值列中的值無法轉換為目標類型
+    """
+    try:
+        return pa.array(values, type=arrow_type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    
+    if arrow_type is None or pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        values = values.astype(object)
+        text = values.where(values.isna(), values.astype(str))
+        return pa.array(text, type=arrow_type or pa.string(), from_pandas=True)
+    
+    if coerce:
+        numeric = pd.to_numeric(values, errors="coerce")
+        invalid = int((numeric.isna() & values.notna()).sum())
+        if invalid:
+            logger.warning(f"欄位 {values.name} 中有 {invalid} 個值無法轉換為 {arrow_type}，在Parquet中記為空")
+        return pa.array(numeric, type=arrow_type, from_pandas=True)
+    
+    try:
+        return pa.array(pd.to_numeric(values, errors="raise"), type=arrow_type, from_pandas=True)
+    except (ValueError, TypeError, pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"欄位 {values.name} 的值無法轉換為第一個數據塊中的類型 {arrow_type}: {e}")
+
+
+def _parquet_schema(pa, df: pd.DataFrame):
+    """
+    確定Parquet文件的結構
+    
+    嵌套字段展開列使用 NESTED_FIELD_SPEC 中的固定類型；其他列按第一個數據塊推斷，
+    全為空的列按字符串處理（後續數據塊中的值會轉換為字符串）。
+    
+    Args:
+        pa: pyarrow模塊
+        df: 第一個數據塊
+        
+    Returns:
+        Arrow結構
+    """
+    fields = []
+    for column in df.columns:
+        column_type = NESTED_COLUMN_TYPES.get(column)
+        if column_type == "float":
+            arrow_type = pa.float64()
+        elif column_type == "string":
+            arrow_type = pa.string()
+        else:
+            arrow_type = _arrow_array(pa, df[column]).type
+            if pa.types.is_null(arrow_type):
+                arrow_type = pa.string()
+        fields.append(pa.field(str(column), arrow_type))
+    return pa.schema(fields)
+
+
+def _widen_parquet(pa, pq, output_path: str, schema, new_fields: list):
+    """
+    擴展已寫入的Parquet文件的結構，已寫入的行組中新欄位以空值補齊
+    
+    調用前需要關閉原來的寫入器。逐個行組複製，不會把整個文件加載到內存。
+    
+    Args:
+        pa: pyarrow模塊
+        pq: pyarrow.parquet模塊
+        output_path: Parquet文件路徑
+        schema: 原來的結構
+        new_fields: 追加的欄位
+        
+    Returns:
+        (擴展後的結構, 寫入擴展後文件的寫入器)
+    """
+    widened = pa.schema(list(schema) + list(new_fields))
+    previous_path = output_path + ".widen"
+    os.replace(output_path, previous_path)
+    
+    writer = pq.ParquetWriter(output_path, widened)
+    try:
+        with pq.ParquetFile(previous_path) as previous:
+            for index in range(previous.num_row_groups):
+                table = previous.read_row_group(index)
+                for field in new_fields:
+                    table = table.append_column(field, pa.nulls(len(table), field.type))
+                writer.write_table(table)
+    except Exception:
+        writer.close()
+        raise
+    finally:
+        os.remove(previous_path)
+    
+    return widened, writer
+
+
+def export_to_parquet(data: Union[Iterable[Dict[str, Any]], pd.DataFrame], output_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    將數據分塊導出為Parquet文件（需要安裝pyarrow）
+    
+    Args:
+        data: 要導出的數據列表、迭代器或 normalize_records 的結果
+        output_path: 輸出文件路徑
+        chunk_size: 每個數據塊的記錄數，同時作為Parquet的行組大小
+        
+    Returns:
+        包含導出結果的字典
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logger.error("導出Parquet文件需要安裝pyarrow")
+        return {
+            "success": False,
+            "error": "導出Parquet文件需要安裝pyarrow"
+        }
+    
+    writer = None
+    try:
+        # 確保輸出目錄存在
+        _ensure_output_dir(output_path)
+        
+        row_count = 0
+        column_count = 0
+        schema = None
+        
+        for df in _iter_flattened_chunks(data, chunk_size):
+            if schema is None:
+                schema = _parquet_schema(pa, df)
+                writer = pq.ParquetWriter(output_path, schema)
+            elif len(df.columns) > len(schema):
+                # 後續數據塊中出現了新欄位：擴展結構並為之前寫入的行補齊空值
+                writer.close()
+                writer = None
+                new_fields = list(_parquet_schema(pa, df[list(df.columns[len(schema):])]))
+                schema, writer = _widen_parquet(pa, pq, output_path, schema, new_fields)
+            
+            # 嵌套字段的數值列按固定類型寫入，無法解析的值記為空
+            table = pa.Table.from_arrays([
+                _arrow_array(pa, df[field.name], field.type, coerce=field.name in NESTED_COLUMN_TYPES)
+                for field in schema
+            ], schema=schema)
+            writer.write_table(table)
+            row_count += len(df)
+            column_count = len(df.columns)
+        
+        if writer is None:
+            pq.write_table(pa.table({}), output_path)
+        
+        return {
+            "success": True,
+            "file_path": output_path,
+            "row_count": row_count,
+            "column_count": column_count
+        }
+    
+    except Exception as e:
+        logger.exception(f"導出Parquet文件時出錯: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_to_ndjson(data: Union[Iterable[Dict[str, Any]], pd.DataFrame], output_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    將數據分塊導出為NDJSON文件（每行一條記錄）
+    
+    Args:
+        data: 要導出的數據列表、迭代器或 normalize_records 的結果
+        output_path: 輸出文件路徑
+        chunk_size: 每個數據塊的記錄數
+        
+    Returns:
+        包含導出結果的字典
+    """
+    try:
+        # 確保輸出目錄存在
+        _ensure_output_dir(output_path)
+        
+        row_count = 0
+        column_count = 0
+        
+        with open(output_path, "w", encoding="utf-8") as f:
+            for df in _iter_flattened_chunks(data, chunk_size, align=False):
+                lines = df.to_json(orient="records", lines=True, force_ascii=False)
+                f.write(lines if lines.endswith("\n") else lines + "\n")
+                row_count += len(df)
+                column_count = len(df.columns)
+        
+        return {
+            "success": True,
+            "file_path": output_path,
+            "row_count": row_count,
+            "column_count": column_count
+        }
+    
+    except Exception as e:
+        logger.exception(f"導出NDJSON文件時出錯: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+# 導出格式 -> (文件擴展名, 是否支持分塊流式導出, 導出函數)
+EXPORT_FORMATS = {
+    "excel": ("xlsx", False, export_to_excel),
+    "csv": ("csv", True, export_to_csv),
+    "parquet": ("parquet", True, export_to_parquet),
+    "ndjson": ("ndjson", True, export_to_ndjson)
+}
+
+
+def _export_format(data: Union[Iterable[Dict[str, Any]], pd.DataFrame], format: str, output_path: str,
+                   chunk_size: int) -> Dict[str, Any]:
+    """
+    導出單個格式，並記錄耗時和文件大小
+    
+    Args:
+        data: 要導出的數據
+        format: 導出格式
+        output_path: 輸出文件路徑
+        chunk_size: 流式導出時每個數據塊的記錄數
+        
+    Returns:
+        包含導出結果的字典
+    """
+    _, streaming, export_func = EXPORT_FORMATS[format]
+    
+    start_time = time.perf_counter()
+    if streaming:
+        result = export_func(data, output_path, chunk_size=chunk_size)
+    else:
+        result = export_func(data, output_path)
+    result["seconds"] = round(time.perf_counter() - start_time, 4)
+    
+    if result["success"]:
+        result["format"] = format
+        result["filename"] = os.path.basename(output_path)
+        result["bytes"] = os.path.getsize(output_path)
+    
+    return result
+
+
+def _parse_formats(format: Union[str, List[str]]) -> List[str]:
+    """
+    解析導出格式參數，支持列表或逗號分隔的字符串，並去除重複項
+    
+    Args:
+        format: 導出格式
+        
+    Returns:
+        小寫格式名稱列表
+    """
+    if isinstance(format, str):
+        format = format.split(",")
+    return list(dict.fromkeys(f.strip().lower() for f in format if f.strip()))
+
+
+def export_data(data: Iterable[Dict[str, Any]], format: Union[str, List[str]], output_dir: str,
+                filename_prefix: str = "facebook_ad_contents", chunk_size: int = DEFAULT_CHUNK_SIZE,
+                max_workers: int = None) -> Dict[str, Any]:
     """
     根據指定格式導出數據
     
+    只指定一種格式時，CSV、Parquet和NDJSON按塊流式寫入，傳入迭代器時內存佔用與數據總量無關。
+    指定多種格式時，數據只解析和展開一次，然後並發寫入各個格式，
+    結果中的 "formats" 字段包含每種格式的導出結果、耗時和文件大小。
+    
     Args:
-        data: 要導出的數據列表
-        format: 導出格式 (excel, csv)
+        data: 要導出的數據列表或迭代器
+        format: 導出格式 (excel, csv, parquet, ndjson)，可以是列表或逗號分隔的字符串
         output_dir: 輸出目錄
         filename_prefix: 文件名前綴
+        chunk_size: 流式導出時每個數據塊的記錄數
+        max_workers: 並發寫入的線程數，默認每種格式一個線程
         
     Returns:
         包含導出結果的字典
     """
     try:
+        formats = _parse_formats(format)
+        unsupported = [f for f in formats if f not in EXPORT_FORMATS]
+        if not formats or unsupported:
+            return {
+                "success": False,
+                "error": f"不支持的導出格式: {', '.join(unsupported) or format}"
+            }
+        
         # 確保輸出目錄存在
         if not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
         
         # 生成時間戳
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_paths = {
+            f: os.path.join(output_dir, f"{filename_prefix}_{timestamp}.{EXPORT_FORMATS[f][0]}")
+            for f in formats
+        }
         
-        # 根據格式導出數據
-        if format.lower() == "excel":
-            output_path = os.path.join(output_dir, f"{filename_prefix}_{timestamp}.xlsx")
-            result = export_to_excel(data, output_path)
-        elif format.lower() == "csv":
-            output_path = os.path.join(output_dir, f"{filename_prefix}_{timestamp}.csv")
-            result = export_to_csv(data, output_path)
-        else:
-            return {
-                "success": False,
-                "error": f"不支持的導出格式: {format}"
+        if len(formats) == 1:
+            result = _export_format(data, formats[0], output_paths[formats[0]], chunk_size)
+            if result["success"]:
+                result["timestamp"] = timestamp
+            return result
+        
+        # 多種格式共用同一份已展開的數據
+        start_time = time.perf_counter()
+        df = normalize_records(data)
+        normalize_seconds = time.perf_counter() - start_time
+        logger.info(f"已展開 {len(df)} 條記錄，耗時 {normalize_seconds:.2f} 秒，開始並發導出: {', '.join(formats)}")
+        
+        with ThreadPoolExecutor(max_workers=max_workers or len(formats)) as executor:
+            futures = {
+                f: executor.submit(_export_format, df, f, output_paths[f], chunk_size)
+                for f in formats
             }
+            results = {f: future.result() for f, future in futures.items()}
         
-        # 添加額外信息
-        if result["success"]:
-            result["format"] = format.lower()
-            result["timestamp"] = timestamp
-            result["filename"] = os.path.basename(output_path)
+        failed = {f: r["error"] for f, r in results.items() if not r["success"]}
+        result = {
+            "success": not failed,
+            "formats": results,
+            "row_count": len(df),
+            "timestamp": timestamp,
+            "normalize_seconds": round(normalize_seconds, 4),
+            "seconds": round(time.perf_counter() - start_time, 4)
+        }
+        if failed:
+            result["error"] = "; ".join(f"{f}: {error}" for f, error in failed.items())
         
         return result
     
@@ -304,4 +832,16 @@ if __name__ == "__main__":
     
     # 測試CSV導出
     csv_result = export_data(test_data, "csv", "./output")
-    print(f"CSV導出結果: {csv_result}")
\ No newline at end of file
+    print(f"CSV導出結果: {csv_result}")
+    
+    # 測試Parquet導出（從迭代器分塊寫入）
+    parquet_result = export_data(iter(test_data), "parquet", "./output", chunk_size=1)
+    print(f"Parquet導出結果: {parquet_result}")
+    
+    # 測試NDJSON導出
+    ndjson_result = export_data(iter(test_data), "ndjson", "./output", chunk_size=1)
+    print(f"NDJSON導出結果: {ndjson_result}")
+    
+    # 測試一次並發導出多種格式
+    multi_result = export_data(test_data, ["csv", "excel", "parquet"], "./output")
+    print(f"多格式導出結果: {multi_result}")
\ No newline at end of file
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+請求字段配置模塊
+
+這個模塊定義各收集方法向Graph API請求的字段，包括：
+- minimal / standard / full 三級字段配置
+- analysis 配置：從 full 中裁剪掉分析器從不讀取的字段
+- 字段列表與Graph API fields參數之間的轉換
+"""
+
+from typing import List, Set
+
+# 可用的字段配置
+PROFILE_NAMES = ("minimal", "standard", "full", "analysis")
+
+# 各收集方法的字段配置；full 與之前固定請求的字段一致
+FIELD_PROFILES = {
+    "page_search": {
+        "minimal": ["id", "name"],
+        "standard": ["id", "name", "category", "fan_count", "verification_status"],
+        "full": ["id", "name", "category", "link", "fan_count", "verification_status", "about", "description",
+                 "website"]
+    },
+    "page_details": {
+        "minimal": ["id", "name", "fan_count"],
+        "standard": ["id", "name", "category", "link", "fan_count", "verification_status", "website"],
+        "full": ["id", "name", "category", "link", "fan_count", "verification_status", "about", "description",
+                 "website", "location", "phone", "emails", "founded", "company_overview", "mission", "products",
+                 "hours"]
+    },
+    "page_posts": {
+        # limit(0) 只返回匯總計數，不返回每個反應和評論
+        "minimal": ["id", "created_time", "shares", "reactions.limit(0).summary(true)",
+                    "comments.limit(0).summary(true)"],
+        "standard": ["id", "message", "created_time", "type", "permalink_url", "shares",
+                     "reactions.limit(0).summary(true)", "comments.limit(0).summary(true)"],
+        "full": ["id", "message", "created_time", "type", "permalink_url", "shares", "reactions.summary(true)",
+                 "comments.summary(true)"]
+    },
+    "group_search": {
+        "minimal": ["id", "name"],
+        "standard": ["id", "name", "privacy", "member_count"],
+        "full": ["id", "name", "description", "privacy", "member_count", "owner"]
+    },
+    "group_details": {
+        "minimal": ["id", "name", "member_count"],
+        "standard": ["id", "name", "description", "privacy", "member_count", "updated_time"],
+        "full": ["id", "name", "description", "privacy", "member_count", "owner", "cover", "updated_time"]
+    },
+    "group_posts": {
+        "minimal": ["id", "created_time", "reactions.limit(0).summary(true)", "comments.limit(0).summary(true)"],
+        "standard": ["id", "message", "created_time", "type", "permalink_url", "from",
+                     "reactions.limit(0).summary(true)", "comments.limit(0).summary(true)"],
+        "full": ["id", "message", "created_time", "type", "permalink_url", "from", "reactions.summary(true)",
+                 "comments.summary(true)"]
+    },
+    "user_search": {
+        "minimal": ["id", "name"],
+        "standard": ["id", "name", "link"],
+        "full": ["id", "name", "link", "picture"]
+    },
+    "user_details": {
+        "minimal": ["id", "name"],
+        "standard": ["id", "name", "link", "locale", "verified"],
+        "full": ["id", "name", "first_name", "last_name", "link", "picture", "gender", "locale", "timezone",
+                 "verified"]
+    },
+    "ad_accounts": {
+        "minimal": ["id", "account_id"],
+        "standard": ["id", "name", "account_id", "account_status", "currency"],
+        "full": ["id", "name", "account_id", "account_status", "business_name", "currency", "timezone_name"]
+    },
+    "ad_campaigns": {
+        "minimal": ["id", "name", "insights"],
+        "standard": ["id", "name", "objective", "status", "daily_budget", "lifetime_budget", "insights"],
+        "full": ["id", "name", "objective", "status", "created_time", "start_time", "stop_time", "daily_budget",
+                 "lifetime_budget", "insights"]
+    },
+    # 廣告系列中嵌套請求的洞察字段
+    "campaign_insights": {
+        "minimal": ["impressions", "clicks", "spend"],
+        "standard": ["impressions", "clicks", "spend", "reach", "ctr"],
+        "full": ["impressions", "clicks", "cpc", "cpm", "ctr", "spend", "reach"]
+    },
+    "ad_insights": {
+        "minimal": ["campaign_id", "impressions", "clicks", "spend"],
+        "standard": ["campaign_id", "campaign_name", "adset_id", "ad_id", "impressions", "clicks", "spend", "reach",
+                     "actions", "action_values", "conversions"],
+        "full": ["account_id", "account_name", "campaign_id", "campaign_name", "adset_id", "adset_name", "ad_id",
+                 "ad_name", "impressions", "clicks", "cpc", "cpm", "ctr", "spend", "reach", "frequency", "actions",
+                 "action_values", "conversions", "cost_per_action_type"]
+    }
+}
+
+# 分析器（data_analyzer.py）讀取的原始數據頂層字段，修改分析邏輯時需要同步更新（standard 配置必須包含這些字段）
+# 沒有列出的收集方法，analysis 配置使用 minimal
+ANALYZER_FIELDS = {
+    # analyze_page_engagement: 頁面統計
+    "page_details": {"id", "name", "fan_count", "verification_status"},
+    # analyze_page_engagement: 帖子互動和熱門帖子
+    "page_posts": {"id", "message", "created_time", "reactions", "comments", "shares"},
+    # analyze_ad_performance: 按廣告系列匯總洞察
+    "ad_campaigns": {"id", "name", "insights"},
+    "campaign_insights": {"impressions", "clicks", "spend", "reach"},
+    # analyze_ad_performance: 展開行為列表，按廣告系列計算CPA、轉化率和ROAS
+    "ad_insights": {"campaign_id", "campaign_name", "impressions", "clicks", "spend", "actions", "action_values",
+                    "conversions"}
+}
+
+
+def field_name(field: str) -> str:
+    """
+    返回字段表達式的頂層字段名
+    
+    Args:
+        field: 字段表達式，例如 "reactions.limit(0).summary(true)" 或 "insights{clicks}"
+    
+    Returns:
+        頂層字段名，例如 "reactions"
+    """
+    for separator in ".{(":
+        field = field.split(separator, 1)[0]
+    return field.strip()
+
+
+def resolve_fields(method: str, profile: str = "full") -> List[str]:
+    """
+    返回收集方法在指定配置下請求的字段
+    
+    Args:
+        method: 收集方法，參見 FIELD_PROFILES
+        profile: 字段配置 (minimal, standard, full, analysis)
+    
+    Returns:
+        字段表達式列表
+    """
+    profiles = FIELD_PROFILES[method]
+    
+    if profile == "analysis":
+        used = ANALYZER_FIELDS.get(method)
+        if not used:
+            return list(profiles["minimal"])
+        # id總是保留，用於去重和關聯
+        return [field for field in profiles["full"] if field_name(field) in used or field_name(field) == "id"]
+    
+    if profile not in profiles:
+        raise ValueError(f"不支持的字段配置: {profile}，可選: {', '.join(PROFILE_NAMES)}")
+    return list(profiles[profile])
+
+
+def join_fields(fields: List[str]) -> str:
+    """把字段列表轉換為Graph API的fields參數"""
+    return ",".join(fields)
+
+
+def pruned_fields(method: str) -> Set[str]:
+    """
+    返回 analysis 配置相對於 full 裁剪掉的頂層字段
+    
+    Args:
+        method: 收集方法
+    
+    Returns:
+        被裁剪的字段名集合
+    """
+    kept = {field_name(field) for field in resolve_fields(method, "analysis")}
+    return {field_name(field) for field in FIELD_PROFILES[method]["full"]} - kept
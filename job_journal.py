@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+收集任務日誌模塊
+
+這個模塊為長時間運行的收集任務提供檢查點功能，包括：
+- 按任務配置確定的任務ID（重啟後找到同一份日誌）
+- 記錄日誌的創建時間，超過有效期的檢查點直接丟棄，不再恢復
+- 只追加的JSON Lines日誌，每個檢查點寫入後立即fsync
+- 已完成子單元（頁面、廣告賬戶等）的結果記錄
+- 分頁游標記錄（已獲取的數據和下一頁URL）
+- 部分失敗的處理：明確要求恢復的任務拋出APIError使子單元保持未完成，其他任務保留已獲取的數據並記錄錯誤
+- 任務成功完成後刪除日誌
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from utils import APIError
+from task_scheduler import task_key
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+
+class JobJournal:
+    """單個收集任務的檢查點日誌"""
+    
+    def __init__(self, journal_dir: str, job_id: str, ttl_hours: float = 0, strict: bool = False):
+        """
+        初始化日誌並重放已有的檢查點
+        
+        Args:
+            journal_dir: 日誌目錄
+            job_id: 任務ID
+            ttl_hours: 檢查點有效期（小時），創建時間更早的日誌被丟棄；0表示不限制
+            strict: 是否為明確要求恢復的任務（部分失敗時拋出APIError，參見 partial_failure）
+        """
+        self.job_id = job_id
+        self.file_path = os.path.join(journal_dir, f"{job_id}.jsonl")
+        self.lock = threading.Lock()
+        self.ttl_hours = ttl_hours
+        self.strict = strict
+        
+        self._units = {}
+        self._cursors = {}
+        self.created_at = None
+        self.resumed = False
+        self.errors = []
+        
+        os.makedirs(journal_dir, exist_ok=True)
+        self._replay()
+    
+    @classmethod
+    def for_task(cls, journal_dir: str, task_config: Dict[str, Any], ttl_hours: float = 0) -> "JobJournal":
+        """
+        返回任務配置對應的日誌（相同的任務配置總是對應同一份日誌）
+        
+        Args:
+            journal_dir: 日誌目錄
+            task_config: 任務配置，resume 為 true 時表示明確要求從檢查點恢復
+            ttl_hours: 檢查點有效期（小時），0表示不限制
+        
+        Returns:
+            任務日誌
+        """
+        key = task_key(task_config)
+        job_id = f"{task_config.get('type', 'job')}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+        return cls(journal_dir, job_id, ttl_hours=ttl_hours, strict=bool(task_config.get("resume")))
+    
+    def _replay(self) -> None:
+        """從日誌文件恢復檢查點，忽略崩潰時寫了一半的最後一行，丟棄過期的日誌"""
+        if not os.path.exists(self.file_path):
+            return
+        
+        entries = []
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"忽略任務日誌 {self.file_path} 第 {line_number} 行的不完整記錄")
+        
+        # 舊版本的日誌沒有創建時間記錄，使用文件的修改時間
+        created_at = next((entry["created_at"] for entry in entries if entry.get("event") == "start"),
+                          os.path.getmtime(self.file_path))
+        age_hours = (time.time() - created_at) / 3600
+        if self.ttl_hours and age_hours > self.ttl_hours:
+            logger.warning(f"任務 {self.job_id} 的檢查點創建於 {age_hours:.1f} 小時前，超過有效期 "
+                           f"{self.ttl_hours} 小時，已丟棄: {self.file_path}")
+            os.remove(self.file_path)
+            return
+        self.created_at = created_at
+        
+        for entry in entries:
+            if entry.get("event") == "unit":
+                self._units[entry["unit"]] = entry.get("data")
+            elif entry.get("event") == "cursor":
+                cursor = self._cursors.setdefault(entry["stream"], [[], None])
+                cursor[0].extend(entry.get("items", []))
+                cursor[1] = entry.get("next")
+        
+        self.resumed = bool(self._units or self._cursors)
+        if self.resumed:
+            # 恢復的數據可能已經過時，明確記錄檢查點的時間和位置
+            logger.warning(f"從 {datetime.fromtimestamp(created_at).isoformat(timespec='seconds')} "
+                           f"（{age_hours:.1f} 小時前）創建的檢查點恢復任務 {self.job_id}: "
+                           f"{len(self._units)} 個已完成單元，{len(self._cursors)} 個分頁游標；"
+                           f"刪除 {self.file_path} 可以重新收集")
+    
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """追加一條記錄並同步到磁盤（調用方需持有鎖），新日誌先寫入創建時間"""
+        entries = [entry]
+        if self.created_at is None:
+            self.created_at = time.time()
+            entries.insert(0, {"event": "start", "created_at": self.created_at})
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(item, ensure_ascii=False) + "\n" for item in entries))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def has_unit(self, unit: str) -> bool:
+        """子單元是否已完成"""
+        return unit in self._units
+    
+    def get_unit(self, unit: str, default: Any = None) -> Any:
+        """返回已完成子單元的結果"""
+        return self._units.get(unit, default)
+    
+    def complete_unit(self, unit: str, data: Any) -> None:
+        """
+        記錄已完成的子單元
+        
+        Args:
+            unit: 子單元名稱，例如 "page:123" 或 "ad_account:act_456"
+            data: 子單元結果（必須可以序列化為JSON）
+        """
+        with self.lock:
+            self._append({"event": "unit", "unit": unit, "data": data})
+            self._units[unit] = data
+    
+    def get_cursor(self, stream: str) -> Tuple[List[Any], Optional[str]]:
+        """
+        返回分頁游標
+        
+        Args:
+            stream: 分頁數據流名稱
+        
+        Returns:
+            (已獲取的數據, 下一頁URL)，沒有檢查點時返回 ([], None)
+        """
+        items, next_url = self._cursors.get(stream, ([], None))
+        return list(items), next_url
+    
+    def advance_cursor(self, stream: str, items: List[Any], next_url: Optional[str]) -> None:
+        """
+        記錄一頁數據和下一頁URL
+        
+        Args:
+            stream: 分頁數據流名稱
+            items: 本頁新獲取的數據
+            next_url: 下一頁URL（沒有下一頁時為None）
+        """
+        with self.lock:
+            self._append({"event": "cursor", "stream": stream, "items": items, "next": next_url})
+            cursor = self._cursors.setdefault(stream, [[], None])
+            cursor[0].extend(items)
+            cursor[1] = next_url
+    
+    def partial_failure(self, message: str) -> None:
+        """
+        處理子單元的部分失敗（例如分頁中途失敗、詳情或洞察數據獲取失敗）
+        
+        明確要求恢復的任務拋出APIError，子單元不記為完成，重新運行時從失敗處繼續；
+        其他任務記錄錯誤後返回，由調用方保留已獲取的數據（與不使用檢查點時相同）。
+        
+        Args:
+            message: 錯誤信息
+        
+        Raises:
+            APIError: 明確要求恢復的任務
+        """
+        if self.strict:
+            raise APIError(message)
+        logger.warning(f"任務 {self.job_id} 部分失敗，保留已獲取的數據: {message}")
+        with self.lock:
+            self.errors.append(message)
+    
+    def stream(self, name: str) -> "JournalStream":
+        """返回綁定到一個分頁數據流的檢查點"""
+        return JournalStream(self, name)
+    
+    def finish(self) -> None:
+        """任務成功完成，刪除日誌"""
+        with self.lock:
+            if os.path.exists(self.file_path):
+                os.remove(self.file_path)
+            self._units.clear()
+            self._cursors.clear()
+            self.created_at = None
+        logger.debug(f"任務 {self.job_id} 已完成，日誌已刪除")
+
+
+class JournalStream:
+    """綁定到日誌中一個分頁數據流的檢查點"""
+    
+    def __init__(self, journal: JobJournal, name: str):
+        self.journal = journal
+        self.name = name
+    
+    def load(self) -> Tuple[List[Any], Optional[str]]:
+        """返回 (已獲取的數據, 下一頁URL)"""
+        return self.journal.get_cursor(self.name)
+    
+    def save(self, items: List[Any], next_url: Optional[str]) -> None:
+        """記錄一頁數據和下一頁URL"""
+        self.journal.advance_cursor(self.name, items, next_url)
+    
+    def fail(self, message: str) -> None:
+        """處理分頁失敗，參見 JobJournal.partial_failure"""
+        self.journal.partial_failure(message)
@@ -13,6 +13,7 @@ import sys
 import json
 import logging
 import argparse
+from datetime import datetime
 from configparser import ConfigParser
 
 # 導入自定義模塊
@@ -20,6 +21,8 @@ from account_manager import FacebookAccountManager
 from data_collector import FacebookDataCollector
 from data_analyzer import FacebookDataAnalyzer
 from utils import setup_logging, load_config
+from tracing import tracer
+from profiler import PROFILE_MODES, profile_call
 
 # 設置日誌
 logger = logging.getLogger(__name__)
@@ -29,9 +32,14 @@ def parse_arguments():
     """解析命令行參數"""
     parser = argparse.ArgumentParser(description="Facebook數據挖掘工具")
     parser.add_argument("-c", "--config", default="config.ini", help="配置文件路徑")
-    parser.add_argument("-m", "--mode", choices=["collect", "analyze", "manage", "server"], 
+    parser.add_argument("-m", "--mode", choices=["collect", "analyze", "pipeline", "watch", "compact", "manage", "server", "daemon"], 
                         default="server", help="運行模式")
     parser.add_argument("-v", "--verbose", action="store_true", help="顯示詳細日誌")
+    parser.add_argument("--trace", nargs="?", const="", default=None, metavar="FILE",
+                        help="記錄追蹤區間並保存為Chrome Trace JSON文件（默認保存到報告目錄）")
+    parser.add_argument("--profile", nargs="?", const="cprofile", default=None, choices=PROFILE_MODES,
+                        help="在性能分析下運行所選模式，熱點摘要和火焰圖調用棧保存到報告目錄")
+    parser.add_argument("--dry-run", action="store_true", help="compact 模式: 只統計將合併和刪除的文件，不修改數據目錄")
     return parser.parse_args()
 
 
@@ -41,7 +49,7 @@ def main():
     args = parse_arguments()
     
     # 設置日誌級別
-    log_level = logging.DEBUG if args.verbose else logging.INFO
+    log_level = "DEBUG" if args.verbose else "INFO"
     setup_logging(log_level)
     
     # 加載配置
@@ -53,33 +61,89 @@ def main():
     logger.info("Facebook數據挖掘工具啟動")
     logger.info(f"運行模式: {args.mode}")
     
+    if args.trace is not None:
+        tracer.enable()
+    
     try:
-        # 初始化組件
-        account_manager = FacebookAccountManager(config)
-        data_collector = FacebookDataCollector(config)
-        data_analyzer = FacebookDataAnalyzer(config)
-        
-        # 根據模式執行不同操作
-        if args.mode == "collect":
-            logger.info("開始數據收集...")
-            data_collector.run()
-        elif args.mode == "analyze":
-            logger.info("開始數據分析...")
-            data_analyzer.run()
-        elif args.mode == "manage":
-            logger.info("開始賬戶管理...")
-            account_manager.run()
-        elif args.mode == "server":
-            logger.info("啟動API服務器...")
-            from api_server import start_server
-            start_server(account_manager, data_collector, data_analyzer, config)
-        
-        logger.info("操作完成")
-        return 0
+        with tracer.span(f"main.{args.mode}", "main", mode=args.mode):
+            if args.profile:
+                reports_dir = config.get('Files', 'reports_dir', fallback='reports')
+                return profile_call(lambda: run_mode(args, config), reports_dir, args.mode, args.profile)
+            return run_mode(args, config)
     
     except Exception as e:
         logger.exception(f"運行時錯誤: {e}")
         return 1
+    
+    finally:
+        if args.trace is not None:
+            save_trace(args.trace, config)
+
+
+def save_trace(trace_path: str, config: ConfigParser) -> None:
+    """保存追蹤文件
+    
+    Args:
+        trace_path: 追蹤文件路徑，為空時保存到報告目錄
+        config: 配置對象
+    """
+    if not trace_path:
+        reports_dir = config.get('Files', 'reports_dir', fallback='reports')
+        os.makedirs(reports_dir, exist_ok=True)
+        trace_path = os.path.join(reports_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    tracer.save(trace_path)
+
+
+def run_mode(args, config: ConfigParser) -> int:
+    """初始化組件並運行所選模式
+    
+    Args:
+        args: 命令行參數
+        config: 配置對象
+        
+    Returns:
+        退出碼
+    """
+    # 初始化組件
+    account_manager = FacebookAccountManager(config)
+    data_collector = FacebookDataCollector(config, account_manager)
+    data_analyzer = FacebookDataAnalyzer(config)
+    
+    # 根據模式執行不同操作
+    if args.mode == "collect":
+        logger.info("開始數據收集...")
+        data_collector.run()
+    elif args.mode == "analyze":
+        logger.info("開始數據分析...")
+        data_analyzer.run()
+    elif args.mode == "pipeline":
+        logger.info("開始收集並分析...")
+        from pipeline import CollectionPipeline
+        CollectionPipeline(data_collector, data_analyzer, config).run()
+    elif args.mode == "watch":
+        logger.info("開始監視數據目錄並增量分析...")
+        data_analyzer.watch()
+    elif args.mode == "compact":
+        logger.info("開始合併數據快照...")
+        from compaction import SnapshotCompactor
+        results = SnapshotCompactor(config).run(dry_run=args.dry_run)
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        if not results["success"]:
+            return 1
+    elif args.mode == "manage":
+        logger.info("開始賬戶管理...")
+        account_manager.run()
+    elif args.mode == "server":
+        logger.info("啟動API服務器...")
+        from api_server import start_server
+        start_server(account_manager, data_collector, data_analyzer, config)
+    elif args.mode == "daemon":
+        logger.info("啟動守護進程...")
+        from api_server import start_daemon
+        start_daemon(account_manager, data_collector, data_analyzer, config)
+    
+    logger.info("操作完成")
+    return 0
 
 
 if __name__ == "__main__":
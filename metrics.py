@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+指標收集模塊
+
+這個模塊提供進程內的指標收集功能，包括：
+- 計數器（只增不減的累計值）
+- 儀表（可增可減的當前值）
+- 直方圖（按分桶統計的耗時分佈）
+- Prometheus文本格式和JSON快照導出
+"""
+
+import os
+import re
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Any, Tuple, Iterable
+
+# 默認直方圖分桶（秒），與Prometheus客戶端默認值一致
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 與數據文件一同保存的指標快照文件後綴
+METRICS_JSON_SUFFIX = ".metrics.json"
+METRICS_PROM_SUFFIX = ".prom"
+
+# 把端點中的對象ID替換為佔位符，避免每個ID產生一組新的標籤
+_ENDPOINT_ID_PATTERN = re.compile(r"(?<=/)(act_)?\d+(_\d+)?(?=/|$)|^(act_)?\d+(_\d+)?(?=/|$)")
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """
+    規範化API端點，用於指標標籤
+    
+    Args:
+        endpoint: API端點，例如 "act_123/insights" 或 "1000_2000"
+    
+    Returns:
+        規範化後的端點，例如 "act_{id}/insights" 或 "{id}"
+    """
+    endpoint = endpoint.split("?", 1)[0].strip("/")
+    
+    def replace(match):
+        return "act_{id}" if match.group(0).startswith("act_") else "{id}"
+    
+    return _ENDPOINT_ID_PATTERN.sub(replace, endpoint) or "/"
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """把標籤字典轉換為可哈希的鍵"""
+    return tuple(sorted((str(key), str(value)) for key, value in (labels or {}).items()))
+
+
+def _format_labels(label_key: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    """格式化Prometheus標籤"""
+    pairs = label_key + extra
+    if not pairs:
+        return ""
+    escaped = [
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in pairs
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    """格式化Prometheus數值"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Histogram:
+    """單組標籤的直方圖數據"""
+    
+    __slots__ = ("bucket_counts", "count", "sum")
+    
+    def __init__(self, bucket_count: int):
+        self.bucket_counts = [0] * (bucket_count + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class MetricsRegistry:
+    """線程安全的指標註冊表"""
+    
+    def __init__(self, namespace: str = "fb_data_miner", buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """
+        初始化指標註冊表
+        
+        Args:
+            namespace: 指標名稱前綴
+            buckets: 直方圖分桶上限（秒）
+        """
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        
+        self._help = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+    
+    def _name(self, name: str) -> str:
+        """添加命名空間前綴"""
+        return f"{self.namespace}_{name}" if self.namespace else name
+    
+    def describe(self, name: str, help_text: str) -> None:
+        """
+        設置指標說明
+        
+        Args:
+            name: 指標名稱（不含命名空間）
+            help_text: 說明文字
+        """
+        self._help[self._name(name)] = help_text
+    
+    def inc(self, name: str, value: float = 1, labels: Dict[str, Any] = None) -> None:
+        """
+        增加計數器
+        
+        Args:
+            name: 指標名稱
+            value: 增加的值
+            labels: 標籤
+        """
+        key = _label_key(labels)
+        with self.lock:
+            series = self._counters.setdefault(self._name(name), {})
+            series[key] = series.get(key, 0) + value
+    
+    def set_gauge(self, name: str, value: float, labels: Dict[str, Any] = None) -> None:
+        """
+        設置儀表的值
+        
+        Args:
+            name: 指標名稱
+            value: 當前值
+            labels: 標籤
+        """
+        key = _label_key(labels)
+        with self.lock:
+            self._gauges.setdefault(self._name(name), {})[key] = value
+    
+    def add_gauge(self, name: str, delta: float, labels: Dict[str, Any] = None) -> None:
+        """
+        增減儀表的值
+        
+        Args:
+            name: 指標名稱
+            delta: 變化量
+            labels: 標籤
+        """
+        key = _label_key(labels)
+        with self.lock:
+            series = self._gauges.setdefault(self._name(name), {})
+            series[key] = series.get(key, 0) + delta
+    
+    def observe(self, name: str, value: float, labels: Dict[str, Any] = None) -> None:
+        """
+        記錄一個直方圖觀測值
+        
+        Args:
+            name: 指標名稱
+            value: 觀測值（秒）
+            labels: 標籤
+        """
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self._histograms.setdefault(self._name(name), {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(len(self.buckets))
+            histogram.bucket_counts[index] += 1
+            histogram.count += 1
+            histogram.sum += value
+    
+    @contextmanager
+    def timer(self, name: str, labels: Dict[str, Any] = None, in_flight: str = None):
+        """
+        記錄代碼塊耗時的上下文管理器
+        
+        Args:
+            name: 直方圖指標名稱
+            labels: 標籤
+            in_flight: 執行期間加一的儀表名稱（可選）
+        """
+        if in_flight:
+            self.add_gauge(in_flight, 1, labels)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, labels)
+            if in_flight:
+                self.add_gauge(in_flight, -1, labels)
+    
+    def reset(self) -> None:
+        """清空所有指標"""
+        with self.lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回所有指標的JSON快照
+        
+        Returns:
+            包含counters、gauges和histograms的字典
+        """
+        def series_list(series, convert):
+            return [dict(labels=dict(key), **convert(value)) for key, value in series.items()]
+        
+        with self.lock:
+            return {
+                "timestamp": time.time(),
+                "uptime_seconds": time.time() - self.started_at,
+                "counters": {
+                    name: series_list(series, lambda value: {"value": value})
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: series_list(series, lambda value: {"value": value})
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: series_list(series, lambda histogram: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": self._cumulative_buckets(histogram)
+                    })
+                    for name, series in self._histograms.items()
+                }
+            }
+    
+    def _cumulative_buckets(self, histogram: _Histogram) -> Dict[str, int]:
+        """返回累計分桶計數 {上限: 計數}"""
+        result = {}
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), histogram.bucket_counts):
+            total += count
+            result[_format_value(bound)] = total
+        return result
+    
+    def to_prometheus(self) -> str:
+        """
+        以Prometheus文本格式導出所有指標
+        
+        Returns:
+            Prometheus文本格式字符串
+        """
+        lines = []
+        
+        def header(name, metric_type):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+        
+        with self.lock:
+            for name, series in sorted(self._counters.items()):
+                header(name, "counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            
+            for name, series in sorted(self._gauges.items()):
+                header(name, "gauge")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            
+            for name, series in sorted(self._histograms.items()):
+                header(name, "histogram")
+                for key, histogram in series.items():
+                    for bound, count in self._cumulative_buckets(histogram).items():
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        
+        return "\n".join(lines) + "\n"
+
+
+def write_metrics_files(registry: MetricsRegistry, base_path: str, export_format: str = "json") -> List[str]:
+    """
+    把指標快照寫到數據文件旁邊
+    
+    Args:
+        registry: 指標註冊表
+        base_path: 數據文件路徑（去掉擴展名後作為快照文件名前綴）
+        export_format: 導出格式 (json, prometheus, both, none)
+    
+    Returns:
+        寫入的文件路徑列表
+    """
+    from utils import save_json
+    
+    export_format = (export_format or "none").lower()
+    stem = os.path.splitext(base_path)[0]
+    written = []
+    
+    if export_format in ("json", "both"):
+        path = stem + METRICS_JSON_SUFFIX
+        if save_json(path, registry.snapshot(), indent=2):
+            written.append(path)
+    
+    if export_format in ("prometheus", "both"):
+        path = stem + METRICS_PROM_SUFFIX
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(registry.to_prometheus())
+        written.append(path)
+    
+    return written
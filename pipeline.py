@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+收集分析流水線模塊
+
+這個模塊把收集任務的結果直接交給分析器，包括：
+- 並發執行收集任務，每個任務完成後其數據按類型直接進入分析輸入（不經過文件序列化和解析）
+- 按收集結果的 data_type 分類，不依賴文件名判斷數據類型
+- 數據保存作為後台分支，與後續收集和分析並行
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+from typing import Dict, List, Any
+
+from task_scheduler import TaskScheduler
+from tracing import span
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+
+class CollectionPipeline:
+    """收集→分析流水線"""
+    
+    def __init__(self, collector, analyzer, config: ConfigParser):
+        """
+        初始化流水線
+        
+        Args:
+            collector: 數據收集器實例
+            analyzer: 數據分析器實例
+            config: 配置對象
+        """
+        self.collector = collector
+        self.analyzer = analyzer
+        
+        # 是否在後台保存收集的數據，以及保存線程數
+        self.persist = config.getboolean('Pipeline', 'persist', fallback=True)
+        self.persist_workers = config.getint('Pipeline', 'persist_workers', fallback=2)
+        self.analysis_type = config.get('Pipeline', 'analysis_type', fallback='all')
+        self.generate_charts = config.getboolean('Analysis', 'generate_charts', fallback=True)
+        self.report_format = config.get('Analysis', 'default_report_format', fallback='html')
+        
+        self._lock = threading.Lock()
+        self._executor = None
+        self._persist_futures = []
+        self.ad_data = []
+        self.page_data = []
+    
+    def _on_result(self, task: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """收集任務完成後（在工作線程中）：把數據交給分析輸入，並提交後台保存"""
+        if not result.get("success"):
+            return
+        
+        data_type = result.get("data_type")
+        data = result.get("data") or []
+        with self._lock:
+            if data_type == "ad_data":
+                self.ad_data.extend(data)
+            elif data_type == "page":
+                self.page_data.append(data)
+            
+            if self.persist and self._executor is not None:
+                future = self._executor.submit(self.collector.save_collected_data, data_type, data,
+                                               result.get("identifier"))
+                self._persist_futures.append((task["task_id"], future))
+    
+    def run(self, tasks: List[Dict] = None, max_workers: int = None) -> Dict[str, Any]:
+        """
+        執行收集任務並分析結果
+        
+        Args:
+            tasks: 任務配置列表（默認從 [Collection] tasks_file 加載）
+            max_workers: 收集工作線程數量（默認使用 [Collection] max_workers）
+        
+        Returns:
+            收集摘要、分析結果和保存的文件
+        """
+        if tasks is None:
+            tasks = self.collector.load_tasks()
+        if not tasks:
+            logger.warning("沒有需要執行的收集任務")
+            return {"success": False, "error": "沒有收集任務"}
+        
+        if max_workers is None:
+            max_workers = self.collector.config.getint('Collection', 'max_workers', fallback=4)
+        
+        # 收集方法本身不保存數據，由流水線在後台保存
+        tasks = [dict(task, save=False) for task in tasks]
+        timings = {}
+        self.ad_data, self.page_data, self._persist_futures = [], [], []
+        
+        with ThreadPoolExecutor(max_workers=max(1, self.persist_workers),
+                                thread_name_prefix="pipeline-persist") as executor:
+            self._executor = executor
+            
+            started = time.perf_counter()
+            with span("pipeline.collect", "pipeline", tasks=len(tasks)):
+                scheduler = TaskScheduler(self.collector, max_workers=max_workers, on_result=self._on_result)
+                summary = scheduler.run(tasks)
+            timings["collect_seconds"] = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            with span("pipeline.analyze", "pipeline", ad_accounts=len(self.ad_data), page_batches=len(self.page_data)):
+                analysis = self.analyzer.analyze_collected(
+                    self.ad_data, self.page_data, self.analysis_type, self.generate_charts, self.report_format
+                )
+            timings["analyze_seconds"] = time.perf_counter() - started
+            
+            # 等待後台保存完成
+            started = time.perf_counter()
+            persisted = {}
+            persist_errors = {}
+            for task_id, future in self._persist_futures:
+                try:
+                    persisted[task_id] = future.result()
+                except Exception as e:
+                    logger.exception(f"保存任務 {task_id} 的數據時出錯: {e}")
+                    persist_errors[task_id] = str(e)
+            timings["persist_wait_seconds"] = time.perf_counter() - started
+            self._executor = None
+        
+        for task in summary["tasks"]:
+            task["file_path"] = persisted.get(task["task_id"], task["file_path"])
+        
+        logger.info(f"流水線完成: {summary['completed']} 個任務成功，{summary['failed']} 個失敗，"
+                    f"分析{'完成' if analysis.get('success') else '未完成'}，已保存 {len(persisted)} 個數據文件")
+        return {
+            "success": summary["success"] and analysis.get("success", False) and not persist_errors,
+            "collection": summary,
+            "analysis": analysis,
+            "persisted": persisted,
+            "persist_errors": persist_errors,
+            "timings": timings
+        }
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能分析模塊
+
+這個模塊為主程序的各運行模式提供內置的性能分析功能，包括：
+- cProfile確定性分析（保存為 .prof 文件，可用 snakeviz 等工具查看），包括分析期間啟動的工作線程
+- 低開銷的採樣分析
+- tracemalloc內存分配跟蹤
+- 按耗時排序的熱點摘要
+- 火焰圖兼容的折疊調用棧（可用 flamegraph.pl 或 speedscope 查看）
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Any, Callable
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+
+class StackSampler:
+    """定時採樣所有線程調用棧的採樣分析器"""
+    
+    def __init__(self, interval: float = 0.005):
+        """
+        初始化採樣器
+        
+        Args:
+            interval: 採樣間隔（秒）
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self) -> None:
+        """在後台線程中開始採樣"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """停止採樣"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+    
+    def _run(self) -> None:
+        """採樣循環"""
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+    
+    def folded(self) -> str:
+        """返回火焰圖兼容的折疊調用棧文本（每行: 調用棧 次數）"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+    
+    def hotspots(self, top: int = 30) -> List[Dict[str, Any]]:
+        """
+        按採樣次數統計熱點函數
+        
+        Args:
+            top: 返回的函數數量
+        
+        Returns:
+            包含函數、自身採樣數和累計採樣數的列表
+        """
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for function in set(frames):
+                total_counts[function] += count
+        
+        return [
+            {"function": function, "self_samples": count, "total_samples": total_counts[function]}
+            for function, count in self_counts.most_common(top)
+        ]
+
+
+def _format_size(size: int) -> str:
+    """格式化字節數"""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class ThreadProfilers:
+    """
+    為分析期間啟動的線程（例如 TaskScheduler 的工作線程）各創建一個cProfile分析器
+    
+    cProfile只分析調用 enable() 的線程。threading.setprofile 設置的鉤子在每個新線程第一次調用函數時運行，
+    在該線程中創建並啟用分析器，之後由cProfile接管該線程。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profilers = []
+    
+    def _start_thread_profiler(self, frame, event, arg) -> None:
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._profilers.append((threading.current_thread(), profiler))
+        profiler.enable()
+    
+    def start(self) -> None:
+        """開始為之後啟動的線程創建分析器"""
+        threading.setprofile(self._start_thread_profiler)
+    
+    def stop(self) -> None:
+        """不再為新線程創建分析器（已啟動的線程結束時其分析器停止記錄）"""
+        threading.setprofile(None)
+    
+    def finished(self) -> List[cProfile.Profile]:
+        """
+        返回已結束線程的分析器
+        
+        仍在運行的線程（例如後台的守護線程）的分析器正在被該線程使用，不能安全地讀取，不包含在結果中。
+        """
+        with self._lock:
+            running = sum(1 for thread, _ in self._profilers if thread.is_alive())
+            if running:
+                logger.warning(f"{running} 個線程在性能分析結束時仍在運行，未包含在cProfile結果中")
+            return [profiler for thread, profiler in self._profilers if not thread.is_alive()]
+
+
+def profile_call(func: Callable[[], Any], reports_dir: str, label: str, mode: str = "cprofile",
+                 top: int = 30, sample_interval: float = 0.005) -> Any:
+    """
+    在性能分析下運行函數，並把結果寫入報告目錄
+    
+    寫入的文件（前綴為 profile_<label>_<時間戳>）：
+    - .txt: 熱點摘要（cProfile或採樣統計，以及tracemalloc內存分配）
+    - .folded: 火焰圖兼容的折疊調用棧
+    - .prof: cProfile原始數據（僅cprofile模式），合併了調用線程和分析期間啟動並已結束的線程（例如收集任務的工作線程）
+    
+    Args:
+        func: 要分析的函數
+        reports_dir: 報告目錄
+        label: 文件名標籤（通常是運行模式）
+        mode: 分析模式 (cprofile, sampling)
+        top: 摘要中列出的熱點數量
+        sample_interval: 採樣間隔（秒）
+    
+    Returns:
+        函數的返回值
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"不支持的性能分析模式: {mode}")
+    
+    os.makedirs(reports_dir, exist_ok=True)
+    prefix = os.path.join(reports_dir, f"profile_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    
+    sampler = StackSampler(sample_interval)
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    thread_profilers = ThreadProfilers() if profiler else None
+    
+    tracemalloc_started = not tracemalloc.is_tracing()
+    if tracemalloc_started:
+        tracemalloc.start()
+    sampler.start()
+    start_time = time.perf_counter()
+    if profiler:
+        # 在採樣器啟動之後設置，採樣線程本身不被分析
+        thread_profilers.start()
+        profiler.enable()
+    
+    try:
+        return func()
+    finally:
+        if profiler:
+            profiler.disable()
+            thread_profilers.stop()
+        elapsed = time.perf_counter() - start_time
+        sampler.stop()
+        # 排除採樣器自身和tracemalloc的分配
+        memory_snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__)
+        ])
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        if tracemalloc_started:
+            tracemalloc.stop()
+        
+        stats = None
+        if profiler:
+            stats = pstats.Stats(profiler)
+            worker_profilers = thread_profilers.finished()
+            if worker_profilers:
+                stats.add(*worker_profilers)
+            logger.info(f"cProfile結果包含調用線程和 {len(worker_profilers)} 個工作線程")
+        
+        _write_profile(prefix, label, mode, elapsed, stats, sampler, memory_snapshot,
+                       current_memory, peak_memory, top)
+
+
+def _write_profile(prefix: str, label: str, mode: str, elapsed: float, stats: pstats.Stats, sampler: StackSampler,
+                   memory_snapshot, current_memory: int, peak_memory: int, top: int) -> None:
+    """寫入性能分析結果文件（stats 為合併後的cProfile統計，採樣模式為None）"""
+    lines = [
+        f"性能分析: {label}（模式: {mode}）",
+        f"總耗時: {elapsed:.3f} 秒",
+        f"採樣次數: {sampler.sample_count}（間隔 {sampler.interval * 1000:.1f} 毫秒）",
+        f"內存: 當前 {_format_size(current_memory)}，峰值 {_format_size(peak_memory)}",
+        ""
+    ]
+    
+    if stats:
+        stats.dump_stats(prefix + ".prof")
+        for sort_key, title in (("cumulative", "累計耗時"), ("tottime", "自身耗時")):
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.strip_dirs().sort_stats(sort_key).print_stats(top)
+            lines.append(f"== 按{title}排序的前 {top} 個函數 (cProfile) ==")
+            lines.append(stream.getvalue().strip())
+            lines.append("")
+    
+    lines.append(f"== 按採樣次數排序的前 {top} 個函數 ==")
+    lines.append(f"{'自身':>8} {'累計':>8}  函數")
+    for row in sampler.hotspots(top):
+        lines.append(f"{row['self_samples']:>8} {row['total_samples']:>8}  {row['function']}")
+    lines.append("")
+    
+    lines.append(f"== 按分配大小排序的前 {top} 個代碼行 (tracemalloc) ==")
+    for stat in memory_snapshot.statistics("lineno")[:top]:
+        frame = stat.traceback[0]
+        lines.append(f"{_format_size(stat.size):>12} {stat.count:>8} 次  {frame.filename}:{frame.lineno}")
+    lines.append("")
+    
+    with open(prefix + ".txt", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    with open(prefix + ".folded", "w", encoding="utf-8") as f:
+        f.write(sampler.folded())
+    
+    logger.info(f"性能分析結果已保存到: {prefix}.txt, {prefix}.folded" + (f", {prefix}.prof" if stats else ""))
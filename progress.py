@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+收集進度事件模塊
+
+這個模塊為收集任務提供進程內的進度事件總線，包括：
+- 結構化進度事件（獲取的分頁、收集的數據行、限速等待、任務進度和預計剩餘時間）
+- 按線程綁定的當前任務，收集器在任務線程中發布的事件自動帶上任務ID
+- 每個訂閱者一個有界隊列：隊列已滿時丟棄最舊的事件並計數，發布事件的收集線程從不阻塞
+- 最近事件的環形緩衝，重新連接的訂閱者可以從上次收到的事件之後繼續
+- 訂閱單個任務時補發該任務的歷史事件，已完成的任務總是補發其完成事件
+"""
+
+import time
+import logging
+import threading
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Callable
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 事件類型
+TASK_STARTED = "task_started"
+TASK_FINISHED = "task_finished"
+PAGE_FETCHED = "page_fetched"
+ROWS_COLLECTED = "rows_collected"
+UNIT_COMPLETED = "unit_completed"
+WAIT = "wait"
+
+
+class TaskProgress:
+    """單個任務的進度（在任務線程中更新）"""
+    
+    def __init__(self, task_id: str, task_type: str = None):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.started = time.monotonic()
+        self.total_units = None
+        self.done_units = 0
+        self.rows = 0
+        self.pages = 0
+        self.wait_seconds = 0.0
+        # 任務開始前最後一個事件的序號，以及任務完成事件（歷史緩衝中的事件被覆蓋後仍然可以補發）
+        self.start_seq = 0
+        self.finished_event = None
+    
+    def eta_seconds(self) -> Optional[float]:
+        """按已完成單元的平均耗時估計剩餘時間，單元總數未知時返回None"""
+        if not self.total_units or not self.done_units:
+            return None
+        elapsed = time.monotonic() - self.started
+        return elapsed / self.done_units * max(self.total_units - self.done_units, 0)
+    
+    def percent(self) -> Optional[float]:
+        """完成百分比，單元總數未知時返回None"""
+        if not self.total_units:
+            return None
+        return min(100.0, self.done_units / self.total_units * 100)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """返回進度摘要"""
+        eta = self.eta_seconds()
+        percent = self.percent()
+        return {
+            "units_done": self.done_units,
+            "units_total": self.total_units,
+            "rows": self.rows,
+            "pages": self.pages,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "elapsed_seconds": round(time.monotonic() - self.started, 3),
+            "eta_seconds": round(eta, 3) if eta is not None else None,
+            "progress": round(percent, 1) if percent is not None else None
+        }
+
+
+class Subscription:
+    """事件總線的一個訂閱者"""
+    
+    def __init__(self, bus: "ProgressBus", max_queue: int, task_id: str = None):
+        self.bus = bus
+        self.task_id = task_id
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.closed = False
+        self._waker = None
+        self._wake_pending = False
+    
+    def set_waker(self, waker: Callable[[], None]) -> None:
+        """
+        設置有新事件時調用的函數（在發布事件的線程中調用，必須不阻塞）
+        
+        Args:
+            waker: 例如 lambda: loop.call_soon_threadsafe(event.set)
+        """
+        self._waker = waker
+    
+    def _offer(self, event: Dict[str, Any]) -> None:
+        """放入一個事件（調用方需持有總線的鎖），隊列已滿時丟棄最舊的事件"""
+        if self.task_id and event.get("task_id") != self.task_id:
+            return
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(event)
+        if self._waker and not self._wake_pending:
+            self._wake_pending = True
+            self._waker()
+    
+    def drain(self) -> List[Dict[str, Any]]:
+        """取出所有排隊的事件"""
+        with self.bus.lock:
+            events = list(self.queue)
+            self.queue.clear()
+            self._wake_pending = False
+            return events
+    
+    def take_dropped(self) -> int:
+        """返回並清零自上次調用以來丟棄的事件數"""
+        with self.bus.lock:
+            dropped, self.dropped = self.dropped, 0
+            return dropped
+    
+    def close(self) -> None:
+        """取消訂閱"""
+        self.bus.unsubscribe(self)
+
+
+class ProgressBus:
+    """進程內的進度事件總線"""
+    
+    def __init__(self, max_queue: int = 1000, history_size: int = 1000):
+        """
+        初始化事件總線
+        
+        Args:
+            max_queue: 每個訂閱者最多排隊的事件數，超過時丟棄最舊的事件
+            history_size: 保留的最近事件數（用於重新連接的訂閱者補發）
+        """
+        self.max_queue = max(1, max_queue)
+        self.lock = threading.Lock()
+        self._subscribers = []
+        self._history = deque(maxlen=max(0, history_size))
+        self._tasks = OrderedDict()
+        self._max_tasks = max(1, history_size)
+        self._sequence = 0
+        self._local = threading.local()
+    
+    @contextmanager
+    def task(self, task_id: str, task_type: str = None):
+        """
+        把當前線程綁定到一個任務，期間發布的事件都帶上任務ID和進度
+        
+        Args:
+            task_id: 任務ID
+            task_type: 任務類型（可選）
+        
+        Yields:
+            任務進度
+        """
+        previous = getattr(self._local, "progress", None)
+        progress = self._local.progress = TaskProgress(task_id, task_type)
+        with self.lock:
+            progress.start_seq = self._sequence
+            self._tasks[task_id] = progress
+            self._tasks.move_to_end(task_id)
+            while len(self._tasks) > self._max_tasks:
+                self._tasks.popitem(last=False)
+        try:
+            yield progress
+        finally:
+            self._local.progress = previous
+    
+    @property
+    def current(self) -> Optional[TaskProgress]:
+        """當前線程的任務進度（不在任務中時為None）"""
+        return getattr(self._local, "progress", None)
+    
+    def set_total(self, units: int) -> None:
+        """設置當前任務的單元總數（用於計算進度和預計剩餘時間）"""
+        progress = self.current
+        if progress is not None:
+            progress.total_units = units
+    
+    def publish(self, event_type: str, **fields) -> Dict[str, Any]:
+        """
+        發布一個事件（從不阻塞）
+        
+        Args:
+            event_type: 事件類型
+            **fields: 事件字段
+        
+        Returns:
+            事件
+        """
+        progress = self.current
+        event = {"type": event_type, "time": time.time()}
+        if progress is not None:
+            event["task_id"] = progress.task_id
+            if progress.task_type:
+                event["task_type"] = progress.task_type
+        event.update(fields)
+        
+        with self.lock:
+            self._sequence += 1
+            event["seq"] = self._sequence
+            self._history.append(event)
+            if progress is not None and event_type == TASK_FINISHED:
+                progress.finished_event = event
+            for subscription in self._subscribers:
+                subscription._offer(event)
+        return event
+    
+    def page_fetched(self, endpoint: str, size: int) -> None:
+        """記錄一個成功的API響應"""
+        progress = self.current
+        if progress is None:
+            return
+        progress.pages += 1
+        self.publish(PAGE_FETCHED, endpoint=endpoint, bytes=size, pages=progress.pages)
+    
+    def rows_collected(self, rows: int, description: str) -> None:
+        """記錄單元內分頁獲取到的數據行（例如一頁帖子），在單元完成時計入任務的數據行總數"""
+        if self.current is None:
+            return
+        self.publish(ROWS_COLLECTED, rows=rows, description=description)
+    
+    def unit_completed(self, unit: str, rows: int = 0) -> None:
+        """
+        記錄完成的單元（頁面、群組、廣告賬戶），附帶進度和預計剩餘時間
+        
+        Args:
+            unit: 單元名稱
+            rows: 單元的數據行數
+        """
+        progress = self.current
+        if progress is None:
+            return
+        progress.done_units += 1
+        progress.rows += rows
+        self.publish(UNIT_COMPLETED, unit=unit, **progress.snapshot())
+    
+    def waited(self, seconds: float, reason: str) -> None:
+        """記錄一次限速或重試等待"""
+        progress = self.current
+        if progress is not None:
+            progress.wait_seconds += seconds
+        self.publish(WAIT, seconds=round(seconds, 3), reason=reason)
+    
+    def subscribe(self, task_id: str = None, after: int = None, max_queue: int = None) -> Subscription:
+        """
+        訂閱事件
+        
+        Args:
+            task_id: 只接收這個任務的事件（可選）。沒有提供 after 時補發該任務最近一次運行仍在歷史中的事件；
+                任務已經完成時總是補發其完成事件，訂閱者不會一直等待已經結束的任務
+            after: 先補發歷史中序號大於此值的事件（可選，例如SSE的Last-Event-ID）
+            max_queue: 隊列大小（默認使用總線的設置）
+        
+        Returns:
+            訂閱
+        """
+        subscription = Subscription(self, max_queue or self.max_queue, task_id)
+        with self.lock:
+            progress = self._tasks.get(task_id) if task_id else None
+            if task_id and after is None:
+                # 同一任務ID重新運行時不補發上一次運行的事件
+                after = progress.start_seq if progress is not None else self._sequence
+            if after is not None:
+                for event in self._history:
+                    if event["seq"] > after:
+                        subscription._offer(event)
+                finished = progress.finished_event if progress is not None else None
+                oldest = self._history[0]["seq"] if self._history else None
+                if finished is not None and finished["seq"] > after and (oldest is None or finished["seq"] < oldest):
+                    # 完成事件已經不在歷史緩衝中
+                    subscription._offer(finished)
+            self._subscribers.append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """取消訂閱"""
+        with self.lock:
+            subscription.closed = True
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+    
+    def snapshot(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """返回任務的進度摘要（沒有該任務時返回None）"""
+        with self.lock:
+            progress = self._tasks.get(task_id)
+        return progress.snapshot() if progress is not None else None
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回訂閱者數量和丟棄的事件數"""
+        with self.lock:
+            return {
+                "published": self._sequence,
+                "subscribers": len(self._subscribers),
+                "queued": sum(len(subscription.queue) for subscription in self._subscribers),
+                "dropped": sum(subscription.dropped for subscription in self._subscribers)
+            }
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+請求重試策略模塊
+
+這個模塊為所有HTTP請求提供統一的重試策略，包括：
+- 按Graph API錯誤碼和HTTP狀態碼區分瞬時錯誤、速率限制和永久錯誤
+- 去相關抖動（decorrelated jitter）退避
+- 重試預算：重試次數不超過請求次數的一定比例，避免故障時重試放大負載
+- 按端點的熔斷器：連續失敗的端點暫停請求，不拖慢其他端點
+"""
+
+import time
+import random
+import logging
+import threading
+from configparser import ConfigParser
+from typing import Dict, Any, Optional
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 錯誤分類
+TRANSIENT = "transient"
+RATE_LIMIT = "rate_limit"
+PERMANENT = "permanent"
+
+# Graph API錯誤碼
+# 1: 未知錯誤, 2: 服務暫時不可用
+TRANSIENT_CODES = {1, 2}
+# 4: 應用請求限制, 17: 用戶請求限制, 32: 頁面請求限制, 613: 自定義速率限制, 80000-80014: 業務用例速率限制
+RATE_LIMIT_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+# 10/200-299: 權限錯誤, 100: 參數無效, 190: 訪問令牌無效, 803: 對象不存在
+PERMANENT_CODES = {10, 100, 190, 803} | set(range(200, 300))
+
+# 熔斷器狀態
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def classify_error(status_code: Optional[int] = None, error: Any = None) -> str:
+    """
+    判斷失敗的請求是否值得重試
+    
+    Args:
+        status_code: HTTP狀態碼（網絡異常時為None）
+        error: Graph API的error對象（可選）
+    
+    Returns:
+        錯誤分類 (transient, rate_limit, permanent)
+    """
+    code = error.get("code") if isinstance(error, dict) else None
+    
+    if code in RATE_LIMIT_CODES or status_code == 429:
+        return RATE_LIMIT
+    if code in PERMANENT_CODES:
+        return PERMANENT
+    if code in TRANSIENT_CODES or (isinstance(error, dict) and error.get("is_transient")):
+        return TRANSIENT
+    if status_code is None or status_code >= 500 or status_code == 408:
+        return TRANSIENT
+    return PERMANENT
+
+
+class RetryBudget:
+    """
+    重試預算
+    
+    每個新請求存入 ratio 個令牌，每次重試取出一個令牌，令牌不足時不再重試。
+    長期來看重試次數不超過請求次數的 ratio 倍，初始的 min_tokens 個令牌保證低流量時仍可重試。
+    """
+    
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10):
+        """
+        初始化重試預算
+        
+        Args:
+            ratio: 每個請求存入的令牌數
+            min_tokens: 初始令牌數
+        """
+        self.ratio = ratio
+        self.max_tokens = max(min_tokens, 1)
+        self.tokens = float(min_tokens)
+        self.lock = threading.Lock()
+    
+    def deposit(self) -> None:
+        """記錄一個新請求"""
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+    
+    def withdraw(self) -> bool:
+        """
+        嘗試取出一次重試的令牌
+        
+        Returns:
+            是否允許重試
+        """
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """單個端點的熔斷器"""
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0, probe_timeout: float = None):
+        """
+        初始化熔斷器
+        
+        Args:
+            failure_threshold: 打開熔斷器的連續失敗次數
+            reset_timeout: 熔斷器打開後允許試探請求前的等待時間（秒）
+            probe_timeout: 試探請求沒有記錄結果時，多少秒後允許下一個試探請求（默認與 reset_timeout 相同）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = reset_timeout if probe_timeout is None else probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """
+        是否允許發送請求
+        
+        熔斷器打開超過 reset_timeout 後進入半開狀態，只允許一個試探請求；
+        試探請求超過 probe_timeout 仍沒有結果時（例如調用方沒有記錄結果）允許下一個試探請求。
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if (self.state == OPEN and now - self.opened_at >= self.reset_timeout) or \
+                    (self.state == HALF_OPEN and now - self.probe_started >= self.probe_timeout):
+                self.state = HALF_OPEN
+                self.probe_started = now
+                return True
+            return False
+    
+    def record_success(self) -> None:
+        """記錄成功的請求，關閉熔斷器"""
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+    
+    def record_failure(self) -> bool:
+        """
+        記錄失敗的請求
+        
+        Returns:
+            熔斷器是否因此打開
+        """
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+    
+    def record_inconclusive(self) -> None:
+        """
+        記錄不能說明端點是否正常的結果（例如速率限制）
+        
+        關閉狀態下不做任何事；半開狀態下重新打開熔斷器，等待 reset_timeout 後再試探。
+        """
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """共享的請求重試策略"""
+    
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0,
+                 rate_limit_delay: float = 60.0, rate_limit_max_delay: float = 300.0,
+                 budget_ratio: float = 0.2, budget_min_tokens: float = 10,
+                 failure_threshold: int = 5, reset_timeout: float = 60.0, seed: int = None):
+        """
+        初始化重試策略
+        
+        Args:
+            max_retries: 每個請求的最大重試次數
+            base_delay: 瞬時錯誤的最小退避時間（秒）
+            max_delay: 瞬時錯誤的最大退避時間（秒）
+            rate_limit_delay: 速率限制錯誤的最小退避時間（秒）
+            rate_limit_max_delay: 速率限制錯誤的最大退避時間（秒）
+            budget_ratio: 重試預算，每個請求允許的重試次數
+            budget_min_tokens: 重試預算的初始令牌數
+            failure_threshold: 打開端點熔斷器的連續失敗次數，0表示不使用熔斷器
+            reset_timeout: 熔斷器打開後允許試探請求前的等待時間（秒）
+            seed: 隨機數種子（可選）
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+        self.rate_limit_max_delay = rate_limit_max_delay
+        self.budget = RetryBudget(budget_ratio, budget_min_tokens)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.random = random.Random(seed)
+        
+        self._breakers = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: ConfigParser, section: str = "API") -> "RetryPolicy":
+        """
+        從配置創建重試策略
+        
+        Args:
+            config: 配置對象
+            section: 配置節
+        
+        Returns:
+            重試策略
+        """
+        return cls(
+            max_retries=config.getint(section, "max_retries", fallback=3),
+            base_delay=config.getfloat(section, "retry_delay", fallback=1.0),
+            max_delay=config.getfloat(section, "retry_max_delay", fallback=60.0),
+            rate_limit_delay=config.getfloat(section, "rate_limit_delay", fallback=60.0),
+            rate_limit_max_delay=config.getfloat(section, "rate_limit_max_delay", fallback=300.0),
+            budget_ratio=config.getfloat(section, "retry_budget_ratio", fallback=0.2),
+            budget_min_tokens=config.getfloat(section, "retry_budget_min", fallback=10),
+            failure_threshold=config.getint(section, "circuit_failure_threshold", fallback=5),
+            reset_timeout=config.getfloat(section, "circuit_reset_seconds", fallback=60.0)
+        )
+    
+    def breaker(self, key: str) -> Optional[CircuitBreaker]:
+        """返回端點的熔斷器（未啟用熔斷器時返回None）"""
+        if self.failure_threshold <= 0:
+            return None
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+    
+    def allow(self, key: str) -> bool:
+        """
+        開始一個新請求：存入重試預算並檢查端點熔斷器
+        
+        Args:
+            key: 端點
+        
+        Returns:
+            是否允許發送請求（熔斷器打開時為False）
+        """
+        self.budget.deposit()
+        breaker = self.breaker(key)
+        return breaker is None or breaker.allow()
+    
+    def record_success(self, key: str) -> None:
+        """記錄端點的成功請求"""
+        breaker = self.breaker(key)
+        if breaker:
+            breaker.record_success()
+    
+    def record_failure(self, key: str) -> None:
+        """記錄端點的失敗請求（永久錯誤不應記錄）"""
+        breaker = self.breaker(key)
+        if breaker and breaker.record_failure():
+            logger.warning(f"端點 {key} 連續失敗，熔斷器打開 {self.reset_timeout:.0f} 秒")
+    
+    def record_outcome(self, key: str, kind: str) -> None:
+        """
+        按錯誤分類記錄端點的失敗請求
+        
+        每個通過 allow() 的請求都必須記錄一個結果，否則半開狀態的熔斷器要等到試探超時才恢復：
+        永久錯誤說明請求本身有問題，記為端點正常；速率限制針對整個應用，不計入端點的失敗次數；
+        其他錯誤記為失敗。
+        
+        Args:
+            key: 端點
+            kind: 錯誤分類
+        """
+        if kind == PERMANENT:
+            self.record_success(key)
+        elif kind == RATE_LIMIT:
+            breaker = self.breaker(key)
+            if breaker:
+                breaker.record_inconclusive()
+        else:
+            self.record_failure(key)
+    
+    def should_retry(self, key: str, attempt: int, kind: str) -> bool:
+        """
+        判斷失敗的請求是否重試
+        
+        Args:
+            key: 端點
+            attempt: 已完成的嘗試次數減一（第一次嘗試為0）
+            kind: 錯誤分類
+        
+        Returns:
+            是否重試（會消耗重試預算）
+        """
+        if kind == PERMANENT or attempt >= self.max_retries:
+            return False
+        breaker = self.breaker(key)
+        if breaker and breaker.state == OPEN:
+            return False
+        if not self.budget.withdraw():
+            logger.warning(f"重試預算已用完，不再重試端點 {key}")
+            return False
+        return True
+    
+    def backoff(self, previous_delay: Optional[float], kind: str) -> float:
+        """
+        返回下一次重試前的等待時間（去相關抖動）
+        
+        delay = min(上限, random(下限, 上一次等待時間 * 3))
+        
+        Args:
+            previous_delay: 上一次的等待時間（第一次重試時為None）
+            kind: 錯誤分類
+        
+        Returns:
+            等待時間（秒）
+        """
+        if kind == RATE_LIMIT:
+            low, high = self.rate_limit_delay, self.rate_limit_max_delay
+        else:
+            low, high = self.base_delay, self.max_delay
+        previous_delay = max(previous_delay or low, low)
+        return min(high, self.random.uniform(low, previous_delay * 3))
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回重試預算和熔斷器狀態"""
+        with self._lock:
+            breakers = {key: breaker.state for key, breaker in self._breakers.items() if breaker.state != CLOSED}
+        return {"budget_tokens": self.budget.tokens, "open_circuits": breakers}
@@ -0,0 +1,508 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按內容尋址的快照存儲模塊
+
+連續的收集結果大部分與上一次相同。這個模塊讓 save_collected_data 只寫入變化的部分，包括：
+- 每條記錄按規範化JSON的SHA-256哈希作為對象保存，相同的記錄只保存一次
+- 記錄中的對象列表（例如頁面的帖子、廣告賬戶的廣告系列）逐項單獨保存，
+  頁面詳情或單個帖子變化時只寫入變化的對象
+- 每個快照的新對象打包寫入一個包文件（<包ID>.<隨機後綴>.pack）和它的索引（<包ID>.idx），
+  不會為每條記錄創建一個文件
+- 快照文件本身只是一個引用對象哈希和所在包的小清單，utils.load_json 和 iter_json_records 讀取時自動還原完整數據；
+  引用的對象缺失時拋出 MissingObjectError，不會被當作空數據
+- 清理不再被任何快照引用的對象：刪除全部對象都不再被引用的包，大部分對象不再被引用的包只保留仍被引用的對象
+"""
+
+import os
+import json
+import time
+import secrets
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Iterator, Iterable, List, Optional, Set, Tuple
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 快照清單的標記字段（寫在清單的第一個字段，讀取時只需檢查文件開頭）
+MANIFEST_KEY = "$snapshot_manifest"
+# 版本1的清單引用單獨保存的對象文件（<前兩位>/<哈希>.json），版本2引用包
+MANIFEST_VERSION = 2
+
+# 記錄中被替換為對象引用的列表
+REFS_KEY = "$refs"
+
+# 包文件和索引文件的擴展名
+PACK_SUFFIX = ".pack"
+INDEX_SUFFIX = ".idx"
+
+# 不再被引用的對象至少佔包文件的這個比例時重寫包文件（比例更低時保留，避免為少量對象重寫整個包）
+REPACK_RATIO = 0.5
+
+
+class MissingObjectError(Exception):
+    """快照引用的對象不存在（對象目錄被刪除、移動或損壞）"""
+
+
+def _canonical(value: Any) -> bytes:
+    """規範化JSON（鍵排序、緊湊格式），相同內容得到相同的字節"""
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _is_object_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def _child_hashes(value: Any) -> List[str]:
+    """返回對象直接引用的子對象哈希"""
+    if not isinstance(value, dict):
+        return []
+    return [child for item_value in value.values() if isinstance(item_value, dict) and REFS_KEY in item_value
+            for child in item_value[REFS_KEY]]
+
+
+def _write_atomic(path: str, content: bytes) -> None:
+    """先寫入同目錄的臨時文件再替換，讀取者不會看到寫了一半的文件"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def is_manifest(data: Any) -> bool:
+    """判斷加載的JSON數據是否為快照清單"""
+    return isinstance(data, dict) and MANIFEST_KEY in data
+
+
+class _PackReader:
+    """從一組包（以及版本1的單獨對象文件）讀取對象"""
+    
+    def __init__(self, store: "ObjectStore", pack_ids: Iterable[str], legacy: bool = False):
+        """
+        初始化
+        
+        Args:
+            store: 對象存儲
+            pack_ids: 要讀取的包ID
+            legacy: 包中沒有的對象是否從版本1的單獨對象文件讀取
+        """
+        self.store = store
+        self.legacy = legacy
+        self.locations = {}
+        self.files = {}
+        for pack_id in pack_ids:
+            self._open(pack_id)
+    
+    def _open(self, pack_id: str) -> None:
+        # 讀取索引後立即打開包文件：之後清理重寫這個包時，已打開的文件仍然可以讀取
+        for attempt in range(2):
+            index = self.store._read_index(pack_id)
+            if index is None:
+                raise MissingObjectError(f"快照對象包不存在: {pack_id}")
+            try:
+                f = open(os.path.join(self.store.objects_dir, index["file"]), "rb")
+            except FileNotFoundError:
+                # 讀取索引和打開包文件之間包被重寫，重新讀取索引
+                if attempt:
+                    raise MissingObjectError(f"快照對象包文件不存在: {index['file']}")
+                continue
+            self.files[pack_id] = f
+            for object_hash, (offset, length) in index["objects"].items():
+                self.locations[object_hash] = (pack_id, offset, length)
+            return
+    
+    def read(self, object_hash: str) -> Any:
+        """
+        讀取一個對象（不還原其中的對象列表）
+        
+        Raises:
+            MissingObjectError: 對象不存在
+        """
+        location = self.locations.get(object_hash)
+        if location is not None:
+            pack_id, offset, length = location
+            f = self.files[pack_id]
+            f.seek(offset)
+            return json.loads(f.read(length))
+        
+        if self.legacy:
+            try:
+                with open(self.store._object_path(object_hash), "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                pass
+        raise MissingObjectError(f"快照對象不存在: {object_hash}")
+    
+    def get(self, object_hash: str) -> Any:
+        """
+        讀取一條記錄並還原其中的對象列表
+        
+        Raises:
+            MissingObjectError: 記錄或其子對象不存在
+        """
+        value = self.read(object_hash)
+        if isinstance(value, dict):
+            for key, item_value in value.items():
+                if isinstance(item_value, dict) and REFS_KEY in item_value:
+                    value[key] = [self.get(child) for child in item_value[REFS_KEY]]
+        return value
+    
+    def close(self) -> None:
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ObjectStore:
+    """按內容尋址的對象存儲（對象按快照打包保存）"""
+    
+    def __init__(self, objects_dir: str):
+        """
+        初始化
+        
+        Args:
+            objects_dir: 對象目錄
+        """
+        self.objects_dir = objects_dir
+        # 寫入時使用的對象索引（對象哈希 -> 包ID），第一次保存快照時加載
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_inodes = {}
+    
+    def _object_path(self, object_hash: str) -> str:
+        """版本1的單獨對象文件路徑"""
+        return os.path.join(self.objects_dir, object_hash[:2], f"{object_hash}.json")
+    
+    def _index_path(self, pack_id: str) -> str:
+        return os.path.join(self.objects_dir, f"{pack_id}{INDEX_SUFFIX}")
+    
+    def _read_index(self, pack_id: str) -> Optional[Dict[str, Any]]:
+        """讀取包索引，包不存在時返回None"""
+        try:
+            with open(self._index_path(pack_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def pack_ids(self) -> List[str]:
+        """返回對象目錄中所有包的ID"""
+        if not os.path.isdir(self.objects_dir):
+            return []
+        return sorted(name[:-len(INDEX_SUFFIX)] for name in os.listdir(self.objects_dir)
+                      if name.endswith(INDEX_SUFFIX) and not name.startswith("."))
+    
+    def _load_index(self) -> Dict[str, str]:
+        """加載（或重新加載）寫入時使用的對象索引，調用者持有鎖"""
+        index = {}
+        self._index_inodes = {}
+        for pack_id in self.pack_ids():
+            try:
+                inode = os.stat(self._index_path(pack_id)).st_ino
+            except FileNotFoundError:
+                continue
+            pack_index = self._read_index(pack_id)
+            if pack_index is None:
+                continue
+            self._index_inodes[pack_id] = inode
+            for object_hash in pack_index["objects"]:
+                index[object_hash] = pack_id
+        self._index = index
+        return index
+    
+    def _reusable(self, object_hash: str) -> Optional[str]:
+        """
+        返回包含對象的包ID（對象不存在時返回None），調用者持有鎖
+        
+        複用的包會更新修改時間，避免被併發的清理刪除或重寫；清理重寫過的包（索引文件被替換）重新加載索引。
+        """
+        pack_id = self._index.get(object_hash)
+        if pack_id is None:
+            return None
+        
+        try:
+            inode = os.stat(self._index_path(pack_id)).st_ino
+        except FileNotFoundError:
+            inode = None
+        if inode != self._index_inodes.get(pack_id):
+            pack_id = self._load_index().get(object_hash)
+            if pack_id is None:
+                return None
+        
+        try:
+            os.utime(self._index_path(pack_id))
+        except FileNotFoundError:
+            return None
+        return pack_id
+    
+    def _put(self, value: Any, pending: Dict[str, bytes], packs: Set[str], stats: Dict[str, int]) -> str:
+        """
+        準備保存一條記錄（其中的對象列表遞歸地逐項保存），調用者持有鎖
+        
+        Args:
+            value: 記錄
+            pending: 本次快照的新對象（原地更新）
+            packs: 快照引用的包ID（原地更新）
+            stats: 寫入和複用的對象計數（原地更新）
+        
+        Returns:
+            記錄的哈希
+        """
+        if isinstance(value, dict):
+            value = {key: {REFS_KEY: [self._put(item, pending, packs, stats) for item in item_value]}
+                     if _is_object_list(item_value) else item_value
+                     for key, item_value in value.items()}
+        
+        content = _canonical(value)
+        object_hash = hashlib.sha256(content).hexdigest()
+        
+        if object_hash in pending:
+            stats["reused"] += 1
+            return object_hash
+        
+        # 本次快照已經檢查過的包不再重複檢查
+        pack_id = self._index.get(object_hash)
+        if pack_id not in packs:
+            pack_id = self._reusable(object_hash)
+        if pack_id is not None:
+            packs.add(pack_id)
+            stats["reused"] += 1
+            return object_hash
+        
+        pending[object_hash] = content
+        stats["written"] += 1
+        stats["bytes"] += len(content)
+        return object_hash
+    
+    def _write_pack(self, pack_id: str, objects: Iterable[Tuple[str, bytes]]) -> Dict[str, Any]:
+        """
+        寫入包文件和索引（先寫包文件，讀取者看到索引時包文件已經完整）
+        
+        Args:
+            pack_id: 包ID（重寫已有的包時使用原來的ID，引用它的清單仍然有效）
+            objects: (對象哈希, 內容) 列表
+        
+        Returns:
+            包索引
+        """
+        index = {"file": f"{pack_id}.{secrets.token_hex(4)}{PACK_SUFFIX}", "objects": {}}
+        chunks = []
+        offset = 0
+        for object_hash, content in objects:
+            index["objects"][object_hash] = [offset, len(content)]
+            chunks.append(content)
+            chunks.append(b"\n")
+            offset += len(content) + 1
+        
+        os.makedirs(self.objects_dir, exist_ok=True)
+        _write_atomic(os.path.join(self.objects_dir, index["file"]), b"".join(chunks))
+        _write_atomic(self._index_path(pack_id), _canonical(index))
+        return index
+    
+    def write_snapshot(self, file_path: str, data: Any) -> Dict[str, int]:
+        """
+        保存快照：把新的對象寫入一個包，並寫入引用它們的清單
+        
+        Args:
+            file_path: 快照文件路徑
+            data: 快照數據（記錄列表或單個對象）
+        
+        Returns:
+            寫入和複用的對象計數及寫入的字節數
+        """
+        from utils import save_json
+        
+        stats = {"written": 0, "reused": 0, "bytes": 0}
+        records = data if isinstance(data, list) else [data]
+        pending = {}
+        packs = set()
+        
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            hashes = [self._put(record, pending, packs, stats) for record in records]
+            
+            if pending:
+                pack_id = f"{time.strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4)}"
+                index = self._write_pack(pack_id, pending.items())
+                self._index_inodes[pack_id] = os.stat(self._index_path(pack_id)).st_ino
+                self._index.update((object_hash, pack_id) for object_hash in index["objects"])
+                packs.add(pack_id)
+        
+        manifest = {
+            MANIFEST_KEY: MANIFEST_VERSION,
+            # 相對路徑：數據目錄整體移動後清單仍然有效
+            "objects_dir": os.path.relpath(self.objects_dir, os.path.dirname(os.path.abspath(file_path))),
+            "single": not isinstance(data, list),
+            "packs": sorted(packs),
+            "records": hashes
+        }
+        if not save_json(file_path, manifest, indent=None):
+            raise IOError(f"無法寫入快照清單: {file_path}")
+        return stats
+    
+    def live_hashes(self, manifests: Iterable[Tuple[str, Dict[str, Any]]]) -> Set[str]:
+        """返回清單直接和間接引用的所有對象哈希（缺失的對象忽略）"""
+        live = set()
+        pending = [object_hash for _, manifest in manifests for object_hash in manifest.get("records", [])]
+        with _PackReader(self, self.pack_ids(), legacy=True) as reader:
+            while pending:
+                object_hash = pending.pop()
+                if object_hash in live:
+                    continue
+                live.add(object_hash)
+                try:
+                    pending.extend(_child_hashes(reader.read(object_hash)))
+                except MissingObjectError:
+                    continue
+        return live
+    
+    def collect_garbage(self, live: Set[str], grace_seconds: float = 3600) -> Dict[str, int]:
+        """
+        刪除不再被引用的對象
+        
+        全部對象都不再被引用的包整個刪除；不再被引用的對象至少佔 REPACK_RATIO 時，
+        用原來的包ID重寫只包含仍被引用的對象的包。同時清理版本1的單獨對象文件。
+        
+        Args:
+            live: 仍被引用的對象哈希
+            grace_seconds: 最近修改過（寫入或被複用）的包和對象不處理（可能屬於正在寫入的快照）
+        
+        Returns:
+            刪除的對象數和釋放的字節數
+        """
+        removed = {"objects_removed": 0, "bytes_freed": 0}
+        if not os.path.isdir(self.objects_dir):
+            return removed
+        
+        threshold = time.time() - grace_seconds
+        for pack_id in self.pack_ids():
+            self._collect_pack(pack_id, live, threshold, removed)
+        self._collect_loose_objects(live, threshold, removed)
+        return removed
+    
+    def _collect_pack(self, pack_id: str, live: Set[str], threshold: float, removed: Dict[str, int]) -> None:
+        """清理一個包中不再被引用的對象"""
+        index_path = self._index_path(pack_id)
+        try:
+            if os.stat(index_path).st_mtime > threshold:
+                return
+        except FileNotFoundError:
+            return
+        index = self._read_index(pack_id)
+        if index is None:
+            return
+        
+        pack_path = os.path.join(self.objects_dir, index["file"])
+        dead = [object_hash for object_hash in index["objects"] if object_hash not in live]
+        dead_bytes = sum(index["objects"][object_hash][1] + 1 for object_hash in dead)
+        total_bytes = sum(length + 1 for _, length in index["objects"].values())
+        if not dead or dead_bytes < total_bytes * REPACK_RATIO:
+            return
+        
+        if len(dead) == len(index["objects"]):
+            # 先刪除索引：讀取者看不到索引時不會再打開包文件
+            os.remove(index_path)
+        else:
+            with open(pack_path, "rb") as f:
+                kept = []
+                for object_hash, (offset, length) in index["objects"].items():
+                    if object_hash in live:
+                        f.seek(offset)
+                        kept.append((object_hash, f.read(length)))
+            self._write_pack(pack_id, kept)
+        
+        try:
+            os.remove(pack_path)
+        except FileNotFoundError:
+            pass
+        removed["objects_removed"] += len(dead)
+        removed["bytes_freed"] += dead_bytes
+    
+    def _collect_loose_objects(self, live: Set[str], threshold: float, removed: Dict[str, int]) -> None:
+        """清理版本1的單獨對象文件"""
+        with os.scandir(self.objects_dir) as prefixes:
+            for prefix in prefixes:
+                if not prefix.is_dir():
+                    continue
+                with os.scandir(prefix.path) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(".json") or entry.name[:-len(".json")] in live:
+                            continue
+                        try:
+                            stat = entry.stat()
+                            if stat.st_mtime > threshold:
+                                continue
+                            os.remove(entry.path)
+                        except OSError:
+                            continue
+                        removed["objects_removed"] += 1
+                        removed["bytes_freed"] += stat.st_size
+
+
+def read_manifest(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    讀取快照清單（只檢查文件開頭，完整的JSON快照不會被解析）
+    
+    Args:
+        file_path: 數據文件路徑
+    
+    Returns:
+        清單，不是清單時返回None
+    """
+    if not file_path.endswith(".json"):
+        return None
+    with open(file_path, "r", encoding="utf-8") as f:
+        if f.read(len(MANIFEST_KEY) + 2) != '{"' + MANIFEST_KEY:
+            return None
+        f.seek(0)
+        return json.load(f)
+
+
+def reconstruct(file_path: str, manifest: Dict[str, Any]) -> Any:
+    """
+    從快照清單還原完整數據
+    
+    Args:
+        file_path: 清單文件路徑（用於解析對象目錄的相對路徑）
+        manifest: 清單
+    
+    Returns:
+        快照數據
+    
+    Raises:
+        MissingObjectError: 清單引用的對象不存在
+    """
+    records = list(iter_records(file_path, manifest))
+    if manifest.get("single") and records:
+        return records[0]
+    return records
+
+
+def iter_records(file_path: str, manifest: Dict[str, Any]) -> Iterator[Any]:
+    """
+    逐條還原快照清單中的記錄
+    
+    Raises:
+        MissingObjectError: 清單引用的對象不存在
+    """
+    objects_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), manifest["objects_dir"])
+    store = ObjectStore(os.path.normpath(objects_dir))
+    # 版本1的清單沒有包列表，對象保存在單獨的文件中
+    with _PackReader(store, manifest.get("packs", []), legacy="packs" not in manifest) as reader:
+        for object_hash in manifest.get("records", []):
+            yield reader.get(object_hash)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+收集任務調度模塊
+
+這個模塊提供多任務並發收集功能，包括：
+- 相同目標的任務去重（合併優先級和截止時間）
+- 按優先級和截止時間排序
+- 共享同一請求預算的工作線程池
+- 每個任務的排隊時間、運行時間和狀態
+"""
+
+import json
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterable, Callable
+
+from tracing import span
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 不參與去重的任務字段（resume 只決定是否明確從檢查點恢復，同一任務恢復時使用同一份檢查點日誌）
+SCHEDULING_FIELDS = ("task_id", "priority", "deadline", "resume")
+
+# 任務狀態
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+EXPIRED = "expired"
+
+
+def parse_deadline(deadline: Any) -> Optional[float]:
+    """
+    解析任務截止時間
+    
+    Args:
+        deadline: Unix時間戳或ISO格式日期時間字符串
+    
+    Returns:
+        Unix時間戳，未設置時返回None
+    """
+    if deadline in (None, ""):
+        return None
+    if isinstance(deadline, (int, float)):
+        return float(deadline)
+    return datetime.fromisoformat(str(deadline)).timestamp()
+
+
+def task_key(task_config: Dict[str, Any]) -> str:
+    """
+    返回任務的去重鍵（除調度字段外的所有字段）
+    
+    Args:
+        task_config: 任務配置
+    
+    Returns:
+        去重鍵
+    """
+    target = {key: value for key, value in task_config.items() if key not in SCHEDULING_FIELDS}
+    return json.dumps(target, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class TaskScheduler:
+    """並發收集任務調度器"""
+    
+    def __init__(self, collector, max_workers: int = 4,
+                 on_result: Callable[[Dict[str, Any], Dict[str, Any]], None] = None):
+        """
+        初始化調度器
+        
+        Args:
+            collector: 數據收集器實例（所有工作線程共享其請求預算）
+            max_workers: 工作線程數量
+            on_result: 每個任務完成後在工作線程中調用 on_result(任務, 收集結果)（可選），
+                收集結果包含收集到的數據
+        """
+        self.collector = collector
+        self.max_workers = max(1, max_workers)
+        self.on_result = on_result
+        
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self._task_ids_by_key = {}
+        self._heap = []
+        self._sequence = 0
+    
+    def submit(self, task_config: Dict[str, Any]) -> str:
+        """
+        提交一個收集任務
+        
+        與尚未開始的相同目標任務合併：保留較高的優先級和較早的截止時間。
+        
+        Args:
+            task_config: 任務配置，除 run_collection_task 支持的字段外，還可以包含：
+                priority: 優先級，數值越大越先執行（默認0）
+                deadline: 截止時間（Unix時間戳或ISO格式），超過截止時間仍未開始的任務不再執行
+                task_id: 任務ID（可選，不能與已提交的任務重複）
+        
+        Returns:
+            任務ID（與已有任務合併時返回已有任務的ID）
+        
+        Raises:
+            ValueError: task_id 與已提交的其他任務重複
+        """
+        key = task_key(task_config)
+        priority = int(task_config.get("priority", 0))
+        deadline = parse_deadline(task_config.get("deadline"))
+        
+        with self.lock:
+            existing_id = self._task_ids_by_key.get(key)
+            existing = self.tasks.get(existing_id)
+            if existing and existing["status"] == PENDING:
+                existing["duplicates"] += 1
+                merged_priority = max(existing["priority"], priority)
+                merged_deadline = min(
+                    (value for value in (existing["deadline"], deadline) if value is not None), default=None
+                )
+                if (merged_priority, merged_deadline) != (existing["priority"], existing["deadline"]):
+                    existing["priority"] = merged_priority
+                    existing["deadline"] = merged_deadline
+                    # 舊的堆條目在取出時因排序鍵不匹配而被跳過
+                    self._push(existing)
+                logger.debug(f"任務 {existing_id} 收到重複提交，已合併")
+                return existing_id
+            
+            task_id = task_config.get("task_id")
+            if task_id and task_id in self.tasks:
+                raise ValueError(f"任務ID {task_id} 已存在")
+            self._sequence += 1
+            if not task_id:
+                task_id = f"task_{self._sequence}"
+                # 自動生成的ID不覆蓋明確指定了相同ID的任務
+                while task_id in self.tasks:
+                    self._sequence += 1
+                    task_id = f"task_{self._sequence}"
+            task = {
+                "task_id": task_id,
+                "type": task_config.get("type"),
+                "config": task_config,
+                "priority": priority,
+                "deadline": deadline,
+                "sequence": self._sequence,
+                "status": PENDING,
+                "duplicates": 0,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "queue_seconds": None,
+                "run_seconds": None,
+                "file_path": None,
+                "items": None,
+                "error": None
+            }
+            self.tasks[task_id] = task
+            self._task_ids_by_key[key] = task_id
+            self._push(task)
+            return task_id
+    
+    def submit_many(self, task_configs: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        提交多個收集任務
+        
+        Args:
+            task_configs: 任務配置列表，或 queue.Queue（提交其中當前所有任務）
+        
+        Returns:
+            任務ID列表
+        
+        Raises:
+            ValueError: 任務ID重複（參見 submit）
+        """
+        if hasattr(task_configs, "get_nowait"):
+            drained = []
+            while not task_configs.empty():
+                drained.append(task_configs.get_nowait())
+            task_configs = drained
+        return [self.submit(task_config) for task_config in task_configs]
+    
+    def _push(self, task: Dict[str, Any]) -> None:
+        """把任務按當前排序鍵放入堆（調用方需持有鎖）"""
+        deadline = task["deadline"] if task["deadline"] is not None else float("inf")
+        heapq.heappush(self._heap, (-task["priority"], deadline, task["sequence"], task["task_id"]))
+    
+    def _next_task(self) -> Optional[Dict[str, Any]]:
+        """取出下一個要執行的任務，沒有任務時返回None"""
+        with self.lock:
+            while self._heap:
+                neg_priority, deadline, _, task_id = heapq.heappop(self._heap)
+                task = self.tasks[task_id]
+                current_deadline = task["deadline"] if task["deadline"] is not None else float("inf")
+                if task["status"] != PENDING or -neg_priority != task["priority"] or deadline != current_deadline:
+                    continue
+                task["status"] = RUNNING
+                task["started_at"] = time.time()
+                return task
+            return None
+    
+    def _run_task(self, task: Dict[str, Any]) -> None:
+        """執行一個任務並記錄狀態"""
+        metrics = self.collector.metrics
+        task["queue_seconds"] = task["started_at"] - task["submitted_at"]
+        labels = {"type": task["type"]}
+        
+        if task["deadline"] is not None and task["started_at"] > task["deadline"]:
+            task["status"] = EXPIRED
+            task["error"] = "任務在開始前已超過截止時間"
+            task["finished_at"] = task["started_at"]
+            task["run_seconds"] = 0
+            metrics.inc("tasks_total", labels=dict(labels, status=EXPIRED))
+            logger.warning(f"任務 {task['task_id']} 已超過截止時間，跳過")
+            return
+        
+        start_time = time.perf_counter()
+        with span("schedule.task", "schedule", task_id=task["task_id"], priority=task["priority"]):
+            try:
+                result = self.collector.run_collection_task(task["config"])
+            except Exception as e:
+                logger.exception(f"任務 {task['task_id']} 執行時出錯: {e}")
+                result = {"success": False, "error": str(e)}
+        
+        task["run_seconds"] = time.perf_counter() - start_time
+        task["finished_at"] = time.time()
+        task["status"] = COMPLETED if result.get("success") else FAILED
+        task["file_path"] = result.get("file_path")
+        task["items"] = len(result.get("data") or [])
+        task["error"] = result.get("error")
+        
+        metrics.observe("task_queue_seconds", task["queue_seconds"], labels)
+        metrics.observe("task_run_seconds", task["run_seconds"], labels)
+        metrics.inc("tasks_total", labels=dict(labels, status=task["status"]))
+        logger.info(f"任務 {task['task_id']} ({task['type']}) {task['status']}，"
+                    f"排隊 {task['queue_seconds']:.2f} 秒，運行 {task['run_seconds']:.2f} 秒")
+        
+        if self.on_result is not None:
+            try:
+                self.on_result(task, result)
+            except Exception as e:
+                logger.exception(f"處理任務 {task['task_id']} 的結果時出錯: {e}")
+    
+    def _worker(self) -> None:
+        """工作線程：持續取出並執行任務直到隊列為空"""
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            self._run_task(task)
+    
+    def run(self, task_configs: Iterable[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        執行所有待處理任務，直到隊列為空
+        
+        執行期間其他線程仍可以調用 submit() 添加任務。
+        
+        Args:
+            task_configs: 要先提交的任務配置（可選）
+        
+        Returns:
+            執行摘要和每個任務的狀態
+        
+        Raises:
+            ValueError: 任務ID重複（在開始執行任何任務之前）
+        """
+        if task_configs is not None:
+            self.submit_many(task_configs)
+        
+        start_time = time.perf_counter()
+        with span("schedule.run", "schedule", workers=self.max_workers):
+            workers = [
+                threading.Thread(target=self._worker, name=f"collector-worker-{index}", daemon=True)
+                for index in range(self.max_workers)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        
+        return self.summary(time.perf_counter() - start_time)
+    
+    def summary(self, seconds: float = None) -> Dict[str, Any]:
+        """
+        返回任務執行摘要
+        
+        Args:
+            seconds: 本次運行的總耗時（可選）
+        
+        Returns:
+            各狀態的任務數量和每個任務的狀態（按提交順序）
+        """
+        with self.lock:
+            tasks = sorted(self.tasks.values(), key=lambda task: task["sequence"])
+            records = [{key: value for key, value in task.items() if key != "config"} for task in tasks]
+        
+        counts = {status: 0 for status in (PENDING, RUNNING, COMPLETED, FAILED, EXPIRED)}
+        for record in records:
+            counts[record["status"]] += 1
+        
+        result = {
+            "success": counts[COMPLETED] == len(records) and bool(records),
+            "total": len(records),
+            "duplicates": sum(record["duplicates"] for record in records),
+            "tasks": records
+        }
+        result.update(counts)
+        if seconds is not None:
+            result["seconds"] = seconds
+        return result
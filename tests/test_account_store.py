@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+賬戶持久化測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import stat
+from configparser import ConfigParser
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from account_manager import FacebookAccountManager
+from utils import save_json
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def config(tmp_path, request):
+    config = ConfigParser()
+    config.read_dict({
+        "Files": {"accounts_file": str(tmp_path / "accounts.json"), "proxies_file": str(tmp_path / "proxies.json")},
+        "Account": {"storage_backend": request.param}
+    })
+    return config
+
+
+def test_updates_after_close_raise_clear_error(config):
+    manager = FacebookAccountManager(config)
+    account = manager.create_account("user", "user@example.com", "secret")
+    manager.close()
+    manager.close()
+    
+    with pytest.raises(RuntimeError, match="已關閉"):
+        manager.update_account(account["id"], status="active")
+    with pytest.raises(RuntimeError, match="已關閉"):
+        manager.create_account("other", "other@example.com", "secret")
+    with pytest.raises(RuntimeError, match="已關閉"):
+        manager.delete_account(account["id"])
+    
+    # 拒絕的修改不影響內存中的數據，已寫入的數據可以重新加載
+    assert manager.get_account(account["id"])["status"] == account["status"]
+    assert FacebookAccountManager(config).get_account(account["id"]) is not None
+
+
+def test_save_json_respects_umask(tmp_path):
+    previous = os.umask(0o027)
+    try:
+        path = str(tmp_path / "data.json")
+        assert save_json(path, {"a": 1})
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+        
+        # 替換已有文件時保持原有權限
+        os.chmod(path, 0o600)
+        assert save_json(path, {"a": 2})
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    finally:
+        os.umask(previous)
+    assert os.listdir(str(tmp_path)) == ["data.json"]
+
+
+def test_returned_accounts_are_copies(config):
+    manager = FacebookAccountManager(config)
+    account = manager.create_account("user", "user@example.com", "secret", account_info={"name": "user"})
+    
+    # 直接修改返回的賬戶不影響存儲的賬戶和狀態索引
+    account["status"] = "active"
+    retrieved = manager.get_account(account["id"])
+    retrieved["status"] = "active"
+    retrieved["account_info"]["name"] = "changed"
+    manager.accounts[0]["status"] = "active"
+    
+    assert manager.get_account(account["id"])["status"] == "pending"
+    assert manager.get_account(account["id"])["account_info"] == {"name": "user"}
+    assert [a["id"] for a in manager.get_accounts_by_status("pending")] == [account["id"]]
+    assert manager.get_accounts_by_status("active") == []
+
+
+def test_batch_create_writes_each_account_before_sleeping(config, monkeypatch):
+    manager = FacebookAccountManager(config)
+    dirty_while_sleeping = []
+    monkeypatch.setattr("account_manager.time.sleep", lambda seconds: dirty_while_sleeping.append(manager._store.dirty))
+    
+    manager.batch_create_accounts(3, {"username": "bulk"})
+    
+    assert dirty_while_sleeping == [False, False, False]
+    assert len(FacebookAccountManager(config).accounts) == 3
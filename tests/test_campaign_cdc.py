@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+廣告系列狀態變更捕獲測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from campaign_cdc import CampaignChangeLog, CREATED, REMOVED, BUDGET_CHANGED, STATUS_CHANGED
+
+ACCOUNT = "act_1"
+FULL = ["id", "name", "status", "daily_budget", "lifetime_budget"]
+MINIMAL = ["id", "name"]
+
+
+@pytest.fixture
+def log(tmp_path):
+    change_log = CampaignChangeLog(str(tmp_path / "cdc.db"))
+    yield change_log
+    change_log.close()
+
+
+def summary(changes: list) -> list:
+    return [(change["campaign_id"], change["change"], change["field"]) for change in changes]
+
+
+def test_unrequested_fields_are_not_diffed(log):
+    log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a", "status": "ACTIVE", "daily_budget": "100"}], FULL)
+    
+    # minimal 配置不請求狀態和預算，不應記為變更，也不應覆蓋已知的值
+    assert log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a"}], MINIMAL) == []
+    assert log.state(ACCOUNT)[0]["daily_budget"] == "100"
+    
+    changes = log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a", "status": "PAUSED", "daily_budget": "100"}],
+                                 FULL)
+    assert summary(changes) == [("1", STATUS_CHANGED, "status")]
+
+
+def test_first_observation_of_a_field_is_a_baseline(log):
+    log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a"}], MINIMAL)
+    
+    # 之前沒有請求過總預算，第一次請求時只記錄基準值
+    assert log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a", "lifetime_budget": "500"}], FULL) == []
+    
+    # 之後請求了但API沒有返回（空值）的字段記為變更
+    changes = log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a"}], FULL)
+    assert summary(changes) == [("1", BUDGET_CHANGED, "lifetime_budget")]
+    assert changes[0]["old_value"] == "500" and changes[0]["new_value"] is None
+
+
+def test_partial_snapshot_does_not_remove_campaigns(log):
+    log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a"}, {"id": "2", "name": "b"}], FULL)
+    
+    assert log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a"}], FULL, complete=False) == []
+    assert summary(log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a"}], FULL)) == [("2", REMOVED, None)]
+
+
+
+def test_incomplete_accounts_do_not_remove_campaigns(log):
+    log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a"}, {"id": "2", "name": "b"}], FULL)
+    log.apply_snapshot("act_2", [{"id": "3", "name": "c"}, {"id": "4", "name": "d"}], FULL)
+    
+    # act_1 的分頁沒有讀完，只有 act_2 判斷刪除
+    ad_data = [
+        {"account": {"id": ACCOUNT}, "campaigns": [{"id": "1", "name": "a"}]},
+        {"account": {"id": "act_2"}, "campaigns": [{"id": "3", "name": "c"}]}
+    ]
+    assert log.apply_collected(ad_data, FULL, incomplete_accounts={ACCOUNT}) == {REMOVED: 1}
+    assert [row["campaign_id"] for row in log.state(ACCOUNT)] == ["1", "2"]
+
+
+def test_existing_state_table_is_migrated(tmp_path):
+    db_path = str(tmp_path / "cdc.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE campaign_state (campaign_id TEXT PRIMARY KEY, ad_account_id TEXT NOT NULL, name TEXT, "
+        "status TEXT, daily_budget TEXT, lifetime_budget TEXT, first_seen TEXT NOT NULL, last_seen TEXT NOT NULL)"
+    )
+    conn.execute("INSERT INTO campaign_state VALUES ('1', 'act_1', 'a', 'ACTIVE', '100', NULL, 't', 't')")
+    conn.commit()
+    conn.close()
+    
+    log = CampaignChangeLog(db_path)
+    try:
+        # 舊狀態中有值的字段照常比較，沒有值的字段第一次出現時只記錄基準值
+        changes = log.apply_snapshot(ACCOUNT, [{"id": "1", "name": "a", "status": "ACTIVE", "daily_budget": "200",
+                                                "lifetime_budget": "900"}, {"id": "3", "name": "c"}], FULL)
+        assert summary(changes) == [("1", BUDGET_CHANGED, "daily_budget"), ("3", CREATED, None)]
+    finally:
+        log.close()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+導出工具測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import json
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_utils import export_data, export_to_csv, export_to_ndjson, export_to_parquet
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def drifting_records() -> list:
+    """生成類型在數據塊之間變化的記錄（每個數據塊2條）"""
+    return [
+        # 第一個數據塊：videoId 全為空，potentialCustomers 不是字典（使用默認值）
+        {"id": "1", "videoId": None, "potentialCustomers": None},
+        {"id": "2", "videoId": None, "potentialCustomers": None},
+        # 第二個數據塊：videoId 為數字，嵌套數值混合數字和字符串
+        {"id": "3", "videoId": 123.0,
+         "potentialCustomers": {"estimatedReach": 800, "engagementRate": "5.00", "costPerLead": 0.5, "qualityScore": 75}},
+        {"id": "4", "videoId": "abc",
+         "potentialCustomers": {"estimatedReach": "1500", "engagementRate": 4.2, "costPerLead": "0.40", "qualityScore": "n/a"}},
+    ]
+
+
+def test_parquet_schema_survives_type_drift_across_chunks(tmp_path):
+    output_path = str(tmp_path / "drift.parquet")
+    
+    result = export_to_parquet(iter(drifting_records()), output_path, chunk_size=2)
+    
+    assert result["success"], result.get("error")
+    assert result["row_count"] == 4
+    
+    table = pq.read_table(output_path)
+    types = {field.name: str(field.type) for field in table.schema}
+    for column in ("estimated_reach", "engagement_rate", "cost_per_lead", "quality_score"):
+        assert types[column] == "double"
+    # 第一個數據塊中全為空的列按字符串處理，後續的數字轉換為字符串
+    assert types["videoId"] == "string"
+    
+    df = table.to_pandas()
+    assert df["videoId"].tolist()[2:] == ["123.0", "abc"]
+    assert df["estimated_reach"].tolist() == [0.0, 0.0, 800.0, 1500.0]
+    assert df["engagement_rate"].tolist() == [0.0, 0.0, 5.0, 4.2]
+    assert df["cost_per_lead"].tolist() == [0.0, 0.0, 0.5, 0.4]
+    assert df["quality_score"].tolist()[:3] == [0.0, 0.0, 75.0]
+    assert pd.isna(df["quality_score"].tolist()[3])
+
+
+def test_parquet_reports_values_that_do_not_fit_the_schema(tmp_path):
+    records = [{"id": "1", "clicks": 10}, {"id": "2", "clicks": "many"}]
+    
+    result = export_to_parquet(iter(records), str(tmp_path / "bad.parquet"), chunk_size=1)
+    
+    assert not result["success"]
+    assert "clicks" in result["error"]
+
+
+def test_ndjson_keeps_columns_that_first_appear_in_later_chunks(tmp_path):
+    output_path = str(tmp_path / "sparse.ndjson")
+    records = [{"id": "1"}, {"id": "2", "promoCode": "SPRING"}]
+    
+    result = export_to_ndjson(iter(records), output_path, chunk_size=1)
+    
+    assert result["success"], result.get("error")
+    with open(output_path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[1]["promoCode"] == "SPRING"
+
+
+def test_csv_includes_nested_columns_missing_from_the_first_chunk(tmp_path):
+    output_path = str(tmp_path / "nested.csv")
+    records = [{"id": "1"}, {"id": "2", "potentialCustomers": {"estimatedReach": 800}}]
+    
+    result = export_to_csv(iter(records), output_path, chunk_size=1)
+    
+    assert result["success"], result.get("error")
+    df = pd.read_csv(output_path, encoding="utf-8-sig")
+    assert df["estimated_reach"].tolist()[1] == 800
+
+
+def test_csv_pads_earlier_rows_when_a_column_first_appears_later(tmp_path):
+    output_path = str(tmp_path / "sparse.csv")
+    records = [{"id": "1", "note": "a\nb"}, {"id": "2"}, {"id": "3", "promoCode": "SPRING"}, {"id": "4"}]
+    
+    result = export_to_csv(iter(records), output_path, chunk_size=2)
+    
+    assert result["success"], result.get("error")
+    df = pd.read_csv(output_path, encoding="utf-8-sig", dtype=str)
+    assert list(df.columns[-1:]) == ["promoCode"]
+    assert df["note"].tolist()[0] == "a\nb"
+    assert df["promoCode"].fillna("").tolist() == ["", "", "SPRING", ""]
+
+
+def test_parquet_widens_the_schema_when_a_column_first_appears_later(tmp_path):
+    output_path = str(tmp_path / "sparse.parquet")
+    records = [{"id": "1"}, {"id": "2", "promoCode": "SPRING"}, {"id": "3", "discount": 5}]
+    
+    result = export_to_parquet(iter(records), output_path, chunk_size=1)
+    
+    assert result["success"], result.get("error")
+    parquet_file = pq.ParquetFile(output_path)
+    assert parquet_file.num_row_groups == 3
+    table = parquet_file.read()
+    assert table.column("promoCode").to_pylist() == [None, "SPRING", None]
+    assert table.column("discount").to_pylist() == [None, None, 5]
+
+
+def test_csv_keeps_nested_values_that_are_not_numbers(tmp_path):
+    output_path = str(tmp_path / "nested.csv")
+    records = [{"id": "1", "potentialCustomers": {"estimatedReach": "1500", "qualityScore": "n/a"}}]
+    
+    result = export_to_csv(iter(records), output_path)
+    
+    assert result["success"], result.get("error")
+    df = pd.read_csv(output_path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    assert df["quality_score"].tolist() == ["n/a"]
+    assert df["estimated_reach"].tolist() == ["1500.0"]
+
+
+def test_multi_format_export_from_one_iterator_with_mixed_types(tmp_path):
+    pytest.importorskip("openpyxl")
+    records = drifting_records() + [
+        {"id": "5", "videoId": None, "audienceAnalysis": {"ageRange": "18-35", "genders": ["female"]},
+         "potentialCustomers": {"estimatedReach": 10, "engagementRate": "1.25", "costPerLead": "0", "qualityScore": 60}},
+    ]
+    
+    result = export_data(iter(records), ["csv", "excel", "parquet"], str(tmp_path), chunk_size=2)
+    
+    assert result["success"], result.get("error")
+    assert result["row_count"] == 5
+    assert set(result["formats"]) == {"csv", "excel", "parquet"}
+    for format_result in result["formats"].values():
+        assert format_result["success"]
+        assert format_result["row_count"] == 5
+        assert os.path.getsize(format_result["file_path"]) > 0
+    
+    table = pq.read_table(result["formats"]["parquet"]["file_path"])
+    assert str(table.schema.field("engagement_rate").type) == "double"
+    assert table.column("engagement_rate").to_pylist() == [0.0, 0.0, 5.0, 4.2, 1.25]
+    
+    excel = pd.read_excel(result["formats"]["excel"]["file_path"])
+    assert excel["參與率"].tolist() == [0.0, 0.0, 5.0, 4.2, 1.25]
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+請求字段配置測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from field_profiles import FIELD_PROFILES, ANALYZER_FIELDS, field_name, resolve_fields
+
+
+@pytest.mark.parametrize("method", sorted(ANALYZER_FIELDS))
+@pytest.mark.parametrize("profile", ["standard", "full", "analysis"])
+def test_profile_requests_analyzer_fields(method, profile):
+    # 分析報告（例如按廣告系列計算的ROAS）不應因為使用較小的字段配置而缺少數據
+    requested = {field_name(field) for field in resolve_fields(method, profile)}
+    assert ANALYZER_FIELDS[method] <= requested
+
+
+@pytest.mark.parametrize("method", sorted(FIELD_PROFILES))
+def test_standard_is_subset_of_full(method):
+    full = {field_name(field) for field in FIELD_PROFILES[method]["full"]}
+    assert {field_name(field) for field in FIELD_PROFILES[method]["standard"]} <= full
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+收集任務日誌測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import json
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_journal import JobJournal
+from utils import APIError
+
+TASK = {"type": "page", "page_id": "123"}
+
+
+def test_resume_flag_uses_the_same_journal(tmp_path):
+    journal = JobJournal.for_task(str(tmp_path), TASK)
+    resumed = JobJournal.for_task(str(tmp_path), dict(TASK, resume=True))
+    assert resumed.job_id == journal.job_id
+    assert resumed.strict and not journal.strict
+
+
+def test_journal_records_creation_time(tmp_path):
+    journal = JobJournal.for_task(str(tmp_path), TASK, ttl_hours=24)
+    journal.complete_unit("page:1", {"id": "1"})
+    journal.complete_unit("page:2", {"id": "2"})
+
+    with open(journal.file_path, encoding="utf-8") as f:
+        events = [json.loads(line)["event"] for line in f]
+    assert events == ["start", "unit", "unit"]
+
+    resumed = JobJournal.for_task(str(tmp_path), TASK, ttl_hours=24)
+    assert resumed.resumed and resumed.get_unit("page:2") == {"id": "2"}
+
+
+def test_stale_journal_is_discarded(tmp_path):
+    journal = JobJournal.for_task(str(tmp_path), TASK)
+    journal.complete_unit("page:1", {"id": "1"})
+    with open(journal.file_path, encoding="utf-8") as f:
+        lines = f.readlines()
+    lines[0] = json.dumps({"event": "start", "created_at": time.time() - 48 * 3600}) + "\n"
+    with open(journal.file_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+    # 沒有有效期限制時照常恢復
+    assert JobJournal.for_task(str(tmp_path), TASK).resumed
+
+    stale = JobJournal.for_task(str(tmp_path), TASK, ttl_hours=24)
+    assert not stale.resumed and not stale.has_unit("page:1")
+    assert not os.path.exists(stale.file_path)
+
+
+def test_legacy_journal_uses_file_time(tmp_path):
+    journal = JobJournal.for_task(str(tmp_path), TASK)
+    with open(journal.file_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"event": "unit", "unit": "page:1", "data": {}}) + "\n")
+
+    assert JobJournal.for_task(str(tmp_path), TASK, ttl_hours=24).resumed
+
+    old = time.time() - 48 * 3600
+    os.utime(journal.file_path, (old, old))
+    assert not JobJournal.for_task(str(tmp_path), TASK, ttl_hours=24).resumed
+
+
+def test_partial_failure_raises_only_for_resume_jobs(tmp_path):
+    journal = JobJournal.for_task(str(tmp_path), TASK)
+    journal.stream("posts:1").fail("獲取帖子分頁失敗")
+    assert journal.errors == ["獲取帖子分頁失敗"]
+
+    resumed = JobJournal.for_task(str(tmp_path), dict(TASK, resume=True))
+    with pytest.raises(APIError):
+        resumed.stream("posts:1").fail("獲取帖子分頁失敗")
+    assert resumed.errors == []
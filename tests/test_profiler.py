@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能分析測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import glob
+import pstats
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import profile_call
+
+
+def worker_function():
+    return sum(i * i for i in range(1000))
+
+
+def run_workers():
+    workers = [threading.Thread(target=worker_function, name=f"worker-{i}") for i in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return "done"
+
+
+def test_cprofile_includes_worker_threads(tmp_path):
+    assert profile_call(run_workers, str(tmp_path), "workers") == "done"
+    
+    stats = pstats.Stats(glob.glob(str(tmp_path / "*.prof"))[0])
+    calls = {function: row[1] for (_, _, function), row in stats.stats.items()}
+    assert calls["worker_function"] == 3
+    assert threading.getprofile() is None
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+進度事件總線測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progress import ProgressBus, TASK_STARTED, TASK_FINISHED, WAIT
+
+
+def run_task(bus: ProgressBus, task_id: str, waits: int = 1) -> None:
+    with bus.task(task_id, "page"):
+        bus.publish(TASK_STARTED)
+        for _ in range(waits):
+            bus.waited(0.1, "rate_limit")
+        bus.publish(TASK_FINISHED, success=True)
+
+
+def event_types(subscription) -> list:
+    return [event["type"] for event in subscription.drain()]
+
+
+def test_subscribing_to_finished_task_replays_its_events():
+    bus = ProgressBus()
+    run_task(bus, "a")
+    run_task(bus, "b")
+    
+    assert event_types(bus.subscribe(task_id="a")) == [TASK_STARTED, WAIT, TASK_FINISHED]
+    # 不指定任務時保持原來的行為：只接收之後的事件
+    assert event_types(bus.subscribe()) == []
+
+
+def test_finished_event_is_replayed_after_history_is_overwritten():
+    bus = ProgressBus(history_size=5)
+    run_task(bus, "a")
+    run_task(bus, "b", waits=10)
+    
+    subscription = bus.subscribe(task_id="a")
+    events = subscription.drain()
+    assert [event["type"] for event in events] == [TASK_FINISHED]
+    assert events[0]["task_id"] == "a"
+
+
+def test_rerun_task_does_not_replay_previous_run():
+    bus = ProgressBus()
+    run_task(bus, "a")
+    
+    with bus.task("a", "page"):
+        bus.publish(TASK_STARTED)
+        subscription = bus.subscribe(task_id="a")
+        assert event_types(subscription) == [TASK_STARTED]
+        bus.publish(TASK_FINISHED, success=True)
+    assert event_types(subscription) == [TASK_FINISHED]
+
+
+def test_unknown_task_waits_for_new_events():
+    bus = ProgressBus()
+    run_task(bus, "a")
+    subscription = bus.subscribe(task_id="later")
+    assert event_types(subscription) == []
+    run_task(bus, "later")
+    assert event_types(subscription) == [TASK_STARTED, WAIT, TASK_FINISHED]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+請求重試策略測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retry_policy import RetryPolicy, CircuitBreaker, CLOSED, OPEN, HALF_OPEN, TRANSIENT, RATE_LIMIT, PERMANENT
+
+KEY = "act_{id}/insights"
+
+
+def open_breaker(policy: RetryPolicy) -> CircuitBreaker:
+    for _ in range(policy.failure_threshold):
+        assert policy.allow(KEY)
+        policy.record_outcome(KEY, TRANSIENT)
+    breaker = policy.breaker(KEY)
+    assert breaker.state == OPEN and not policy.allow(KEY)
+    return breaker
+
+
+def test_rate_limited_probe_reopens_breaker():
+    policy = RetryPolicy(failure_threshold=2, reset_timeout=0.05)
+    breaker = open_breaker(policy)
+    
+    time.sleep(0.06)
+    assert policy.allow(KEY) and breaker.state == HALF_OPEN
+    policy.record_outcome(KEY, RATE_LIMIT)
+    assert breaker.state == OPEN
+    # 半開狀態的試探請求被速率限制後不能立即重試
+    assert not policy.should_retry(KEY, 0, RATE_LIMIT)
+    
+    # 等待後可以再次試探，成功時關閉熔斷器
+    time.sleep(0.06)
+    assert policy.allow(KEY)
+    policy.record_outcome(KEY, PERMANENT)
+    assert breaker.state == CLOSED and policy.allow(KEY)
+
+
+def test_unrecorded_probe_times_out():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05, probe_timeout=0.05)
+    breaker.record_failure()
+    
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    # 試探請求沒有記錄結果：超時前不允許其他請求，超時後允許新的試探請求
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_rate_limit_does_not_open_closed_breaker():
+    policy = RetryPolicy(failure_threshold=2)
+    for _ in range(5):
+        assert policy.allow(KEY)
+        policy.record_outcome(KEY, RATE_LIMIT)
+    assert policy.breaker(KEY).state == CLOSED
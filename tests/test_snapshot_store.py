@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按內容尋址的快照存儲測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import json
+import hashlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot_store import ObjectStore, MissingObjectError, MANIFEST_KEY, read_manifest, _canonical
+from utils import load_json, iter_json_records
+
+
+def page(page_id: str, posts: int, message: str = "hello") -> dict:
+    return {"id": page_id, "name": f"page {page_id}",
+            "posts": [{"id": f"{page_id}_{index}", "message": message} for index in range(posts)]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ObjectStore(str(tmp_path / ".objects"))
+
+
+def files_in(directory: str) -> list:
+    return sorted(os.listdir(directory))
+
+
+def test_each_snapshot_writes_one_pack(tmp_path, store):
+    first = [page("1", 50), page("2", 50)]
+    stats = store.write_snapshot(str(tmp_path / "first.json"), first)
+    assert stats["written"] == 102 and stats["reused"] == 0
+    
+    # 第二個快照只有一個頁面變化：只寫入變化的頁面，並且所有新對象在一個包中
+    second = [page("1", 50), dict(page("2", 50), name="renamed")]
+    stats = store.write_snapshot(str(tmp_path / "second.json"), second)
+    assert stats["written"] == 1 and stats["reused"] == 101
+    
+    names = files_in(store.objects_dir)
+    assert len(names) == 4 and all(name.endswith((".pack", ".idx")) for name in names)
+    
+    assert load_json(str(tmp_path / "first.json")) == first
+    assert list(iter_json_records(str(tmp_path / "second.json"))) == second
+    assert read_manifest(str(tmp_path / "second.json"))[MANIFEST_KEY] == 2
+
+
+def test_missing_objects_are_errors(tmp_path, store):
+    file_path = str(tmp_path / "snapshot.json")
+    store.write_snapshot(file_path, [page("1", 3)])
+    for name in files_in(store.objects_dir):
+        if name.endswith(".pack"):
+            os.remove(os.path.join(store.objects_dir, name))
+    
+    with pytest.raises(MissingObjectError):
+        load_json(file_path, default=[])
+    with pytest.raises(MissingObjectError):
+        list(iter_json_records(file_path))
+
+
+def test_garbage_collection_keeps_referenced_objects(tmp_path, store):
+    old_path = str(tmp_path / "old.json")
+    new_path = str(tmp_path / "new.json")
+    store.write_snapshot(old_path, [page("1", 10, "old")])
+    store.write_snapshot(new_path, [page("1", 10, "new"), page("2", 1)])
+    os.remove(old_path)
+    
+    live = store.live_hashes([(new_path, read_manifest(new_path))])
+    removed = store.collect_garbage(live, grace_seconds=0)
+    
+    assert removed["objects_removed"] == 11
+    assert len(files_in(store.objects_dir)) == 2
+    assert load_json(new_path) == [page("1", 10, "new"), page("2", 1)]
+    
+    # 清理後仍然可以複用留下的對象
+    stats = store.write_snapshot(str(tmp_path / "again.json"), [page("2", 1)])
+    assert stats["written"] == 0
+
+
+def test_partially_referenced_pack_is_rewritten(tmp_path, store):
+    first_path = str(tmp_path / "first.json")
+    second_path = str(tmp_path / "second.json")
+    store.write_snapshot(first_path, [page("1", 10, "first"), page("2", 1)])
+    store.write_snapshot(second_path, [page("1", 10, "second"), page("2", 1)])
+    os.remove(first_path)
+    
+    # 第一個包中只有頁面2仍被引用：用原來的包ID重寫，引用它的清單仍然有效
+    store.collect_garbage(store.live_hashes([(second_path, read_manifest(second_path))]), grace_seconds=0)
+    
+    assert len(files_in(store.objects_dir)) == 4
+    assert load_json(second_path) == [page("1", 10, "second"), page("2", 1)]
+    
+    # 另一個進程重寫了包之後，寫入時重新加載索引，不會引用已刪除的對象
+    writer = ObjectStore(store.objects_dir)
+    writer.write_snapshot(str(tmp_path / "warm.json"), [page("2", 1)])
+    store.collect_garbage(set(), grace_seconds=0)
+    stats = writer.write_snapshot(str(tmp_path / "revived.json"), [page("2", 1)])
+    assert stats["written"] == 2
+    assert load_json(str(tmp_path / "revived.json")) == [page("2", 1)]
+
+
+def test_version_1_manifests_are_still_readable(tmp_path, store):
+    record = {"id": "1", "name": "legacy"}
+    content = _canonical(record)
+    object_hash = hashlib.sha256(content).hexdigest()
+    os.makedirs(os.path.join(store.objects_dir, object_hash[:2]))
+    with open(os.path.join(store.objects_dir, object_hash[:2], f"{object_hash}.json"), "wb") as f:
+        f.write(content)
+    
+    file_path = str(tmp_path / "legacy.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump({MANIFEST_KEY: 1, "objects_dir": ".objects", "single": True, "records": [object_hash]}, f)
+    
+    assert load_json(file_path) == record
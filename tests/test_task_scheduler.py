@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+任務調度和數據保存測試
+
+用法:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+from configparser import ConfigParser
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_scheduler import TaskScheduler
+from data_collector import FacebookDataCollector
+
+
+def test_duplicate_task_id_is_rejected():
+    scheduler = TaskScheduler(collector=None)
+    scheduler.submit({"type": "page", "page_id": "1", "task_id": "nightly"})
+    
+    # 相同目標的重複提交照常合併
+    assert scheduler.submit({"type": "page", "page_id": "1", "task_id": "nightly"}) == "nightly"
+    
+    with pytest.raises(ValueError):
+        scheduler.submit({"type": "page", "page_id": "2", "task_id": "nightly"})
+    assert scheduler.tasks["nightly"]["config"]["page_id"] == "1"
+
+
+def test_generated_task_id_skips_explicit_ids():
+    scheduler = TaskScheduler(collector=None)
+    scheduler.submit({"type": "page", "page_id": "1", "task_id": "task_2"})
+    assert scheduler.submit({"type": "page", "page_id": "2"}) != "task_2"
+    assert len(scheduler.tasks) == 2
+
+
+@pytest.mark.parametrize("dedup", ["true", "false"])
+def test_concurrent_saves_do_not_collide(tmp_path, dedup):
+    config = ConfigParser()
+    config.read_dict({
+        "Files": {"data_dir": str(tmp_path)},
+        "Collection": {"dedup_snapshots": dedup, "campaign_cdc": "false"}
+    })
+    collector = FacebookDataCollector(config)
+    
+    paths = []
+    barrier = threading.Barrier(8)
+    
+    def save(index):
+        barrier.wait()
+        paths.append(collector.save_collected_data("page", [{"id": str(index)}], "same_target"))
+    
+    threads = [threading.Thread(target=save, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(set(paths)) == 8
+    assert all(os.path.exists(path) for path in paths)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+結構化追蹤模塊
+
+這個模塊提供可選的嵌套追蹤區間（span）記錄功能，包括：
+- 線程內自動嵌套的區間和父子關係
+- 區間屬性
+- 導出為Chrome Trace格式（可在 chrome://tracing 或 Perfetto 中查看）
+
+追蹤默認關閉，關閉時 span() 只有一次屬性檢查的開銷。
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+from utils import save_json
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """一個正在記錄的追蹤區間"""
+    
+    __slots__ = ("name", "category", "span_id", "parent_id", "start_ns", "attributes")
+    
+    def __init__(self, name: str, category: str, span_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = time.perf_counter_ns()
+        self.attributes = attributes
+    
+    def set(self, **attributes) -> None:
+        """添加區間屬性"""
+        self.attributes.update(attributes)
+
+
+class _NoopSpan:
+    """追蹤關閉時使用的空區間"""
+    
+    __slots__ = ()
+    
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """追蹤區間記錄器"""
+    
+    def __init__(self):
+        self.enabled = False
+        self.trace_id = None
+        self.lock = threading.Lock()
+        self._events = []
+        self._thread_names = {}
+        self._local = threading.local()
+        self._origin_ns = time.perf_counter_ns()
+        self._span_counter = 0
+    
+    def enable(self) -> None:
+        """開始記錄追蹤（清空之前的記錄）"""
+        with self.lock:
+            self.trace_id = uuid.uuid4().hex
+            self._events = []
+            self._thread_names = {}
+            self._origin_ns = time.perf_counter_ns()
+            self._span_counter = 0
+        self.enabled = True
+    
+    def disable(self) -> None:
+        """停止記錄追蹤（保留已記錄的區間）"""
+        self.enabled = False
+    
+    def _stack(self) -> List[Span]:
+        """返回當前線程的區間棧"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    @contextmanager
+    def span(self, name: str, category: str = "app", **attributes):
+        """
+        記錄一個追蹤區間的上下文管理器
+        
+        Args:
+            name: 區間名稱，例如 "collect.page"
+            category: 區間類別，例如 "collect", "analyze", "report", "http"
+            **attributes: 區間屬性
+        
+        Yields:
+            Span對象（追蹤關閉時為空區間），可通過 set() 添加屬性
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        
+        stack = self._stack()
+        with self.lock:
+            self._span_counter += 1
+            span_id = f"{self._span_counter:016x}"
+        span = Span(name, category, span_id, stack[-1].span_id if stack else None, attributes)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__, error_message=str(e))
+            raise
+        finally:
+            stack.pop()
+            self._record(span, time.perf_counter_ns())
+    
+    def traced(self, name: str = None, category: str = "app"):
+        """
+        把整個函數記錄為一個追蹤區間的裝飾器
+        
+        Args:
+            name: 區間名稱，默認使用函數的限定名
+            category: 區間類別
+        """
+        def decorator(func):
+            span_name = name or func.__qualname__
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(span_name, category):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def _record(self, span: Span, end_ns: int) -> None:
+        """保存一個已結束的區間"""
+        thread = threading.current_thread()
+        args = {"span_id": span.span_id}
+        if span.parent_id:
+            args["parent_id"] = span.parent_id
+        args.update({key: value if isinstance(value, (int, float, bool, str)) or value is None else str(value)
+                     for key, value in span.attributes.items()})
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": (span.start_ns - self._origin_ns) / 1000,
+            "dur": (end_ns - span.start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args
+        }
+        with self.lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+    
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        導出為Chrome Trace格式
+        
+        Returns:
+            包含 traceEvents 的字典
+        """
+        pid = os.getpid()
+        with self.lock:
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+                for tid, thread_name in self._thread_names.items()
+            ]
+            events = sorted(self._events, key=lambda event: event["ts"])
+        return {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "span_count": len(events)}
+        }
+    
+    def save(self, file_path: str) -> bool:
+        """
+        把追蹤寫入Chrome Trace JSON文件
+        
+        Args:
+            file_path: 文件路徑
+        
+        Returns:
+            是否成功保存
+        """
+        trace = self.to_chrome_trace()
+        if not save_json(file_path, trace, indent=None):
+            return False
+        logger.info(f"追蹤已保存到: {file_path}（{trace['otherData']['span_count']} 個區間）")
+        return True
+
+
+# 全局追蹤器
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
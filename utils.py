@@ -14,14 +14,25 @@
 """
 
 import os
+import io
+import gzip
 import json
 import time
 import random
+import secrets
 import logging
 import requests
 import configparser
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Union, Any, Iterator, TYPE_CHECKING
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+# utils 是最底層的模塊：retry_policy、metrics、snapshot_store 依賴 utils，只在函數內部導入它們
+if TYPE_CHECKING:
+    from retry_policy import RetryPolicy
+
+# 壓縮的JSON數據文件（例如壓縮合併後的數據分區）
+COMPRESSED_JSON_SUFFIX = ".json.gz"
 
 # 設置日誌格式
 def setup_logging(log_level: str = "INFO", log_file: str = None) -> None:
@@ -164,31 +175,87 @@ def create_default_config(config_file: str) -> bool:
         return False
 
 # JSON文件處理
-def load_json(file_path: str) -> Any:
+def is_data_file(filename: str) -> bool:
+    """判斷文件是否為收集數據文件（.json 或 .json.gz，不包括指標快照）
+    
+    Args:
+        filename: 文件名或路徑
+        
+    Returns:
+        是否為數據文件
+    """
+    from metrics import METRICS_JSON_SUFFIX
+    
+    if filename.endswith(COMPRESSED_JSON_SUFFIX):
+        return True
+    return filename.endswith(".json") and not filename.endswith(METRICS_JSON_SUFFIX)
+
+def _open_text(file_path: str, mode: str = "r"):
+    """以UTF-8文本方式打開文件，.gz 文件自動解壓"""
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, mode + "t", encoding="utf-8")
+    return open(file_path, mode, encoding="utf-8")
+
+def load_json(file_path: str, default: Any = None) -> Any:
     """加載JSON文件
     
+    按內容尋址保存的快照清單（見 snapshot_store）自動還原為完整數據。
+    
     Args:
         file_path: JSON文件路徑
+        default: 文件不存在或加載失敗時的返回值
         
     Returns:
         加載的JSON數據
+        
+    Raises:
+        MissingObjectError: 快照清單引用的對象不存在（不返回default，避免把缺失的數據當作空數據）
     """
+    from snapshot_store import is_manifest, reconstruct
+    
     if not os.path.exists(file_path):
         logging.warning(f"JSON文件不存在: {file_path}")
-        return None
+        return default
     
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
+        with _open_text(file_path) as f:
             data = json.load(f)
-        logging.debug(f"已加載JSON文件: {file_path}")
-        return data
     except Exception as e:
         logging.exception(f"加載JSON文件時出錯: {e}")
-        return None
+        return default
+    
+    if is_manifest(data):
+        data = reconstruct(file_path, data)
+    logging.debug(f"已加載JSON文件: {file_path}")
+    return data
+
+def _create_temp_file(file_dir: str, basename: str):
+    """在目標目錄創建臨時文件
+    
+    權限與普通寫入的新文件一致（0666去掉進程umask的部分，由系統在創建時應用），
+    不需要讀取或臨時修改umask。
+    
+    Args:
+        file_dir: 目錄（為空時使用當前目錄）
+        basename: 目標文件名
+    
+    Returns:
+        (文件描述符, 臨時文件路徑)
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        temp_path = os.path.join(file_dir or ".", f".{basename}.{secrets.token_hex(6)}.tmp")
+        try:
+            return os.open(temp_path, flags, 0o666), temp_path
+        except FileExistsError:
+            continue
 
 def save_json(file_path: str, data: Any, indent: int = 4) -> bool:
     """保存JSON文件
     
+    先寫入同目錄下的臨時文件，再通過重命名原子替換目標文件，
+    寫入過程中崩潰不會損壞原有文件。路徑以 .gz 結尾時寫入gzip壓縮的JSON。
+    
     Args:
         file_path: JSON文件路徑
         data: 要保存的數據
@@ -197,24 +264,187 @@ def save_json(file_path: str, data: Any, indent: int = 4) -> bool:
     Returns:
         是否成功保存
     """
+    temp_path = None
     try:
         # 創建目錄
         file_dir = os.path.dirname(file_path)
         if file_dir and not os.path.exists(file_dir):
             os.makedirs(file_dir, exist_ok=True)
         
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=indent)
+        fd, temp_path = _create_temp_file(file_dir, os.path.basename(file_path))
+        # 替換已有文件時保持原有權限
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o777)
+        if file_path.endswith(".gz"):
+            with os.fdopen(fd, "wb") as f:
+                # mtime=0: 內容相同時壓縮結果相同
+                with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6, mtime=0) as gz, \
+                        io.TextIOWrapper(gz, encoding="utf-8") as text:
+                    json.dump(data, text, ensure_ascii=False, indent=indent)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+        temp_path = None
+        
         logging.debug(f"已保存JSON文件: {file_path}")
         return True
     except Exception as e:
         logging.exception(f"保存JSON文件時出錯: {e}")
         return False
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+class _JsonStreamReader:
+    """增量JSON讀取器
+
+    按塊讀取文件，每次只解碼一個JSON值，內存佔用取決於單條記錄的大小而非整個文件。
+    """
+
+    def __init__(self, f, buffer_size: int):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """讀取下一塊數據，並丟棄已消費的部分"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.buffer_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """跳過空白並返回下一個字符（文件結束時返回空字符串）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        """消費指定的分隔符"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON格式錯誤: 預期 '{char}'，實際為 '{found}'")
+        self.pos += 1
+
+    def decode(self) -> Any:
+        """解碼下一個完整的JSON值"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 值恰好在緩衝區末尾結束時可能被截斷（例如數字），需要讀取更多數據確認
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def iter_array(self) -> Iterator[Any]:
+        """逐個返回當前位置JSON數組中的元素"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            separator = self.peek()
+            self.pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"JSON格式錯誤: 數組中出現意外字符 '{separator}'")
+
+
+def iter_json_records(file_path: str, key: str = "data", buffer_size: int = 1 << 20) -> Iterator[Any]:
+    """逐條讀取JSON文件中的記錄
+    
+    支持以下格式，且不會將整個文件加載到內存：
+    - JSON數組: [{...}, {...}]
+    - 包含數組字段的對象: {"data": [{...}, {...}]}
+    - NDJSON: 每行一個JSON對象（.ndjson 或 .jsonl 文件）
+    - 以上格式的gzip壓縮文件（.gz 結尾）
+    - 按內容尋址保存的快照清單（逐條從對象存儲還原）
+    
+    Args:
+        file_path: JSON文件路徑
+        key: 對象格式中包含記錄數組的字段名
+        buffer_size: 每次讀取的字符數
+        
+    Returns:
+        記錄迭代器
+    """
+    from snapshot_store import MANIFEST_KEY, iter_records
+    
+    with _open_text(file_path) as f:
+        if file_path.lower().removesuffix(".gz").endswith((".ndjson", ".jsonl")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+        
+        reader = _JsonStreamReader(f, buffer_size)
+        first = reader.peek()
+        
+        if first == "[":
+            yield from reader.iter_array()
+            return
+        
+        if first == "{":
+            reader.pos += 1
+            if reader.peek() != "}":
+                while True:
+                    name = reader.decode()
+                    if name == MANIFEST_KEY:
+                        # 快照清單：從對象存儲逐條還原記錄
+                        f.seek(0)
+                        yield from iter_records(file_path, json.load(f))
+                        return
+                    reader.expect(":")
+                    if name == key and reader.peek() == "[":
+                        yield from reader.iter_array()
+                        return
+                    
+                    # 跳過無關字段
+                    reader.decode()
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == "}":
+                        break
+                    if separator != ",":
+                        raise ValueError(f"JSON格式錯誤: 對象中出現意外字符 '{separator}'")
+            
+            logging.warning(f"JSON文件中沒有 '{key}' 數組: {file_path}")
+            return
+        
+        logging.warning(f"未知的數據格式: {file_path}")
 
 # HTTP請求處理
 def make_request(url: str, method: str = "GET", params: Dict = None, 
                 data: Dict = None, headers: Dict = None, proxy: str = None, 
-                timeout: int = 30, max_retries: int = 3, retry_delay: int = 5) -> Dict:
+                timeout: int = 30, max_retries: int = 3, retry_delay: int = 5,
+                retry_policy: "RetryPolicy" = None) -> Dict:
     """發送HTTP請求
     
     Args:
@@ -225,16 +455,32 @@ def make_request(url: str, method: str = "GET", params: Dict = None,
         headers: 請求頭
         proxy: 代理地址
         timeout: 超時時間（秒）
-        max_retries: 最大重試次數
-        retry_delay: 重試延遲（秒）
+        max_retries: 最大重試次數（未提供retry_policy時使用）
+        retry_delay: 最小重試延遲（秒，未提供retry_policy時使用）
+        retry_policy: 重試策略（可選，與其他請求共享重試預算和熔斷器）
         
     Returns:
         響應結果
     """
+    from retry_policy import RetryPolicy, classify_error
+    from metrics import normalize_endpoint
+    
     method = method.upper()
     proxies = {"http": proxy, "https": proxy} if proxy else None
-    
-    for attempt in range(max_retries + 1):
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retries=max_retries, base_delay=retry_delay, failure_threshold=0)
+    # 熔斷器按規範化的端點劃分（對象ID替換為佔位符），同一類端點共用一個熔斷器
+    parts = urlsplit(url)
+    circuit_key = f"{parts.netloc}/{normalize_endpoint(parts.path)}"
+    
+    if not retry_policy.allow(circuit_key):
+        logging.warning(f"端點 {circuit_key} 的熔斷器已打開，跳過請求")
+        return {"success": False, "error": f"端點 {circuit_key} 的熔斷器已打開", "error_type": "CircuitOpenError"}
+    
+    delay = None
+    attempt = 0
+    while True:
+        status_code = None
         try:
             response = requests.request(
                 method=method,
@@ -245,6 +491,7 @@ def make_request(url: str, method: str = "GET", params: Dict = None,
                 proxies=proxies,
                 timeout=timeout
             )
+            status_code = response.status_code
             
             # 檢查響應狀態
             response.raise_for_status()
@@ -255,6 +502,7 @@ def make_request(url: str, method: str = "GET", params: Dict = None,
             except ValueError:
                 result = {"text": response.text}
             
+            retry_policy.record_success(circuit_key)
             return {
                 "success": True,
                 "status_code": response.status_code,
@@ -263,18 +511,28 @@ def make_request(url: str, method: str = "GET", params: Dict = None,
             }
             
         except requests.exceptions.RequestException as e:
-            if attempt < max_retries:
-                # 計算延遲時間（指數退避）
-                delay = retry_delay * (2 ** attempt) + random.uniform(0, 1)
-                logging.warning(f"請求失敗，{delay:.2f}秒後重試 ({attempt+1}/{max_retries}): {e}")
-                time.sleep(delay)
-            else:
-                logging.error(f"請求失敗，已達到最大重試次數: {e}")
+            error = None
+            if e.response is not None:
+                try:
+                    error = e.response.json().get("error")
+                except (ValueError, AttributeError):
+                    error = None
+            kind = classify_error(status_code, error)
+            
+            retry_policy.record_outcome(circuit_key, kind)
+            if not retry_policy.should_retry(circuit_key, attempt, kind):
+                logging.error(f"請求失敗，不再重試: {e}")
                 return {
                     "success": False,
                     "error": str(e),
-                    "error_type": type(e).__name__
+                    "error_type": type(e).__name__,
+                    "status_code": status_code
                 }
+            
+            delay = retry_policy.backoff(delay, kind)
+            logging.warning(f"請求失敗，{delay:.2f}秒後重試 ({attempt+1}/{retry_policy.max_retries}): {e}")
+            time.sleep(delay)
+            attempt += 1
 
 # 代理管理
 class ProxyManager: